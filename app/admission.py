@@ -0,0 +1,277 @@
+"""Контроль допуска запросов и сброс нагрузки
+
+Когда БД замедляется, запросы копятся в пуле потоков в ожидании соединения
+и в итоге отваливаются по таймауту все сразу. Здесь число одновременных
+запросов к /tasks ограничивается заранее: запросы сверх лимита ждут в
+ограниченной очереди не дольше бюджета ожидания, а остальные сразу получают
+503 с Retry-After. Чтения и изменения ограничиваются отдельными лимитами,
+поэтому поток чтений не вытесняет изменения. Дополнительно можно ограничить
+частоту запросов каждого клиента (token bucket, ответ 429).
+"""
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable
+
+from starlette.responses import JSONResponse
+from starlette.routing import Match
+
+from app.config import (
+    ADMISSION_CLIENT_BURST, ADMISSION_CLIENT_RATE, ADMISSION_READ_CONCURRENCY, ADMISSION_READ_MAX_WAIT,
+    ADMISSION_READ_QUEUE, ADMISSION_RETRY_AFTER, ADMISSION_ROUTE_LIMITS, ADMISSION_WRITE_CONCURRENCY,
+    ADMISSION_WRITE_MAX_WAIT, ADMISSION_WRITE_QUEUE,
+)
+
+#Методы, которые ограничиваются лимитом чтений; остальные - лимитом изменений
+READ_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+
+
+class ConcurrencyLimiter:
+    """Не больше limit одновременных запросов
+
+    Запросы сверх лимита ждут в очереди FIFO длиной не больше queue_size
+    и не дольше max_wait секунд. Если очередь заполнена или время вышло,
+    acquire возвращает False: запрос нужно отклонить. Работает в одном
+    цикле событий, поэтому обходится без блокировок.
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int = 0, max_wait: float = 0):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.active = 0
+        self.admitted = 0
+        self.shed = {'queue_full': 0, 'timeout': 0}
+        self._waiters: deque[asyncio.Future] = deque()
+
+    async def acquire(self) -> bool:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return True
+        if len(self._waiters) >= self.queue_size or self.max_wait <= 0:
+            self.shed['queue_full'] += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done():
+                #Место освободилось одновременно с таймаутом: передаю его следующему
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.shed['timeout'] += 1
+            return False
+        self.admitted += 1
+        return True
+
+    def release(self) -> None:
+        #Место переходит первому ожидающему, счетчик занятых мест не меняется
+        if self._waiters:
+            self._waiters.popleft().set_result(None)
+        else:
+            self.active -= 1
+
+    def stats(self) -> dict:
+        return {
+            'limit': self.limit,
+            'active': self.active,
+            'waiting': len(self._waiters),
+            'admitted': self.admitted,
+            'shed': dict(self.shed),
+        }
+
+
+class RateLimiter:
+    """Token bucket на каждого клиента: rate запросов в секунду, всплеск до burst
+
+    Хранит не больше max_clients корзин, вытесняя давно не обращавшихся клиентов.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        max_clients: int = 10000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.clock = clock
+        self.limited = 0
+        # Клиент -> (токены, время последнего пополнения)
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, client: str) -> float:
+        """Взять токен клиента; возвращает 0 или сколько секунд ждать следующего токена"""
+        now = self.clock()
+        with self._lock:
+            tokens, updated = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                self._buckets[client] = (tokens - 1, now)
+                wait = 0.0
+            else:
+                self._buckets[client] = (tokens, now)
+                self.limited += 1
+                wait = (1 - tokens) / self.rate
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'rate': self.rate, 'burst': self.burst, 'clients': len(self._buckets), 'limited': self.limited}
+
+
+def client_key(scope) -> str:
+    """Идентификатор клиента запроса: заголовок X-Client-Id или IP-адрес"""
+    for name, value in scope['headers']:
+        if name == b'x-client-id':
+            return 'id:' + value.decode('latin-1')
+    client = scope.get('client')
+    return 'ip:' + client[0] if client else 'unknown'
+
+
+def parse_route_limits(value: str) -> dict[str, int]:
+    """Лимиты маршрутов из строки "GET /tasks/export=2,POST /tasks/bulk=4" """
+    limits = {}
+    for item in filter(None, (item.strip() for item in value.split(','))):
+        route, _, limit = item.rpartition('=')
+        method, _, path = route.strip().partition(' ')
+        if not path or not limit.strip().isdigit():
+            raise ValueError(f"Invalid route limit {item!r}, expected 'METHOD /path=limit'")
+        limits[f'{method.upper()} {path.strip()}'] = int(limit)
+    return limits
+
+
+class AdmissionController:
+    """Лимиты чтений, изменений, отдельных маршрутов и частоты запросов клиентов"""
+
+    def __init__(
+        self,
+        read: ConcurrencyLimiter,
+        write: ConcurrencyLimiter,
+        routes: dict[str, int] | None = None,
+        rate_limiter: RateLimiter | None = None,
+        retry_after: int = ADMISSION_RETRY_AFTER,
+    ):
+        self.read = read
+        self.write = write
+        #Лимит маршрута ждет столько же, сколько лимит его класса (чтение или изменение)
+        self.routes = {}
+        for route, limit in (routes or {}).items():
+            base = read if route.split(' ', 1)[0] in READ_METHODS else write
+            self.routes[route] = ConcurrencyLimiter(route, limit, base.queue_size, base.max_wait)
+        self.rate_limiter = rate_limiter
+        self.retry_after = retry_after
+
+    def limiters(self, method: str, route_path: str) -> list[ConcurrencyLimiter]:
+        """Лимиты, которые должен пройти запрос, в порядке захвата"""
+        limiters = []
+        route_limiter = self.routes.get(f'{method} {route_path}')
+        if route_limiter is not None:
+            limiters.append(route_limiter)
+        limiters.append(self.read if method in READ_METHODS else self.write)
+        return limiters
+
+    def stats(self) -> dict:
+        return {
+            'read': self.read.stats(),
+            'write': self.write.stats(),
+            'routes': {route: limiter.stats() for route, limiter in self.routes.items()},
+            'rate_limit': self.rate_limiter.stats() if self.rate_limiter is not None else None,
+        }
+
+
+def create_admission_controller() -> AdmissionController:
+    """Контроль допуска по настройкам из окружения"""
+    rate_limiter = None
+    if ADMISSION_CLIENT_RATE > 0:
+        rate_limiter = RateLimiter(ADMISSION_CLIENT_RATE, ADMISSION_CLIENT_BURST)
+    return AdmissionController(
+        read=ConcurrencyLimiter('read', ADMISSION_READ_CONCURRENCY, ADMISSION_READ_QUEUE, ADMISSION_READ_MAX_WAIT),
+        write=ConcurrencyLimiter('write', ADMISSION_WRITE_CONCURRENCY, ADMISSION_WRITE_QUEUE, ADMISSION_WRITE_MAX_WAIT),
+        routes=parse_route_limits(ADMISSION_ROUTE_LIMITS),
+        rate_limiter=rate_limiter,
+    )
+
+
+class AdmissionMiddleware:
+    """ASGI-middleware контроля допуска для маршрутов с префиксом prefix
+
+    Маршрут определяется до обработки запроса по шаблонам путей приложения.
+    Место в лимите занято до отправки всего тела ответа, в том числе
+    потокового. Маршруты из exempt (лента изменений, держащая соединение
+    часами без обращений к БД) не ограничиваются.
+    """
+
+    def __init__(
+        self,
+        app,
+        controller: AdmissionController,
+        prefix: str = '/tasks',
+        exempt: tuple[str, ...] = ('GET /tasks/events',),
+    ):
+        self.app = app
+        self.controller = controller
+        self.prefix = prefix
+        self.exempt = frozenset(exempt)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not scope['path'].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+        route = self._match(scope)
+        if route is None or f"{scope['method']} {route.path}" in self.exempt:
+            await self.app(scope, receive, send)
+            return
+        #Шаблон маршрута нужен метрикам и для отклоненных запросов
+        scope['route'] = route
+
+        rate_limiter = self.controller.rate_limiter
+        if rate_limiter is not None:
+            wait = rate_limiter.acquire(client_key(scope))
+            if wait:
+                await self._reject(scope, receive, send, 429, 'Too many requests', math.ceil(wait))
+                return
+
+        acquired = []
+        try:
+            for limiter in self.controller.limiters(scope['method'], route.path):
+                if not await limiter.acquire():
+                    await self._reject(
+                        scope, receive, send, 503, 'Service is overloaded, retry later', self.controller.retry_after
+                    )
+                    return
+                acquired.append(limiter)
+            await self.app(scope, receive, send)
+        finally:
+            for limiter in acquired:
+                limiter.release()
+
+    @staticmethod
+    def _match(scope):
+        for route in scope['app'].router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route
+        return None
+
+    @staticmethod
+    async def _reject(scope, receive, send, status_code: int, detail: str, retry_after: int):
+        response = JSONResponse({'detail': detail}, status_code=status_code, headers={'Retry-After': str(retry_after)})
+        await response(scope, receive, send)
+
+
+admission = create_admission_controller()
@@ -1,25 +1,86 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from typing import Callable, List, Literal, Optional, Union
 from uuid import UUID
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 import logging
 
-from app.schemas.task import Task, TaskCreate, TaskUpdate
-from app.crud.task import TaskService
-from app.database import get_db
+from app.config import BULK_CHUNK_SIZE, BULK_MAX_ITEMS, EVENTS_HEARTBEAT, GROUP_COMMIT_ENABLED
+from app.schemas.task import (
+    Task, TaskBulkDeleteResult, TaskBulkResult, TaskBulkTarget, TaskBulkUpdate, TaskBulkUpdateResult, TaskCountMode, TaskCountResult, TaskCreate, TaskFilter, TaskOrder, TaskPartial, TaskUpdate,
+)
+from app.crud.group_commit import GroupCommitWriter, task_writer
+from app.crud.idempotency import IdempotencyKeyReusedError
+from app.crud.task import VersionConflictError
+from app.crud.task_async import AsyncTaskService
+from app.crud.pagination import InvalidCursorError
+from app.api.dependencies import (
+    default_read_service_dependency, default_task_service_dependency, get_task_fields, get_task_filter,
+)
+from app.api.idempotency import IDEMPOTENCY_KEY_MAX_LENGTH, idempotent_request, replay_or_run
+from app.api.etag import etag_matches, if_match_versions, list_etag, task_etag
+from app.api.events import EVENT_STREAM_HEADERS, EVENT_STREAM_MEDIA_TYPE, sse_stream
+from app.api.export import EXPORT_MEDIA_TYPES, export_body
+from app.events import task_events
+from app.api.serialization import FastJSONResponse, task_content, task_rows_response
 
 logger = logging.getLogger(__name__)
 
+
+def version_conflict(error: VersionConflictError) -> HTTPException:
+    """Ответ 412 на изменение по устаревшему ETag: в заголовке ETag текущая версия задачи"""
+    return HTTPException(
+        status_code = status.HTTP_412_PRECONDITION_FAILED,
+        detail = "Task was modified",
+        headers = {'ETag': task_etag(error.task_id, error.current_version)},
+    )
+
+
+def idempotency_key_reused(error: IdempotencyKeyReusedError) -> HTTPException:
+    """Ответ 422 на повтор ключа идемпотентности с другим запросом"""
+    return HTTPException(
+        status_code = status.HTTP_422_UNPROCESSABLE_ENTITY,
+        detail = "Idempotency key was already used for a different request",
+    )
+
+
+#Заголовок Idempotency-Key операций изменения
+IDEMPOTENCY_KEY_HEADER = Header(
+    None,
+    max_length = IDEMPOTENCY_KEY_MAX_LENGTH,
+    description = "Ключ повтора запроса: запрос с тем же ключом вернет сохраненный ответ, не выполняясь снова",
+)
+
+
 class TaskAPIRouter:
-    """Класс для организации API роутов задач"""
+    """Класс для организации API роутов задач
+
+    Обработчики асинхронные и получают сервис задач через зависимость
+    get_service: синхронный TaskService в пуле потоков или AsyncTaskService
+    на асинхронном драйвере, в зависимости от DB_MODE. Если задан writer
+    (GroupCommitWriter), POST /tasks/ создает задачи через групповую фиксацию.
+    Чтения (список, задача по ID, поиск, подсчет, выгрузка) получают сервис
+    через get_read_service: на реплике БД, если реплики заданы.
+    """
     
-    def __init__(self):
+    def __init__(
+        self,
+        get_service: Callable = None,
+        writer: GroupCommitWriter | None = None,
+        get_read_service: Callable = None,
+    ):
         self.router = APIRouter()
+        self.get_service = get_service or default_task_service_dependency()
+        #Явно переданный сервис используется и для чтений, если сервис чтения не задан
+        self.get_read_service = get_read_service or get_service or default_read_service_dependency()
+        self.writer = writer or (task_writer if GROUP_COMMIT_ENABLED else None)
         self._register_routes()
     
     def _register_routes(self):
         """Регистрация всех роутов"""
+        get_service = self.get_service
+        get_read_service = self.get_read_service
+        writer = self.writer
         
         @self.router.post(
             '/', 
@@ -38,13 +99,32 @@ class TaskAPIRouter:
             - created - задача создана
             - in_progress - задача в работе
             - completed - задача завершена                
+        
+            Заголовок Idempotency-Key (до 255 символов) делает повтор запроса
+            безопасным: повтор с тем же ключом и телом в течение IDEMPOTENCY_TTL
+            возвращает сохраненный ответ (с заголовком Idempotent-Replayed: true)
+            и не создает задачу снова. Тот же ключ с другим телом - 422.
+
+            При GROUP_COMMIT_ENABLED задачи одновременных запросов без
+            Idempotency-Key фиксируются общей транзакцией; ответ приходит
+            после фиксации.
             """
         )
-        def create_new_task(task: TaskCreate, db: Session = Depends(get_db)):
+        async def create_new_task(
+            task: TaskCreate,
+            idempotency_key: Optional[str] = IDEMPOTENCY_KEY_HEADER,
+            service: AsyncTaskService = Depends(get_service),
+        ):
             """Создать новую задачу"""
             try:
-                service = TaskService(db)
-                return service.create_task(task)
+                if idempotency_key is None and writer is not None:
+                    return await writer.submit(task)
+                request = idempotent_request('POST /tasks/', idempotency_key, task.model_dump(mode='json'))
+                return await replay_or_run(
+                    service, request, status.HTTP_201_CREATED, lambda: service.create_task(task, request)
+                )
+            except IdempotencyKeyReusedError as e:
+                raise idempotency_key_reused(e)
             except SQLAlchemyError as e:
                 logger.error(f"Database error in create task: {str(e)}")
                 raise HTTPException(
@@ -58,27 +138,253 @@ class TaskAPIRouter:
                     detail = "Unexpected error occurred"
                 )
         
+        @self.router.post(
+            '/bulk', 
+            response_model = TaskBulkResult, 
+            status_code = status.HTTP_201_CREATED,
+            summary = 'Создать пакет задач',
+            description = f"""
+            Создает несколько задач за один запрос многострочными INSERT.
+        
+            Тело запроса: список задач в формате POST /tasks/ (до {BULK_MAX_ITEMS} штук).
+        
+            Параметры запроса:
+            - atomic: Все или ничего (по умолчанию: true). При ошибке любой задачи
+              пакет не создается. Если false, создаются все корректные задачи,
+              а ошибки возвращаются в поле errors с индексом задачи в запросе
+            - chunk_size: Количество строк в одном INSERT (по умолчанию: {BULK_CHUNK_SIZE})
+        
+            Заголовок Idempotency-Key - как в POST /tasks/.
+        
+            Ошибки:
+            - 409 Conflict - в режиме atomic одна из задач нарушает ограничения БД
+            """
+        )
+        async def create_task_bulk(
+            tasks: List[TaskCreate] = Body(..., min_length=1, max_length=BULK_MAX_ITEMS),
+            atomic: bool = True,
+            chunk_size: int = Query(BULK_CHUNK_SIZE, ge=1, le=BULK_MAX_ITEMS),
+            idempotency_key: Optional[str] = IDEMPOTENCY_KEY_HEADER,
+            service: AsyncTaskService = Depends(get_service),
+        ):
+            """Создать пакет задач"""
+            try:
+                request = idempotent_request(
+                    'POST /tasks/bulk', idempotency_key, [task.model_dump(mode='json') for task in tasks],
+                    atomic, chunk_size,
+                )
+                return await replay_or_run(
+                    service, request, status.HTTP_201_CREATED,
+                    lambda: service.create_tasks(tasks, chunk_size=chunk_size, atomic=atomic, idempotency=request),
+                )
+            except IdempotencyKeyReusedError as e:
+                raise idempotency_key_reused(e)
+            except IntegrityError as e:
+                logger.error(f"Integrity error in create tasks bulk: {str(e)}")
+                raise HTTPException(
+                    status_code = status.HTTP_409_CONFLICT,
+                    detail = str(e.orig).splitlines()[0]
+                )
+            except SQLAlchemyError as e:
+                logger.error(f"Database error in create tasks bulk: {str(e)}")
+                raise HTTPException(
+                    status_code = status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail = "Internal server error while creating tasks"
+                )
+            except Exception as e:
+                logger.error(f"Unexpected error in create tasks bulk: {str(e)}")
+                raise HTTPException(
+                    status_code = status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail = "Unexpected error occurred"
+                )
+        
+        @self.router.patch(
+            '/bulk',
+            response_model = TaskBulkUpdateResult,
+            summary = 'Обновить пакет задач',
+            description = f"""
+            Применяет одни и те же изменения к списку задач или ко всем задачам,
+            подходящим под фильтр, одним UPDATE в одной транзакции.
+        
+            Тело запроса:
+            - ids: Список UUID задач (до {BULK_MAX_ITEMS} штук)
+            - filter: Фильтр задач: status (список), title_prefix. Передается
+              ровно одно из полей ids и filter
+            - update: Изменения в формате PATCH /tasks/{{task_id}} (хотя бы одно поле)
+        
+            Параметры запроса:
+            - returning: Вернуть измененные задачи в поле tasks (по умолчанию: false,
+              возвращается только число измененных задач)
+        
+            Пример: перевести все задачи в работе в завершенные
+            `{{"filter": {{"status": ["in_progress"]}}, "update": {{"status": "completed"}}}}`
+        
+            Заголовок Idempotency-Key - как в POST /tasks/: повтор возвращает
+            ответ первого выполнения, версии задач повторно не увеличиваются.
+            """
+        )
+        async def update_task_bulk(
+            bulk: TaskBulkUpdate,
+            returning: bool = False,
+            idempotency_key: Optional[str] = IDEMPOTENCY_KEY_HEADER,
+            service: AsyncTaskService = Depends(get_service),
+        ):
+            """Обновить пакет задач"""
+            try:
+                request = idempotent_request(
+                    'PATCH /tasks/bulk', idempotency_key, bulk.model_dump(mode='json', exclude_unset=True), returning
+                )
+                return await replay_or_run(
+                    service, request, status.HTTP_200_OK,
+                    lambda: service.update_tasks(bulk, returning=returning, idempotency=request),
+                )
+            except IdempotencyKeyReusedError as e:
+                raise idempotency_key_reused(e)
+            except SQLAlchemyError as e:
+                logger.error(f"Database error in update tasks bulk: {str(e)}")
+                raise HTTPException(
+                    status_code = status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail = "Internal server error while updating tasks"
+                )
+            except Exception as e:
+                logger.error(f"Unexpected error in update tasks bulk: {str(e)}")
+                raise HTTPException(
+                    status_code = status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail = "Unexpected error occurred"
+                )
+        
+        @self.router.post(
+            '/bulk/delete',
+            response_model = TaskBulkDeleteResult,
+            summary = 'Удалить пакет задач',
+            description = f"""
+            Помечает удаленными задачи из списка или все задачи, подходящие
+            под фильтр, одним UPDATE в одной транзакции. Удаленные задачи
+            сразу исчезают из выборок, физически их удаляет фоновый процесс.
+        
+            Тело запроса:
+            - ids: Список UUID задач (до {BULK_MAX_ITEMS} штук)
+            - filter: Фильтр задач: status (список), title_prefix. Передается
+              ровно одно из полей ids и filter
+        
+            Возвращает число удаленных задач; уже удаленные и несуществующие
+            задачи не учитываются. Заголовок Idempotency-Key - как в POST /tasks/:
+            повтор возвращает число из первого ответа.
+            """
+        )
+        async def delete_task_bulk(
+            bulk: TaskBulkTarget,
+            idempotency_key: Optional[str] = IDEMPOTENCY_KEY_HEADER,
+            service: AsyncTaskService = Depends(get_service),
+        ):
+            """Удалить пакет задач"""
+            async def delete():
+                return {'deleted': await service.delete_tasks(bulk, request)}
+            
+            try:
+                request = idempotent_request(
+                    'POST /tasks/bulk/delete', idempotency_key, bulk.model_dump(mode='json', exclude_unset=True)
+                )
+                return await replay_or_run(service, request, status.HTTP_200_OK, delete)
+            except IdempotencyKeyReusedError as e:
+                raise idempotency_key_reused(e)
+            except SQLAlchemyError as e:
+                logger.error(f"Database error in delete tasks bulk: {str(e)}")
+                raise HTTPException(
+                    status_code = status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail = "Internal server error while deleting tasks"
+                )
+            except Exception as e:
+                logger.error(f"Unexpected error in delete tasks bulk: {str(e)}")
+                raise HTTPException(
+                    status_code = status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail = "Unexpected error occurred"
+                )
+        
         @self.router.get(
             '/', 
-            response_model = List[Task],
+            response_model = List[Union[Task, TaskPartial]],
             summary = 'Получить список задач',
             description = """
-            Возвращает список задач с поддержкой пагинации.
+            Возвращает список задач с поддержкой пагинации и фильтрации.
+            Задачи упорядочены по времени создания.
         
             Параметры запроса:
             - skip: Количество задач to skip (по умолчанию: 0)
             - limit: Максимальное количество задач to return (по умолчанию: 100)
+            - cursor: Курсор из заголовка X-Next-Cursor предыдущей страницы.
+              Если передан, skip игнорируется
+            - status: Статус задачи; можно передать несколько раз
+            - title_prefix: Начало названия задачи (с учетом регистра)
+            - order: Направление сортировки по времени создания: asc или desc (по умолчанию: asc).
+              Курсор действителен только для того направления, в котором был выдан
+            - total: Вернуть в заголовке X-Total-Count число задач под фильтром:
+              exact (точный подсчет), estimated (оценка по статистике PostgreSQL)
+              или cached (счетчики процесса). По умолчанию число не считается.
+              Подробнее о режимах - GET /tasks/count
+            - fields: Вернуть только эти поля задач через запятую (id возвращается
+              всегда). Остальные колонки не читаются из БД: fields=title,status
+              не читает описания задач
+        
+            Если страница заполнена целиком, в заголовке ответа X-Next-Cursor
+            возвращается курсор следующей страницы. Переход по курсору работает
+            одинаково быстро на любой глубине, в отличие от skip.
+        
+            В заголовке ETag возвращается версия страницы. Если передать ее
+            в If-None-Match и страница не изменилась, ответ - 304 Not Modified
+            без тела; проверка читает только id и версии задач страницы.
         
             Пример:
             `GET /tasks/?skip=0&limit=10` - первые 10 задач
+            `GET /tasks/?limit=10&cursor=<X-Next-Cursor>` - следующие 10 задач
+            `GET /tasks/?status=created&status=in_progress&order=desc` - незавершенные задачи, новые первыми
+            `GET /tasks/?fields=title,status` - только id, названия и статусы задач
             """
         )
-        def read_task_list(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-            """Получить список всех задач с пагинацией"""
+        async def read_task_list(
+            skip: int = 0,
+            limit: int = 100,
+            cursor: Optional[str] = None,
+            order: TaskOrder = 'asc',
+            filters: Optional[TaskFilter] = Depends(get_task_filter),
+            total: Optional[TaskCountMode] = None,
+            fields: Optional[tuple] = Depends(get_task_fields),
+            if_none_match: Optional[str] = Header(None),
+            service: AsyncTaskService = Depends(get_read_service),
+        ):
+            """Получить список всех задач с пагинацией
+
+            Ответ собирается прямо из строк запроса колонок; схема List[Task]
+            в response_model остается описанием ответа в OpenAPI.
+            """
             try:
-                service = TaskService(db)
-                tasks = service.get_tasks(skip=skip, limit=limit)
-                return tasks
+                page = dict(skip=skip, limit=limit, cursor=cursor, filters=filters, order=order)
+                headers = {}
+                if total is not None:
+                    counts = await service.count_tasks(filters=filters, mode=total)
+                    headers['X-Total-Count'] = str(counts.total)
+                if if_none_match is not None:
+                    keys = await service.get_task_versions(**page)
+                    etag = list_etag(keys)
+                    if etag_matches(if_none_match, etag):
+                        not_modified = Response(
+                            status_code = status.HTTP_304_NOT_MODIFIED, headers = {**headers, 'ETag': etag}
+                        )
+                        next_cursor = service.next_cursor(keys, limit, order)
+                        if next_cursor is not None:
+                            not_modified.headers['X-Next-Cursor'] = next_cursor
+                        return not_modified
+                rows = await service.get_task_rows(**page, fields=fields)
+                headers['ETag'] = list_etag(rows)
+                next_cursor = service.next_cursor(rows, limit, order)
+                if next_cursor is not None:
+                    headers['X-Next-Cursor'] = next_cursor
+                return task_rows_response(rows, headers, fields)
+            except InvalidCursorError:
+                raise HTTPException(
+                    status_code = status.HTTP_400_BAD_REQUEST,
+                    detail = "Invalid cursor"
+                )
             except SQLAlchemyError as e:
                 logger.error(f"Database error in get tasks list: {str(e)}")
                 raise HTTPException(
@@ -92,9 +398,164 @@ class TaskAPIRouter:
                     detail = "Unexpected error occurred"
                 )
         
+        @self.router.get(
+            '/search',
+            response_model = List[Task],
+            summary = 'Полнотекстовый поиск задач',
+            description = """
+            Ищет задачи по словам в названии и описании.
+            Результаты упорядочены по релевантности.
+        
+            Параметры запроса:
+            - q: Поисковый запрос (1-200 символов). На PostgreSQL поддерживаются
+              "фразы в кавычках", OR и -исключение слова; в SQLite задача должна
+              содержать все слова запроса
+            - skip: Количество результатов to skip (по умолчанию: 0)
+            - limit: Максимальное количество результатов (по умолчанию: 100)
+            - status, title_prefix: как в GET /tasks/
+        
+            Пример:
+            `GET /tasks/search?q=отчет квартал&limit=20`
+            """
+        )
+        async def search_tasks(
+            q: str = Query(..., min_length=1, max_length=200),
+            skip: int = Query(0, ge=0),
+            limit: int = Query(100, ge=1, le=1000),
+            filters: Optional[TaskFilter] = Depends(get_task_filter),
+            service: AsyncTaskService = Depends(get_read_service),
+        ):
+            """Полнотекстовый поиск задач"""
+            try:
+                return task_rows_response(await service.search_task_rows(q, skip=skip, limit=limit, filters=filters))
+            except SQLAlchemyError as e:
+                logger.error(f"Database error in search tasks: {str(e)}")
+                raise HTTPException(
+                    status_code = status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail = "Internal server error while searching tasks"
+                )
+            except Exception as e:
+                logger.error(f"Unexpected error in search tasks: {str(e)}")
+                raise HTTPException(
+                    status_code = status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail = "Unexpected error occurred"
+                )
+        
+        @self.router.get(
+            '/count',
+            response_model = TaskCountResult,
+            summary = 'Получить число задач',
+            description = """
+            Возвращает число задач под фильтром: всего и по статусам.
+        
+            Параметры запроса:
+            - mode: Способ подсчета (по умолчанию: exact)
+              - exact: точный COUNT; читает все подходящие строки
+              - estimated: оценка планировщика PostgreSQL по статистике таблицы,
+                запрос не выполняется. Точность зависит от свежести ANALYZE.
+                На SQLite используется cached
+              - cached: счетчики в памяти процесса, которые поддерживаются
+                при создании, изменении статуса и удалении задач и пересчитываются
+                не реже раза в TASK_COUNT_TTL секунд. С title_prefix используется exact
+            - status: Статус задачи; можно передать несколько раз
+            - title_prefix: Начало названия задачи (с учетом регистра)
+        
+            В поле mode ответа возвращается режим, которым число получено на самом деле.
+            """
+        )
+        async def count_task_list(
+            mode: TaskCountMode = 'exact',
+            filters: Optional[TaskFilter] = Depends(get_task_filter),
+            service: AsyncTaskService = Depends(get_read_service),
+        ):
+            """Получить число задач"""
+            try:
+                return await service.count_tasks(filters=filters, mode=mode)
+            except SQLAlchemyError as e:
+                logger.error(f"Database error in count tasks: {str(e)}")
+                raise HTTPException(
+                    status_code = status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail = "Internal server error while counting tasks"
+                )
+            except Exception as e:
+                logger.error(f"Unexpected error in count tasks: {str(e)}")
+                raise HTTPException(
+                    status_code = status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail = "Unexpected error occurred"
+                )
+        
+        @self.router.get(
+            '/events',
+            response_class = StreamingResponse,
+            summary = 'Лента изменений задач',
+            description = f"""
+            Поток Server-Sent Events с изменениями задач вместо периодического
+            опроса списка. События:
+            - created: создана задача; data содержит задачу
+            - updated: изменена задача; data содержит задачу (или null после
+              пакетного обновления без returning) и список измененных полей fields
+            - deleted: задача удалена; data содержит id, версию и статус
+            - reset: часть событий пропущена, задачи нужно перечитать
+        
+            Каждое событие имеет ID. После обрыва соединения браузер сам передает
+            последний ID в заголовке Last-Event-ID, и лента продолжается с
+            пропущенных событий. ID можно передать и параметром after.
+            Если продолжить нельзя (события вытеснены или соединение пришло в другой
+            процесс), первым придет reset.
+        
+            Клиент, который не успевает читать события, получает reset и отключается.
+            При отсутствии событий каждые {EVENTS_HEARTBEAT:g} с отправляется комментарий.
+            """
+        )
+        async def stream_task_events(
+            after: Optional[str] = Query(None, max_length=100, description="ID последнего полученного события"),
+            last_event_id: Optional[str] = Header(None, max_length=100),
+        ):
+            """Лента изменений задач"""
+            subscription = task_events.subscribe(last_event_id or after)
+            return StreamingResponse(
+                sse_stream(task_events, subscription, EVENTS_HEARTBEAT),
+                media_type = EVENT_STREAM_MEDIA_TYPE,
+                headers = EVENT_STREAM_HEADERS,
+            )
+        
+        @self.router.get(
+            '/export',
+            response_class = StreamingResponse,
+            summary = 'Выгрузить все задачи',
+            description = """
+            Потоково выгружает все задачи в формате NDJSON или CSV.
+            Память сервера не зависит от количества задач: строки читаются
+            из курсора БД порциями и сразу отправляются клиенту.
+        
+            Параметры запроса:
+            - format: ndjson (по умолчанию) или csv
+            - status, title_prefix, order: как в GET /tasks/
+        
+            Пример:
+            `GET /tasks/export?format=csv&status=completed`
+            """,
+            responses = {
+                200: {'content': {media_type: {} for media_type in EXPORT_MEDIA_TYPES.values()}},
+            },
+        )
+        async def export_tasks(
+            format: Literal['ndjson', 'csv'] = 'ndjson',
+            order: TaskOrder = 'asc',
+            filters: Optional[TaskFilter] = Depends(get_task_filter),
+            service: AsyncTaskService = Depends(get_read_service),
+        ):
+            """Выгрузить все задачи потоком"""
+            partitions = service.iter_task_partitions(filters=filters, order=order)
+            return StreamingResponse(
+                export_body(partitions, format),
+                media_type = EXPORT_MEDIA_TYPES[format],
+                headers = {'Content-Disposition': f'attachment; filename="tasks.{format}"'},
+            )
+        
         @self.router.get(
             "/{task_id}", 
-            response_model = Task,
+            response_model = Union[Task, TaskPartial],
             summary= 'Получить задачу по UUID',
             description = """
             Возвращает задачу по указанному UUID.
@@ -102,22 +563,47 @@ class TaskAPIRouter:
             Параметры пути:
             - task_id: UUID задачи
             
+            Параметры запроса:
+            - fields: Вернуть только эти поля задачи через запятую, как в GET /tasks/
+            
+            В заголовке ETag возвращается версия задачи. Если передать ее
+            в If-None-Match и задача не изменилась, ответ - 304 Not Modified
+            без тела; проверка читает только версию задачи. ETag не зависит
+            от fields и подходит для If-Match при изменении задачи.
+            
             Ошибки:
             - 404 Not Found - если задача не найдена
             """
         )
-        def read_one_task(task_id: UUID, db: Session = Depends(get_db)):
+        async def read_one_task(
+            task_id: UUID,
+            fields: Optional[tuple] = Depends(get_task_fields),
+            if_none_match: Optional[str] = Header(None),
+            service: AsyncTaskService = Depends(get_read_service),
+        ):
             """Получить задачу по UUID"""
             try:
-                service = TaskService(db)
-                db_task = service.get_task(task_id=task_id)
+                if if_none_match is not None:
+                    version = await service.get_task_version(task_id)
+                    if version is not None:
+                        etag = task_etag(task_id, version)
+                        if etag_matches(if_none_match, etag):
+                            return Response(status_code = status.HTTP_304_NOT_MODIFIED, headers = {'ETag': etag})
+                
+                if fields is None:
+                    db_task = await service.get_task_cached(task_id=task_id)
+                else:
+                    db_task = await service.get_task_partial(task_id, fields)
                 
                 if db_task is None:
                     raise HTTPException(
                         status_code = status.HTTP_404_NOT_FOUND,
                         detail = "Task not found"
                     )
-                return db_task
+                # Снимок из кэша уже проверен схемой: кодирую его без повторной проверки
+                return FastJSONResponse(
+                    task_content(db_task, fields), headers = {'ETag': task_etag(db_task.id, db_task.version)}
+                )
             except HTTPException:
                 # Пробрасываю HTTPException как есть (404 ошибки)
                 raise
@@ -149,28 +635,45 @@ class TaskAPIRouter:
             - description: Новое описание задачи
             - status: Новый статус задачи
         
+            Заголовки:
+            - If-Match: ETag задачи из GET /tasks/{task_id}. Задача изменяется,
+              только если с тех пор ее никто не изменил
+        
             Особенности:
             - Обновляются только переданные поля
             - Остальные поля остаются неизменными
+            - В заголовке ETag возвращается новая версия задачи
         
             Ошибки:
             - 404 Not Found - если задача не найдена
+            - 412 Precondition Failed - если задачу изменили после получения ETag из If-Match;
+              в заголовке ETag возвращается текущая версия
             """
         )
-        def update_existing_task(task_id: UUID, task_update: TaskUpdate, db: Session = Depends(get_db)):
+        async def update_existing_task(
+            task_id: UUID,
+            task_update: TaskUpdate,
+            response: Response,
+            if_match: Optional[str] = Header(None),
+            service: AsyncTaskService = Depends(get_service),
+        ):
             """Обновить существующую задачу"""
             try:
-                service = TaskService(db)
-                db_task = service.update_task(task_id=task_id, task_update=task_update)
+                db_task = await service.update_task(
+                    task_id=task_id, task_update=task_update, expected_versions=if_match_versions(if_match, task_id)
+                )
                 
                 if db_task is None:
                     raise HTTPException(
                         status_code = status.HTTP_404_NOT_FOUND,
                         detail = "Task not found"
                     )
+                response.headers['ETag'] = task_etag(db_task.id, db_task.version)
                 return db_task
             except HTTPException:
                 raise
+            except VersionConflictError as e:
+                raise version_conflict(e)
             except SQLAlchemyError as e:
                 logger.error(f"Database error in update task {task_id}: {str(e)}")
                 raise HTTPException(
@@ -195,21 +698,31 @@ class TaskAPIRouter:
             - task_id: UUID задачи для удаления
         
             Особенности:
-            - Задача полностью удаляется из системы
-            - Операция необратима
+            - Задача помечается удаленной и сразу исчезает из всех выборок
+            - Физически задача удаляется фоновым процессом (python -m app.purge)
+            - Повторное удаление возвращает 404
+        
+            Заголовки:
+            - If-Match: ETag задачи; задача удаляется, только если с тех пор ее никто не изменил
         
             Ошибки:
             - 404 Not Found - если задача не найдена
+            - 412 Precondition Failed - если задачу изменили после получения ETag из If-Match
         
             Возвращает:
             Удаленную задачу (последнее состояние перед удалением).
             """
         )
-        def delete_existing_task(task_id: UUID, db: Session = Depends(get_db)):
+        async def delete_existing_task(
+            task_id: UUID,
+            if_match: Optional[str] = Header(None),
+            service: AsyncTaskService = Depends(get_service),
+        ):
             """Удалить задачу"""
             try:
-                service = TaskService(db)
-                db_task = service.delete_task(task_id = task_id)
+                db_task = await service.delete_task(
+                    task_id = task_id, expected_versions = if_match_versions(if_match, task_id)
+                )
                 
                 if db_task is None:
                     raise HTTPException(
@@ -219,6 +732,8 @@ class TaskAPIRouter:
                 return db_task
             except HTTPException:
                 raise
+            except VersionConflictError as e:
+                raise version_conflict(e)
             except SQLAlchemyError as e:
                 logger.error(f"Database error in delete task {task_id}: {str(e)}")
                 raise HTTPException(
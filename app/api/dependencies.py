@@ -0,0 +1,121 @@
+from typing import List, Optional
+
+from fastapi import Depends, HTTPException, Query, Request, status
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import DB_MODE
+from app.crud.cache import ReadOnlyCache, task_cache
+from app.crud.task_async import AsyncTaskService, ThreadedTaskService
+from app.database import AsyncSessionLocal, SessionLocal, get_async_db, get_db, get_replicas
+from app.replicas import reads_primary
+from app.schemas.task import Task, TaskFilter, TaskStatus
+
+
+async def get_task_service(db: Session = Depends(get_db)) -> AsyncTaskService:
+    """Сервис задач поверх синхронной сессии (DB_MODE=sync)"""
+    return ThreadedTaskService(db)
+
+
+async def get_async_task_service(db: AsyncSession = Depends(get_async_db)) -> AsyncTaskService:
+    """Сервис задач поверх асинхронной сессии (DB_MODE=async)"""
+    return AsyncTaskService(db)
+
+
+def default_task_service_dependency():
+    """Зависимость сервиса задач для режима из конфигурации"""
+    return get_async_task_service if DB_MODE == 'async' else get_task_service
+
+
+def get_read_db(request: Request, db: Session = Depends(get_db)):
+    """Сессия для чтения: на реплике, если они заданы, иначе сессия get_db
+
+    Клиент, недавно изменявший задачи, читает с основной БД. Если к выбранной
+    реплике не удалось подключиться, она исключается из выбора, а запрос
+    читает с основной БД.
+    """
+    replicas = get_replicas()
+    replica = replicas.choose() if not reads_primary(request) else None
+    if replica is None:
+        yield db
+        return
+    replica_db = SessionLocal(bind=replica.engine, info={'replica': replica.name})
+    try:
+        replica_db.connection()
+    except SQLAlchemyError as e:
+        replica_db.close()
+        replicas.mark_failed(replica, e)
+        yield db
+        return
+    try:
+        yield replica_db
+    finally:
+        replica_db.close()
+
+
+async def get_async_read_db(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Асинхронная сессия для чтения: на реплике, если они заданы, иначе сессия get_async_db"""
+    replicas = get_replicas()
+    replica = replicas.choose() if not reads_primary(request) else None
+    if replica is None:
+        yield db
+        return
+    async with AsyncSessionLocal(bind=replica.async_engine, info={'replica': replica.name}) as replica_db:
+        try:
+            await replica_db.connection()
+        except SQLAlchemyError as e:
+            replicas.mark_failed(replica, e)
+            yield db
+            return
+        yield replica_db
+
+
+def read_cache(db: Session | AsyncSession):
+    """Кэш задач для сессии чтения: с реплики кэш только читается"""
+    return ReadOnlyCache(task_cache) if 'replica' in db.info else None
+
+
+async def get_read_task_service(db: Session = Depends(get_read_db)) -> AsyncTaskService:
+    """Сервис задач для чтения поверх синхронной сессии (DB_MODE=sync)"""
+    return ThreadedTaskService(db, read_cache(db))
+
+
+async def get_async_read_task_service(db: AsyncSession = Depends(get_async_read_db)) -> AsyncTaskService:
+    """Сервис задач для чтения поверх асинхронной сессии (DB_MODE=async)"""
+    return AsyncTaskService(db, read_cache(db))
+
+
+def default_read_service_dependency():
+    """Зависимость сервиса задач для чтения для режима из конфигурации"""
+    return get_async_read_task_service if DB_MODE == 'async' else get_read_task_service
+
+
+def get_task_filter(
+    status: Optional[List[TaskStatus]] = Query(None, description="Статус задачи, можно передать несколько раз"),
+    title_prefix: Optional[str] = Query(None, min_length=1, max_length=100, description="Начало названия задачи"),
+) -> TaskFilter | None:
+    """Фильтр списка задач из параметров запроса"""
+    if status is None and title_prefix is None:
+        return None
+    return TaskFilter(status=status, title_prefix=title_prefix)
+
+
+def get_task_fields(
+    fields: Optional[str] = Query(
+        None,
+        description="Поля задачи через запятую: id, title, description, status, version. id возвращается всегда",
+        examples=["title,status"],
+    ),
+) -> tuple[str, ...] | None:
+    """Поля задачи для ответа из параметра fields в порядке схемы Task или None - все поля"""
+    if fields is None:
+        return None
+    requested = {name.strip() for name in fields.split(',') if name.strip()}
+    unknown = requested - set(Task.model_fields)
+    if not requested or unknown:
+        raise HTTPException(
+            status_code = status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail = f"Unknown task fields: {', '.join(sorted(unknown)) or fields!r}",
+        )
+    return tuple(name for name in Task.model_fields if name in requested or name == 'id')
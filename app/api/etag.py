@@ -0,0 +1,47 @@
+import hashlib
+from typing import Iterable
+from uuid import UUID
+
+
+def task_etag(task_id: UUID, version: int) -> str:
+    """ETag одной задачи: меняется при каждом изменении задачи"""
+    return f'"{task_id.hex}-{version}"'
+
+
+def list_etag(tasks: Iterable) -> str:
+    """ETag страницы списка по (id, version) ее задач
+
+    Меняется, если на странице изменилась, появилась или пропала задача.
+    Параметры запроса в ETag не входят: он относится к конкретному URL.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for task in tasks:
+        digest.update(task.id.bytes)
+        digest.update(task.version.to_bytes(8, 'big'))
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Совпадает ли ETag с заголовком If-None-Match (слабое сравнение)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    candidates = (value.strip() for value in if_none_match.split(','))
+    return any(value.removeprefix('W/') == etag for value in candidates)
+
+
+def if_match_versions(if_match: str | None, task_id: UUID) -> list[int] | None:
+    """Версии задачи, перечисленные в If-Match (строгое сравнение)
+
+    None - условия на версию нет: заголовок не передан или равен *. Слабые
+    и чужие ETag в список не попадают, поэтому с ними условие не выполняется.
+    """
+    if not if_match or if_match.strip() == '*':
+        return None
+    prefix = f'"{task_id.hex}-'
+    versions = []
+    for value in (value.strip() for value in if_match.split(',')):
+        if value.startswith(prefix) and value.endswith('"') and value[len(prefix):-1].isdigit():
+            versions.append(int(value[len(prefix):-1]))
+    return versions
@@ -0,0 +1,54 @@
+from typing import AsyncIterator
+
+from app.events import ChangeEvent, EventBroker, Subscription, SubscriptionDropped
+
+EVENT_STREAM_MEDIA_TYPE = 'text/event-stream'
+
+#Заголовки ответа ленты: без кэширования и без буферизации в прокси
+EVENT_STREAM_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+#Через сколько миллисекунд браузер переподключается после обрыва
+RETRY_MS = 3000
+
+
+def _frame(event_id: str, event_type: str, data: bytes) -> bytes:
+    return b'id: %s\nevent: %s\ndata: %s\n\n' % (event_id.encode(), event_type.encode(), data)
+
+
+def _reset_frame(event_id: str | None, reason: str) -> bytes:
+    frame = b'event: reset\ndata: {"reason":"%s"}\n\n' % reason.encode()
+    return b'id: %s\n' % event_id.encode() + frame if event_id is not None else frame
+
+
+async def sse_stream(broker: EventBroker, subscription: Subscription, heartbeat: float) -> AsyncIterator[bytes]:
+    """Кодировать события подписки в поток Server-Sent Events
+
+    Событие reset означает, что часть событий пропущена и задачи нужно
+    перечитать: при продолжении с устаревшего ID лента продолжается, а
+    подписчик, который не успевал читать, отключается. Если событий нет
+    heartbeat секунд, отправляется комментарий, чтобы соединение не закрылось.
+    """
+    try:
+        yield b'retry: %d\n: connected\n\n' % RETRY_MS
+        if subscription.reset:
+            yield _reset_frame(subscription.start_id, 'resume')
+        while True:
+            try:
+                event = await subscription.get(heartbeat)
+            except SubscriptionDropped:
+                yield _reset_frame(None, 'slow_consumer')
+                return
+            if event is None:
+                yield b': ping\n\n'
+                continue
+            # Все уже полученные события отправляю одним куском
+            chunk = [_encode(broker, event)]
+            while (event := subscription.poll()) is not None:
+                chunk.append(_encode(broker, event))
+            yield b''.join(chunk)
+    finally:
+        subscription.close()
+
+
+def _encode(broker: EventBroker, event: ChangeEvent) -> bytes:
+    return _frame(broker.event_id(event), event.type, event.data)
@@ -0,0 +1,64 @@
+import csv
+import io
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator
+
+from sqlalchemy.engine import Row
+
+from app.api.serialization import json_dumps
+
+#Формат выгрузки -> тип содержимого
+EXPORT_MEDIA_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+EXPORT_FIELDS = ('id', 'title', 'description', 'status')
+
+
+def _ndjson_chunk(rows: list[Row]) -> bytes:
+    lines = [
+        json_dumps({'id': row.id, 'title': row.title, 'description': row.description, 'status': row.status})
+        for row in rows
+    ]
+    return b'\n'.join(lines) + b'\n'
+
+
+def _csv_chunk(rows: list[Row]) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows((str(row.id), row.title, row.description, row.status) for row in rows)
+    return buffer.getvalue().encode()
+
+
+def _csv_header() -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(EXPORT_FIELDS)
+    return buffer.getvalue().encode()
+
+
+_ENCODERS = {'ndjson': _ndjson_chunk, 'csv': _csv_chunk}
+
+
+def encode_export(partitions: Iterable[list[Row]], export_format: str) -> Iterator[bytes]:
+    """Кодировать порции строк в куски NDJSON или CSV"""
+    encode = _ENCODERS[export_format]
+    if export_format == 'csv':
+        yield _csv_header()
+    for rows in partitions:
+        yield encode(rows)
+
+
+async def encode_export_async(partitions: AsyncIterable[list[Row]], export_format: str) -> AsyncIterator[bytes]:
+    """Асинхронный вариант encode_export для AsyncSession.stream"""
+    encode = _ENCODERS[export_format]
+    if export_format == 'csv':
+        yield _csv_header()
+    async for rows in partitions:
+        yield encode(rows)
+
+
+def export_body(partitions, export_format: str):
+    """Тело StreamingResponse для синхронного или асинхронного источника порций"""
+    if hasattr(partitions, '__aiter__'):
+        return encode_export_async(partitions, export_format)
+    return encode_export(partitions, export_format)
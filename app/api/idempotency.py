@@ -0,0 +1,40 @@
+from typing import Any, Awaitable, Callable
+from fastapi import Response
+from app.crud.idempotency import DuplicateRequestError, IdempotentRequest, request_fingerprint
+
+#Ограничение длины заголовка Idempotency-Key (колонка key в idempotency_keys)
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+#Заголовок ответа, возвращенного из сохраненных вместо повторного выполнения
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+
+def idempotent_request(scope: str, key: str | None, *parts: Any) -> IdempotentRequest | None:
+    """Ключ идемпотентности запроса или None, если заголовок не передан
+
+    parts - тело и параметры запроса: повтор ключа с другими значениями отклоняется.
+    """
+    if key is None:
+        return None
+    return IdempotentRequest(scope=scope, key=key, fingerprint=request_fingerprint(*parts))
+
+
+async def replay_or_run(
+    service,
+    request: IdempotentRequest | None,
+    status_code: int,
+    run: Callable[[], Awaitable[Any]],
+) -> Any:
+    """Вернуть сохраненный ответ для ключа или выполнить запрос
+
+    Если одинаковый запрос зафиксирован одновременно с текущим, текущий
+    откатывается и возвращается ответ первого.
+    """
+    if request is None:
+        return await run()
+    stored = await service.get_stored_response(request)
+    if stored is None:
+        try:
+            return await run()
+        except DuplicateRequestError:
+            stored = await service.get_stored_response(request)
+    return Response(stored, status_code=status_code, media_type='application/json', headers={REPLAYED_HEADER: 'true'})
@@ -0,0 +1,51 @@
+import json
+from typing import Any, Iterable
+
+from fastapi.responses import JSONResponse
+
+from app.schemas.task import Task as TaskSchema
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson необязателен, есть запасной вариант на json
+    orjson = None
+
+#Поля ответа с задачей в порядке схемы Task: по ним строится ответ из строк запроса
+TASK_FIELDS = tuple(TaskSchema.model_fields)
+
+
+def json_dumps(content: Any) -> bytes:
+    """Кодировать в JSON через orjson, если он установлен
+
+    UUID и datetime кодируются строками, как в ответах Pydantic.
+    """
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(',', ':'), default=str).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON-ответ, кодируемый json_dumps"""
+
+    def render(self, content: Any) -> bytes:
+        return json_dumps(content)
+
+
+def task_content(row: Any, fields: tuple[str, ...] | None = None) -> dict:
+    """Содержимое ответа с задачей из строки или снимка: все поля Task или только fields"""
+    return {field: getattr(row, field) for field in fields or TASK_FIELDS}
+
+
+def task_rows_content(rows: Iterable, fields: tuple[str, ...] | None = None) -> list[dict]:
+    """Содержимое ответа List[Task] из строк запроса колонок без ORM-объектов и Pydantic"""
+    fields = fields or TASK_FIELDS
+    return [{field: getattr(row, field) for field in fields} for row in rows]
+
+
+def task_rows_response(
+    rows: Iterable,
+    headers: dict | None = None,
+    fields: tuple[str, ...] | None = None,
+) -> FastJSONResponse:
+    """Ответ со списком задач из строк запроса колонок (только поля fields, если заданы)"""
+    return FastJSONResponse(task_rows_content(rows, fields), headers=headers)
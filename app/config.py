@@ -1,8 +1,182 @@
 import os
+from dataclasses import dataclass
 from dotenv import load_dotenv
 
 #Загружаю переменные из окружения
 load_dotenv()
 
+
+def env_bool(name: str, default: bool) -> bool:
+    """Логическое значение переменной окружения (1/true/yes/on)"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return default if value is None or value == '' else int(value)
+
+
+def env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return default if value is None or value == '' else float(value)
+
+
 DSN = os.getenv('DSN')
-TEST_DSN = os.getenv('TEST_DSN')
\ No newline at end of file
+TEST_DSN = os.getenv('TEST_DSN')
+
+#Режим работы с БД: sync - синхронный драйвер в пуле потоков, async - асинхронный драйвер
+DB_MODE = os.getenv('DB_MODE', 'sync')
+if DB_MODE not in ('sync', 'async'):
+    raise ValueError(f"DB_MODE must be 'sync' or 'async', got {DB_MODE!r}")
+#DSN асинхронного драйвера; если не задан, выводится из DSN
+ASYNC_DSN = os.getenv('ASYNC_DSN')
+
+#Реплики для чтения: DSN через запятую. GET-запросы списка, задачи по ID,
+#поиска, подсчета и выгрузки идут на реплики, изменения - на основную БД (DSN)
+REPLICA_DSNS = [dsn.strip() for dsn in os.getenv('REPLICA_DSNS', '').split(',') if dsn.strip()]
+#Выбор реплики: round_robin - по очереди, least_busy - с наименьшим числом занятых соединений
+REPLICA_SELECTION = os.getenv('REPLICA_SELECTION', 'round_robin')
+if REPLICA_SELECTION not in ('round_robin', 'least_busy'):
+    raise ValueError(f"REPLICA_SELECTION must be 'round_robin' or 'least_busy', got {REPLICA_SELECTION!r}")
+#Сколько секунд после изменения клиент читает с основной БД (read-your-writes)
+REPLICA_STICKY_SECONDS = env_float('REPLICA_STICKY_SECONDS', 5)
+#Интервал проверки доступности реплик в секундах
+REPLICA_HEALTH_INTERVAL = env_float('REPLICA_HEALTH_INTERVAL', 5)
+
+
+
+@dataclass(frozen=True)
+class DatabaseSettings:
+    """Настройки пула соединений и сессий БД"""
+    #Постоянные соединения в пуле и допустимое превышение сверх них
+    pool_size: int = 5
+    max_overflow: int = 10
+    #Сколько секунд ждать свободное соединение, прежде чем вернуть ошибку
+    pool_timeout: float = 30.0
+    #Пересоздавать соединения старше указанного числа секунд (-1 - никогда)
+    pool_recycle: int = 1800
+    #Проверять соединение перед выдачей из пула (переживает failover и рестарт БД)
+    pool_pre_ping: bool = True
+    #Ограничение времени выполнения одного запроса в миллисекундах (0 - без ограничения)
+    statement_timeout_ms: int = 0
+    #Истекают ли ORM-объекты после commit (синхронные сессии)
+    expire_on_commit: bool = True
+    #Сколько соединений открыть при запуске приложения, чтобы первые запросы
+    #не ждали подключения (по умолчанию pool_size, 0 - не прогревать)
+    pool_warmup: int = 5
+
+    @classmethod
+    def from_env(cls, prefix: str = 'DB_') -> 'DatabaseSettings':
+        """Настройки из переменных окружения DB_POOL_SIZE, DB_MAX_OVERFLOW и т.д."""
+        defaults = cls()
+        pool_size = env_int(f'{prefix}POOL_SIZE', defaults.pool_size)
+        return cls(
+            pool_size=pool_size,
+            max_overflow=env_int(f'{prefix}MAX_OVERFLOW', defaults.max_overflow),
+            pool_timeout=env_float(f'{prefix}POOL_TIMEOUT', defaults.pool_timeout),
+            pool_recycle=env_int(f'{prefix}POOL_RECYCLE', defaults.pool_recycle),
+            pool_pre_ping=env_bool(f'{prefix}POOL_PRE_PING', defaults.pool_pre_ping),
+            statement_timeout_ms=env_int(f'{prefix}STATEMENT_TIMEOUT_MS', defaults.statement_timeout_ms),
+            expire_on_commit=env_bool(f'{prefix}EXPIRE_ON_COMMIT', defaults.expire_on_commit),
+            pool_warmup=env_int(f'{prefix}POOL_WARMUP', pool_size),
+        )
+
+
+DB_SETTINGS = DatabaseSettings.from_env()
+
+#Выполнять миграции (python -m app.migrate) при запуске приложения. По умолчанию
+#выключено: при нескольких процессах схему должен обновлять один шаг развертывания
+DB_AUTO_MIGRATE = env_bool('DB_AUTO_MIGRATE', False)
+
+#Пакетное создание задач
+BULK_CHUNK_SIZE = env_int('BULK_CHUNK_SIZE', 500)
+BULK_MAX_ITEMS = env_int('BULK_MAX_ITEMS', 10000)
+
+#Групповая фиксация POST /tasks/: одновременные запросы на создание вставляются
+#одним INSERT в одной транзакции. Пакет уходит, когда набралось MAX_BATCH задач
+#или прошло MAX_DELAY_MS миллисекунд с первой задачи пакета. В пакет попадают
+#только одновременные запросы, поэтому вместе с режимом стоит поднять
+#ADMISSION_WRITE_CONCURRENCY: пакет занимает одно соединение пула
+GROUP_COMMIT_ENABLED = env_bool('GROUP_COMMIT_ENABLED', False)
+GROUP_COMMIT_MAX_DELAY = env_float('GROUP_COMMIT_MAX_DELAY_MS', 2) / 1000
+GROUP_COMMIT_MAX_BATCH = env_int('GROUP_COMMIT_MAX_BATCH', 500)
+GROUP_COMMIT_QUEUE_SIZE = env_int('GROUP_COMMIT_QUEUE_SIZE', 10000)
+
+
+#Кэш чтения задач по ID
+TASK_CACHE_ENABLED = env_bool('TASK_CACHE_ENABLED', True)
+TASK_CACHE_SIZE = env_int('TASK_CACHE_SIZE', 10000)
+TASK_CACHE_TTL = env_float('TASK_CACHE_TTL', 30)
+
+
+#Счетчики задач для total=cached: время, через которое счетчики пересчитываются
+#из БД, чтобы учесть изменения из других процессов
+TASK_COUNT_TTL = env_float('TASK_COUNT_TTL', 60)
+
+
+#Потоковая выгрузка задач: количество строк, читаемых из курсора БД за раз
+EXPORT_BATCH_SIZE = env_int('EXPORT_BATCH_SIZE', 1000)
+
+
+#Ключи идемпотентности (заголовок Idempotency-Key): сколько секунд хранится ответ
+IDEMPOTENCY_TTL = env_int('IDEMPOTENCY_TTL', 86400)
+
+
+#Физическое удаление мягко удаленных задач (python -m app.purge)
+PURGE_BATCH_SIZE = env_int('PURGE_BATCH_SIZE', 500)
+PURGE_INTERVAL = env_float('PURGE_INTERVAL', 1.0)
+PURGE_RETENTION = env_int('PURGE_RETENTION', 3600)
+PURGE_IDLE_INTERVAL = env_float('PURGE_IDLE_INTERVAL', 60)
+#Окно работы по UTC в часах [start, end); при start == end удаление идет круглосуточно
+PURGE_WINDOW_START = env_int('PURGE_WINDOW_START', 1)
+PURGE_WINDOW_END = env_int('PURGE_WINDOW_END', 5)
+
+
+#Полнотекстовый поиск: конфигурация разбора текста PostgreSQL (simple, russian, english, ...).
+#Входит в выражение GIN-индекса, поэтому после ее смены индекс нужно пересоздать
+SEARCH_CONFIG = os.getenv('SEARCH_CONFIG', 'simple')
+if not SEARCH_CONFIG.isidentifier():
+    raise ValueError(f"SEARCH_CONFIG must be a text search configuration name, got {SEARCH_CONFIG!r}")
+
+
+#Лента изменений задач (GET /tasks/events).
+#local - события только внутри процесса, postgres - между процессами через LISTEN/NOTIFY
+EVENTS_BACKEND = os.getenv('EVENTS_BACKEND', 'local')
+if EVENTS_BACKEND not in ('local', 'postgres'):
+    raise ValueError(f"EVENTS_BACKEND must be 'local' or 'postgres', got {EVENTS_BACKEND!r}")
+EVENTS_CHANNEL = os.getenv('EVENTS_CHANNEL', 'task_events')
+if not EVENTS_CHANNEL.isidentifier():
+    raise ValueError(f"EVENTS_CHANNEL must be an identifier, got {EVENTS_CHANNEL!r}")
+#Очередь одного подписчика: при переполнении подписчик отключается
+EVENTS_QUEUE_SIZE = env_int('EVENTS_QUEUE_SIZE', 1000)
+#Сколько последних событий хранится для продолжения ленты после переподключения
+EVENTS_BACKLOG = env_int('EVENTS_BACKLOG', 10000)
+EVENTS_HEARTBEAT = env_float('EVENTS_HEARTBEAT', 15)
+
+#Контроль допуска запросов к /tasks: при перегрузке БД лишние запросы быстро
+#получают 503 Retry-After, а не копятся в очереди за соединениями пула.
+#Чтения и изменения ограничиваются отдельно; сумма лимитов одновременных запросов
+#не должна превышать DB_POOL_SIZE + DB_MAX_OVERFLOW
+ADMISSION_ENABLED = env_bool('ADMISSION_ENABLED', True)
+ADMISSION_READ_CONCURRENCY = env_int('ADMISSION_READ_CONCURRENCY', 10)
+ADMISSION_READ_QUEUE = env_int('ADMISSION_READ_QUEUE', 100)
+ADMISSION_READ_MAX_WAIT = env_float('ADMISSION_READ_MAX_WAIT', 0.5)
+ADMISSION_WRITE_CONCURRENCY = env_int('ADMISSION_WRITE_CONCURRENCY', 5)
+ADMISSION_WRITE_QUEUE = env_int('ADMISSION_WRITE_QUEUE', 50)
+ADMISSION_WRITE_MAX_WAIT = env_float('ADMISSION_WRITE_MAX_WAIT', 2.0)
+#Лимиты отдельных маршрутов поверх лимитов чтения и изменения:
+#"GET /tasks/export=2,POST /tasks/bulk=4"
+ADMISSION_ROUTE_LIMITS = os.getenv('ADMISSION_ROUTE_LIMITS', '')
+#Через сколько секунд клиенту повторить отклоненный запрос (заголовок Retry-After)
+ADMISSION_RETRY_AFTER = env_int('ADMISSION_RETRY_AFTER', 1)
+#Ограничение частоты запросов одного клиента (X-Client-Id или IP): запросов
+#в секунду и размер всплеска; 0 - без ограничения
+ADMISSION_CLIENT_RATE = env_float('ADMISSION_CLIENT_RATE', 0)
+ADMISSION_CLIENT_BURST = env_int('ADMISSION_CLIENT_BURST', 20)
+
+
+#Метрики Prometheus и middleware замера запросов
+METRICS_ENABLED = env_bool('METRICS_ENABLED', True)
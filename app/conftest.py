@@ -1,10 +1,16 @@
 import pytest
+from fastapi import FastAPI
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool, StaticPool
+from app.api.api import TaskAPIRouter
+from app.api.dependencies import get_async_task_service
 from app.config import TEST_DSN
-from app.database import Base, get_db
+from app.crud.cache import task_cache
+from app.crud.counts import task_counter
+from app.database import Base, get_async_db, get_db, to_async_dsn
 from main import app
 
 
@@ -21,6 +27,8 @@ TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engin
 def db_session():
     """Создает свежую сессию БД для каждого теста"""
     Base.metadata.create_all(bind=engine)
+    task_cache.clear()
+    task_counter.clear()
     db = TestingSessionLocal()
     try:
         yield db
@@ -45,6 +53,41 @@ def client(db_session):
     app.dependency_overrides.clear()
 
 
+@pytest.fixture(scope="function")
+def async_client(tmp_path):
+    """Тестовый клиент с асинхронным сервисом задач на aiosqlite"""
+    dsn = f"sqlite:///{tmp_path / 'async.db'}"
+    sync_engine = create_engine(dsn)
+    Base.metadata.create_all(bind=sync_engine)
+    
+    async_engine = create_async_engine(to_async_dsn(dsn), poolclass=NullPool)
+    AsyncTestingSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+    
+    async def override_get_async_db():
+        async with AsyncTestingSessionLocal() as db:
+            yield db
+    
+    async_app = FastAPI()
+    async_app.include_router(TaskAPIRouter(get_async_task_service).router, prefix='/tasks')
+    async_app.dependency_overrides[get_async_db] = override_get_async_db
+    with TestClient(async_app) as test_client:
+        yield test_client
+    sync_engine.dispose()
+
+
+@pytest.fixture
+def sql_statements():
+    """Список SQL-запросов, выполненных тестовым движком во время теста"""
+    statements = []
+    
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    event.listen(engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(engine, "before_cursor_execute", record)
+
+
 @pytest.fixture
 def task_service(db_session):
     """Фикстура для сервиса задач"""
@@ -0,0 +1,184 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+from app.config import TASK_CACHE_ENABLED, TASK_CACHE_SIZE, TASK_CACHE_TTL
+
+
+class CacheBackend(ABC):
+    """Интерфейс кэша задач
+
+    Чтение из БД с последующей записью в кэш должно начинаться с вызова
+    begin_read(), а полученный токен передаваться в set(). Если ключ был
+    инвалидирован после begin_read(), запись отбрасывается: так конкурентное
+    чтение не может вернуть в кэш уже удаленную или измененную задачу.
+    """
+
+    @abstractmethod
+    def get(self, key: Hashable) -> Any | None:
+        """Значение по ключу или None, если его нет в кэше"""
+
+    @abstractmethod
+    def begin_read(self) -> int:
+        """Токен для последующего set() после чтения из источника"""
+
+    @abstractmethod
+    def set(self, key: Hashable, value: Any, token: int | None = None) -> None:
+        """Сохранить значение, если ключ не инвалидирован после получения токена"""
+
+    @abstractmethod
+    def delete(self, key: Hashable) -> None:
+        """Инвалидировать ключ"""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Очистить кэш"""
+
+    @abstractmethod
+    def stats(self) -> dict:
+        """Счетчики попаданий, промахов и вытеснений"""
+
+
+class NullCache(CacheBackend):
+    """Отключенный кэш: всегда промах"""
+
+    def get(self, key: Hashable) -> Any | None:
+        return None
+
+    def begin_read(self) -> int:
+        return 0
+
+    def set(self, key: Hashable, value: Any, token: int | None = None) -> None:
+        pass
+
+    def delete(self, key: Hashable) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {'enabled': False}
+
+
+class LRUTTLCache(CacheBackend):
+    """Ограниченный по размеру LRU-кэш с временем жизни записей внутри процесса"""
+
+    def __init__(self, maxsize: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        # Номер последней инвалидации для ключа; журнал ограничен maxsize записями
+        self._sequence = 0
+        self._invalidated: OrderedDict[Hashable, int] = OrderedDict()
+        self._invalidated_floor = 0
+        self._counters = dict.fromkeys(('hits', 'misses', 'evictions', 'expirations', 'invalidations', 'rejected'), 0)
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters['misses'] += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self._counters['expirations'] += 1
+                self._counters['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters['hits'] += 1
+            return value
+
+    def begin_read(self) -> int:
+        with self._lock:
+            return self._sequence
+
+    def set(self, key: Hashable, value: Any, token: int | None = None) -> None:
+        with self._lock:
+            if token is not None and self._is_stale(key, token):
+                self._counters['rejected'] += 1
+                return
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+            self._sequence += 1
+            self._invalidated[key] = self._sequence
+            self._invalidated.move_to_end(key)
+            while len(self._invalidated) > self.maxsize:
+                _, sequence = self._invalidated.popitem(last=False)
+                self._invalidated_floor = sequence
+            self._counters['invalidations'] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            # Все начатые до очистки чтения считаются устаревшими
+            self._sequence += 1
+            self._invalidated.clear()
+            self._invalidated_floor = self._sequence
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'enabled': True,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                **self._counters,
+            }
+
+    def _is_stale(self, key: Hashable, token: int) -> bool:
+        # Журнал инвалидаций усечен: о ключе ничего не известно, отказываю в записи
+        if token < self._invalidated_floor:
+            return True
+        return self._invalidated.get(key, 0) > token
+
+
+class ReadOnlyCache(CacheBackend):
+    """Кэш, из которого только читают: запись и инвалидация передаются в no-op
+
+    Для чтений с реплик: реплика может отставать от основной БД, и ее данные,
+    попавшие в общий кэш, вернули бы уже измененную задачу до истечения TTL.
+    """
+
+    def __init__(self, cache: CacheBackend):
+        self.cache = cache
+
+    def get(self, key: Hashable) -> Any | None:
+        return self.cache.get(key)
+
+    def begin_read(self) -> int:
+        return 0
+
+    def set(self, key: Hashable, value: Any, token: int | None = None) -> None:
+        pass
+
+    def delete(self, key: Hashable) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+
+def create_task_cache() -> CacheBackend:
+    """Кэш задач по настройкам из окружения"""
+    if not TASK_CACHE_ENABLED:
+        return NullCache()
+    return LRUTTLCache(maxsize=TASK_CACHE_SIZE, ttl=TASK_CACHE_TTL)
+
+
+task_cache = create_task_cache()
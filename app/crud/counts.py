@@ -0,0 +1,98 @@
+import json
+import threading
+import time
+from typing import Callable, get_args
+
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.base import Executable
+from sqlalchemy.sql.elements import ClauseElement
+
+from app.config import TASK_COUNT_TTL
+from app.schemas.task import TaskStatus
+
+#Все статусы задачи в порядке объявления
+TASK_STATUSES = get_args(TaskStatus)
+
+
+class TaskCounter:
+    """Счетчики задач по статусам внутри процесса
+
+    Загружаются точным подсчетом и дальше поддерживаются записями TaskService
+    после фиксации транзакции. Если запись не знает, как изменились счетчики
+    (например, статус изменен без чтения прежнего), счетчики сбрасываются и
+    при следующем чтении пересчитываются. Через ttl секунд счетчики тоже
+    пересчитываются, чтобы учесть изменения из других процессов.
+
+    Как и в кэше задач, пересчет начинается с begin_read(), а результат
+    отбрасывается в set(), если после begin_read() была запись.
+    """
+
+    def __init__(self, ttl: float = TASK_COUNT_TTL, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._counts: dict[str, int] | None = None
+        self._expires_at = 0.0
+        self._sequence = 0
+
+    def get(self) -> dict[str, int] | None:
+        """Счетчики по статусам или None, если их нужно пересчитать"""
+        with self._lock:
+            if self._counts is None or self._expires_at <= self._clock():
+                return None
+            return dict(self._counts)
+
+    def begin_read(self) -> int:
+        """Токен для последующего set() после подсчета в БД"""
+        with self._lock:
+            return self._sequence
+
+    def set(self, counts: dict[str, int], token: int) -> None:
+        """Сохранить пересчитанные счетчики, если после получения токена не было записей"""
+        with self._lock:
+            if token != self._sequence:
+                return
+            self._counts = {status: counts.get(status, 0) for status in TASK_STATUSES}
+            self._expires_at = self._clock() + self.ttl
+
+    def add(self, deltas: dict[str, int]) -> None:
+        """Учесть зафиксированную запись: изменения числа задач по статусам"""
+        with self._lock:
+            self._sequence += 1
+            if self._counts is None:
+                return
+            for status, delta in deltas.items():
+                self._counts[status] = self._counts.get(status, 0) + delta
+
+    def invalidate(self) -> None:
+        """Сбросить счетчики: следующее чтение пересчитает их в БД"""
+        with self._lock:
+            self._sequence += 1
+            self._counts = None
+
+    clear = invalidate
+
+
+class explain(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) для запроса: план без выполнения (только PostgreSQL)"""
+
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(explain, 'postgresql')
+def _compile_explain(element, compiler, **kw):
+    return 'EXPLAIN (FORMAT JSON) ' + compiler.process(element.statement, **kw)
+
+
+def plan_rows(plan) -> int:
+    """Оценка числа строк верхнего узла плана из вывода EXPLAIN (FORMAT JSON)"""
+    # psycopg2 разбирает json сам, asyncpg возвращает строку
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+task_counter = TaskCounter()
@@ -0,0 +1,175 @@
+"""Групповая фиксация создаваемых задач
+
+При потоке POST /tasks/ от множества клиентов каждая задача фиксируется
+своей транзакцией, и время уходит на сброс WAL на диск, а не на вставку.
+GroupCommitWriter собирает одновременные запросы на создание в очередь
+процесса и вставляет их одним многострочным INSERT в одной транзакции:
+пакет уходит, когда набралось max_batch задач или прошло max_delay секунд
+с первой задачи пакета. Каждый запрос получает свою задачу (или свою
+ошибку) только после фиксации пакета.
+"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncContextManager, AsyncIterator, Callable
+
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from starlette.concurrency import run_in_threadpool
+
+from app.config import DB_MODE, GROUP_COMMIT_MAX_BATCH, GROUP_COMMIT_MAX_DELAY, GROUP_COMMIT_QUEUE_SIZE
+from app.crud.task_async import AsyncTaskService, ThreadedTaskService
+from app.database import AsyncSessionLocal, SessionLocal, get_async_engine, get_engine
+from app.models.task import Task
+from app.schemas.task import TaskCreate
+
+logger = logging.getLogger(__name__)
+
+#Признак остановки в очереди записи
+_STOP = object()
+
+
+@asynccontextmanager
+async def task_service_scope() -> AsyncIterator[AsyncTaskService]:
+    """Сервис задач на отдельной сессии для режима из конфигурации (DB_MODE)"""
+    if DB_MODE == 'async':
+        get_async_engine()
+        async with AsyncSessionLocal() as db:
+            yield AsyncTaskService(db)
+        return
+    get_engine()
+    db = SessionLocal()
+    try:
+        yield ThreadedTaskService(db)
+    finally:
+        await run_in_threadpool(db.close)
+
+
+class GroupCommitWriter:
+    """Очередь создания задач, фиксируемая пакетами
+
+    Пакеты записываются по одному: пока пакет фиксируется, в очереди
+    собирается следующий, поэтому чем выше нагрузка, тем крупнее пакеты.
+    Если пакет нарушает ограничения БД, его задачи создаются по одной,
+    и ошибка достается только запросу с некорректной задачей. Очередь
+    ограничена queue_size: при ее заполнении submit ждет места.
+
+    Запускается при первом вызове submit в текущем цикле событий.
+    """
+
+    def __init__(
+        self,
+        service_scope: Callable[[], AsyncContextManager[AsyncTaskService]] = task_service_scope,
+        max_batch: int = GROUP_COMMIT_MAX_BATCH,
+        max_delay: float = GROUP_COMMIT_MAX_DELAY,
+        queue_size: int = GROUP_COMMIT_QUEUE_SIZE,
+    ):
+        self.service_scope = service_scope
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.queue_size = queue_size
+        self.batches = 0
+        self.tasks = 0
+        self.largest_batch = 0
+        self.fallbacks = 0
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    async def submit(self, task: TaskCreate) -> Task:
+        """Поставить задачу в очередь и дождаться ее фиксации в составе пакета"""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((task, future))
+        return await future
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._worker is not None and not self._worker.done():
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue(self.queue_size)
+        self._worker = loop.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Записать задачи, уже стоящие в очереди, и остановить запись"""
+        worker = self._worker
+        if worker is None or worker.done() or self._loop is not asyncio.get_running_loop():
+            return
+        await self._queue.put(_STOP)
+        await worker
+        self._worker = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                try:
+                    if timeout > 0:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    else:
+                        item = self._queue.get_nowait()
+                except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+    async def _flush(self, batch: list[tuple[TaskCreate, asyncio.Future]]) -> None:
+        """Зафиксировать пакет и передать каждому запросу его задачу или ошибку"""
+        self.batches += 1
+        self.tasks += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        try:
+            async with self.service_scope() as service:
+                try:
+                    result = await service.create_tasks([task for task, _ in batch], chunk_size=self.max_batch)
+                except IntegrityError:
+                    #Одна из задач нарушает ограничения БД: создаю задачи по одной
+                    self.fallbacks += 1
+                    for task, future in batch:
+                        try:
+                            _resolve(future, await service.create_task(task))
+                        except SQLAlchemyError as e:
+                            _fail(future, e)
+                    return
+        except Exception as e:
+            logger.error(f"Error creating tasks in group commit: {str(e)}")
+            for _, future in batch:
+                _fail(future, e)
+            return
+        for (_, future), created in zip(batch, result.created):
+            _resolve(future, created)
+
+    def stats(self) -> dict:
+        return {
+            'max_batch': self.max_batch,
+            'max_delay_ms': self.max_delay * 1000,
+            'queued': self._queue.qsize() if self._queue is not None else 0,
+            'batches': self.batches,
+            'tasks': self.tasks,
+            'largest_batch': self.largest_batch,
+            'fallbacks': self.fallbacks,
+        }
+
+
+def _resolve(future: asyncio.Future, task: Task) -> None:
+    #Запрос мог быть отменен (клиент отключился), пока пакет фиксировался
+    if not future.done():
+        future.set_result(task)
+
+
+def _fail(future: asyncio.Future, error: Exception) -> None:
+    if not future.done():
+        future.set_exception(error)
+
+
+task_writer = GroupCommitWriter()
@@ -0,0 +1,135 @@
+import hashlib
+import json
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable
+from sqlalchemy import and_, delete, select, tuple_
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session
+from app.config import IDEMPOTENCY_TTL
+from app.models.idempotency import IdempotencyKey
+from app.models.task import utcnow
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyKeyReusedError(Exception):
+    """Ключ уже использован для запроса с другим телом или параметрами"""
+
+    def __init__(self, key: str):
+        super().__init__(f"Idempotency key {key!r} was used for a different request")
+        self.key = key
+
+
+class DuplicateRequestError(Exception):
+    """Запрос с тем же ключом зафиксирован одновременно с текущим"""
+
+    def __init__(self, key: str):
+        super().__init__(f"Request with idempotency key {key!r} is already completed")
+        self.key = key
+
+
+@dataclass(frozen=True)
+class IdempotentRequest:
+    """Ключ идемпотентности запроса, его операция и отпечаток"""
+    scope: str
+    key: str
+    fingerprint: str
+
+
+def request_fingerprint(*parts: Any) -> str:
+    """Отпечаток запроса по его телу и параметрам (JSON-совместимые значения)"""
+    payload = json.dumps(parts, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """Хранилище ответов по ключам идемпотентности в таблице idempotency_keys
+
+    Ответ сохраняется в той же транзакции, что и изменение, поэтому повтор
+    запроса получает сохраненный ответ, а изменение не выполняется дважды.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        ttl: float = IDEMPOTENCY_TTL,
+        clock: Callable[[], datetime] = utcnow,
+    ):
+        self.db = db
+        self.ttl = timedelta(seconds=ttl)
+        self.clock = clock
+
+    def get(self, request: IdempotentRequest) -> str | None:
+        """Сохраненное тело ответа для ключа или None, если ключ новый или истек
+
+        Истекшая запись удаляется, чтобы ключ можно было использовать снова.
+        """
+        now = self.clock()
+        condition = and_(IdempotencyKey.scope == request.scope, IdempotencyKey.key == request.key)
+        try:
+            record = self.db.execute(
+                select(
+                    IdempotencyKey.fingerprint,
+                    IdempotencyKey.response,
+                    (IdempotencyKey.expires_at <= now).label('expired'),
+                ).where(condition)
+            ).first()
+            if record is None:
+                return None
+            if record.expired:
+                self.db.execute(delete(IdempotencyKey).where(condition, IdempotencyKey.expires_at <= now))
+                self.db.commit()
+                return None
+            if record.fingerprint != request.fingerprint:
+                raise IdempotencyKeyReusedError(request.key)
+            return record.response
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            logger.error(f"Error reading idempotency key {request.key!r}: {str(e)}")
+            raise
+
+    def save(self, request: IdempotentRequest, body: str) -> None:
+        """Добавить ответ в текущую транзакцию
+
+        Вызывается после изменения и до commit. Если тот же ключ уже
+        зафиксирован другим запросом, транзакция откатывается целиком
+        и выбрасывается DuplicateRequestError.
+        """
+        now = self.clock()
+        self.db.add(IdempotencyKey(
+            scope=request.scope,
+            key=request.key,
+            fingerprint=request.fingerprint,
+            response=body,
+            created_at=now,
+            expires_at=now + self.ttl,
+        ))
+        try:
+            self.db.flush()
+        except IntegrityError:
+            self.db.rollback()
+            raise DuplicateRequestError(request.key)
+
+    def purge_expired(self, limit: int) -> int:
+        """Удалить до limit истекших ключей в своей транзакции и вернуть их число"""
+        expired = (
+            select(IdempotencyKey.scope, IdempotencyKey.key)
+            .where(IdempotencyKey.expires_at <= self.clock())
+            .order_by(IdempotencyKey.expires_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        try:
+            result = self.db.execute(
+                delete(IdempotencyKey)
+                .where(tuple_(IdempotencyKey.scope, IdempotencyKey.key).in_(expired))
+                .execution_options(synchronize_session=False)
+            )
+            self.db.commit()
+            return result.rowcount
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            logger.error(f"Error purging idempotency keys: {str(e)}")
+            raise
@@ -0,0 +1,33 @@
+import base64
+import json
+from datetime import datetime
+from uuid import UUID
+
+
+class InvalidCursorError(ValueError):
+    """Курсор пагинации поврежден или не может быть разобран"""
+
+
+def encode_cursor(created_at: datetime, task_id: UUID, order: str = 'asc') -> str:
+    """Упаковать ключ сортировки последней задачи страницы в непрозрачный курсор"""
+    payload = json.dumps(
+        {'c': created_at.isoformat(), 'i': str(task_id), 'o': order},
+        separators=(',', ':'),
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, order: str = 'asc') -> tuple[datetime, UUID]:
+    """Распаковать курсор в пару (created_at, id)
+
+    Курсор действителен только для того же направления сортировки,
+    в котором был выдан.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if payload.get('o', 'asc') != order:
+            raise InvalidCursorError(f"Cursor was issued for order {payload.get('o')!r}")
+        return datetime.fromisoformat(payload['c']), UUID(payload['i'])
+    except (ValueError, TypeError, KeyError, AttributeError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {cursor!r}") from e
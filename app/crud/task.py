@@ -1,72 +1,829 @@
+from sqlalchemy import and_, false, func, insert, literal_column, select, tuple_, update
+from sqlalchemy.engine import Row
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+import re
+from collections import Counter
+from typing import Callable, Collection, Iterator
 from uuid import UUID
-from app.models.task import Task
-from app.schemas.task import TaskCreate, TaskUpdate
-from sqlalchemy.exc import SQLAlchemyError
+from dataclasses import dataclass, field
+from app.config import BULK_CHUNK_SIZE, EXPORT_BATCH_SIZE
+from app.models.task import Task, search_document, search_query, tasks_fts, utcnow
+from app.schemas.task import (
+    Task as TaskSchema, TaskBulkDeleteResult, TaskBulkResult, TaskBulkTarget, TaskBulkUpdate, TaskBulkUpdateResult,
+    TaskCreate, TaskFilter, TaskUpdate,
+)
+from pydantic import BaseModel
+from app.crud.cache import CacheBackend, task_cache
+from app.crud.counts import TASK_STATUSES, TaskCounter, explain, plan_rows, task_counter
+from app.events import EventBroker, created_event, deleted_event, task_events, updated_event, updated_id_event
+from app.crud.idempotency import IdempotencyStore, IdempotentRequest
+from app.crud.pagination import decode_cursor, encode_cursor
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 import logging
 
 logger = logging.getLogger(__name__)
 
+#Слова поискового запроса для FTS5: остальные символы - операторы синтаксиса запроса
+SEARCH_TOKEN = re.compile(r'\w+')
+
+#Условие "задача не удалена": входит во все чтения и изменения
+NOT_DELETED = Task.deleted_at.is_(None)
+
+#Сколько раз изменение через ORM повторяется после конкурентного изменения задачи
+ORM_WRITE_ATTEMPTS = 3
+
+#Колонки задачи в выгрузке
+TASK_COLUMNS = (Task.id, Task.title, Task.description, Task.status)
+#Колонки задачи в ответах API (поля схемы Task) и ключ сортировки для курсора
+RESPONSE_COLUMNS = tuple(getattr(Task, name) for name in TaskSchema.model_fields) + (Task.created_at,)
+#Колонки, которые читаются при любом наборе полей: для ETag и курсора следующей страницы
+KEY_COLUMNS = ('id', 'version')
+
+
+def response_columns(fields: Collection[str] | None = None) -> tuple:
+    """Колонки ответа API только для выбранных полей задачи (все, если fields не задан)"""
+    if fields is None:
+        return RESPONSE_COLUMNS
+    names = [name for name in TaskSchema.model_fields if name in fields or name in KEY_COLUMNS]
+    return tuple(getattr(Task, name) for name in names) + (Task.created_at,)
+
+
+class VersionConflictError(Exception):
+    """Версия задачи не совпала с ожидаемой: задачу изменили после того, как клиент ее прочитал"""
+
+    def __init__(self, task_id: UUID, current_version: int):
+        super().__init__(f"Task {task_id} is at version {current_version}")
+        self.task_id = task_id
+        self.current_version = current_version
+
+
+@dataclass
+class BulkItemError:
+    """Ошибка вставки одной задачи пакета"""
+    index: int
+    detail: str
+
+
+@dataclass
+class BulkCreateResult:
+    """Результат пакетного создания: созданные задачи и ошибки по позициям"""
+    created: list[Task] = field(default_factory=list)
+    errors: list[BulkItemError] = field(default_factory=list)
+
+
+@dataclass
+class TaskCounts:
+    """Число задач: всего и по статусам, с режимом, которым оно получено"""
+    total: int
+    by_status: dict[str, int]
+    mode: str
+
+
+@dataclass
+class BulkUpdateResult:
+    """Результат пакетного обновления: число измененных задач и сами задачи, если запрошены"""
+    updated: int = 0
+    tasks: list[Task] | None = None
+
+
 class TaskService:
     """Сервис для работы с задачами"""
     
-    def __init__(self, db: Session):
+    def __init__(
+        self,
+        db: Session,
+        cache: CacheBackend | None = None,
+        counter: TaskCounter | None = None,
+        events: EventBroker | None = None,
+    ):
         self.db = db
+        self.cache = cache if cache is not None else task_cache
+        self.counter = counter if counter is not None else task_counter
+        self.events = events if events is not None else task_events
+
+    def _publish(self, build: Callable[[], list[dict]]) -> None:
+        """Опубликовать события зафиксированных изменений, если их кто-то получает"""
+        self.events.publish_changes(build)
     
+    def get_stored_response(self, request: IdempotentRequest) -> str | None:
+        """Сохраненный ответ на запрос с тем же ключом идемпотентности"""
+        return IdempotencyStore(self.db).get(request)
+
+    def _store_response(self, request: IdempotentRequest | None, build: Callable[[], BaseModel]) -> None:
+        """Сохранить ответ для ключа идемпотентности в текущей транзакции"""
+        if request is not None:
+            IdempotencyStore(self.db).save(request, build().model_dump_json())
+
     def get_task(self, task_id: UUID) -> Task | None:
         """Получить задачу по ID"""
         try:
-            return self.db.query(Task).filter(Task.id == task_id).first()
+            return self.db.query(Task).filter(Task.id == task_id, NOT_DELETED).first()
         except SQLAlchemyError as e:
             logger.error(f"Error getting task {task_id}: {str(e)}")
             raise
     
-    def get_tasks(self, skip: int = 0, limit: int = 100) -> list[Task]:
-        """Получить список задач с пагинацией"""
+    def get_task_cached(self, task_id: UUID) -> TaskSchema | None:
+        """Получить задачу по ID через кэш чтения
+
+        Возвращает снимок задачи (схему), а не ORM-объект.
+        """
+        cached = self.cache.get(task_id)
+        if cached is not None:
+            return cached
+        return self.load_task_snapshot(task_id)
+    
+    def get_task_version(self, task_id: UUID) -> int | None:
+        """Версия задачи без чтения остальных колонок
+
+        Для проверки If-None-Match: сначала смотрю в кэш, затем читаю
+        из БД одну колонку version.
+        """
+        cached = self.cache.get(task_id)
+        if cached is not None:
+            return cached.version
         try:
-            return self.db.query(Task).offset(skip).limit(limit).all()
+            return self.db.execute(select(Task.version).where(Task.id == task_id, NOT_DELETED)).scalar_one_or_none()
+        except SQLAlchemyError as e:
+            logger.error(f"Error getting task version {task_id}: {str(e)}")
+            raise
+    
+    def load_task_snapshot(self, task_id: UUID) -> TaskSchema | None:
+        """Прочитать задачу из БД и сохранить снимок в кэш
+
+        Снимок не сохраняется, если задача была изменена или удалена
+        за время чтения.
+        """
+        token = self.cache.begin_read()
+        db_task = self.get_task(task_id)
+        if db_task is None:
+            return None
+        snapshot = TaskSchema.model_validate(db_task)
+        self.cache.set(task_id, snapshot, token)
+        return snapshot
+    
+    def get_tasks(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: str | None = None,
+        filters: TaskFilter | None = None,
+        order: str = 'asc',
+    ) -> list[Task]:
+        """Получить список задач с пагинацией
+
+        Задачи упорядочены по (created_at, id) в направлении order. Если передан
+        курсор, страница начинается сразу после задачи, на которую он указывает
+        (keyset-пагинация), а skip игнорируется.
+        """
+        try:
+            return self._tasks_query(skip, limit, cursor, filters, order).all()
         except SQLAlchemyError as e:
             logger.error(f"Error getting tasks list: {str(e)}")
             raise
+
+    def get_task_partial(self, task_id: UUID, fields: Collection[str] | None = None) -> TaskSchema | Row | None:
+        """Задача с выбранными полями: снимок из кэша или строка только этих колонок
+
+        При промахе кэш не заполняется: в строке нет остальных полей.
+        """
+        cached = self.cache.get(task_id)
+        if cached is not None:
+            return cached
+        try:
+            return self.db.execute(
+                select(*response_columns(fields)).where(Task.id == task_id, NOT_DELETED)
+            ).first()
+        except SQLAlchemyError as e:
+            logger.error(f"Error getting task {task_id}: {str(e)}")
+            raise
+
+    def get_task_rows(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: str | None = None,
+        filters: TaskFilter | None = None,
+        order: str = 'asc',
+        fields: Collection[str] | None = None,
+    ) -> list[Row]:
+        """Страница списка задач строками колонок ответа API
+
+        Тот же запрос, что и get_tasks, но без создания ORM-объектов: строки
+        сразу кодируются в ответ, минуя проверку схемой Pydantic. Если задан
+        fields, читаются только эти колонки (и id, version, created_at):
+        описание задачи не читается из БД, если оно не запрошено.
+        """
+        try:
+            return self._tasks_query(skip, limit, cursor, filters, order, response_columns(fields)).all()
+        except SQLAlchemyError as e:
+            logger.error(f"Error getting tasks list: {str(e)}")
+            raise
+
+    def get_task_versions(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: str | None = None,
+        filters: TaskFilter | None = None,
+        order: str = 'asc',
+    ) -> list[Row]:
+        """Ключи страницы списка задач: (id, version, created_at)
+
+        Тот же запрос, что и get_tasks, но без названия и описания. Этого
+        достаточно для ETag страницы и курсора следующей страницы.
+        """
+        try:
+            entities = (Task.id, Task.version, Task.created_at)
+            return self._tasks_query(skip, limit, cursor, filters, order, entities).all()
+        except SQLAlchemyError as e:
+            logger.error(f"Error getting tasks versions: {str(e)}")
+            raise
+
+    def _tasks_query(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: str | None = None,
+        filters: TaskFilter | None = None,
+        order: str = 'asc',
+        entities: tuple = (Task,),
+    ):
+        """Запрос страницы списка задач
+
+        Фильтры и сортировка покрываются индексами модели Task:
+        (status, created_at, id), (created_at, id) и title.
+        """
+        query = self.db.query(*entities).filter(NOT_DELETED)
+        if filters is not None:
+            query = query.filter(*self._filter_clauses(filters))
+
+        sort_key = tuple_(Task.created_at, Task.id)
+        if order == 'desc':
+            query = query.order_by(Task.created_at.desc(), Task.id.desc())
+        else:
+            query = query.order_by(Task.created_at, Task.id)
+
+        if cursor is not None:
+            created_at, task_id = decode_cursor(cursor, order)
+            position = tuple_(created_at, task_id)
+            query = query.filter(sort_key < position if order == 'desc' else sort_key > position)
+        elif skip:
+            query = query.offset(skip)
+        return query.limit(limit)
+
+    def search_tasks(
+        self,
+        query: str,
+        skip: int = 0,
+        limit: int = 100,
+        filters: TaskFilter | None = None,
+    ) -> list[Task]:
+        """Полнотекстовый поиск по названию и описанию
+
+        Результаты упорядочены по релевантности. На PostgreSQL используется
+        GIN-индекс по to_tsvector и websearch_to_tsquery (поддерживает "фразы",
+        OR и -исключения), в SQLite - FTS5-таблица tasks_fts и ранжирование bm25,
+        где задача должна содержать все слова запроса.
+        """
+        return list(self._search(query, skip, limit, filters, (Task,)).scalars())
+
+    def search_task_rows(
+        self,
+        query: str,
+        skip: int = 0,
+        limit: int = 100,
+        filters: TaskFilter | None = None,
+    ) -> list[Row]:
+        """Полнотекстовый поиск, возвращающий строки колонок ответа API"""
+        return list(self._search(query, skip, limit, filters, RESPONSE_COLUMNS))
+
+    def _search(self, query: str, skip: int, limit: int, filters: TaskFilter | None, entities: tuple):
+        try:
+            if self.db.get_bind().dialect.name == 'postgresql':
+                statement = self._search_statement_postgresql(query, entities)
+            else:
+                statement = self._search_statement_sqlite(query, entities)
+            if filters is not None:
+                statement = statement.where(*self._filter_clauses(filters))
+            return self.db.execute(statement.offset(skip).limit(limit))
+        except SQLAlchemyError as e:
+            logger.error(f"Error searching tasks: {str(e)}")
+            raise
+
+    def _search_statement_postgresql(self, query: str, entities: tuple):
+        document, ts_query = search_document(), search_query(query)
+        rank = func.ts_rank_cd(document, ts_query)
+        return select(*entities).where(document.op('@@')(ts_query), NOT_DELETED).order_by(rank.desc(), Task.id)
+
+    def _search_statement_sqlite(self, query: str, entities: tuple):
+        # Каждое слово в кавычках: пользовательский ввод не разбирается как синтаксис FTS5
+        tokens = SEARCH_TOKEN.findall(query)
+        statement = select(*entities).select_from(Task).where(NOT_DELETED)
+        if not tokens:
+            return statement.where(false())
+        match = ' '.join(f'"{token}"' for token in tokens)
+        fts = literal_column('tasks_fts')
+        return (
+            statement
+            .join(tasks_fts, tasks_fts.c.rowid == literal_column('tasks.rowid'))
+            .where(fts.match(match))
+            .order_by(func.bm25(fts), Task.id)
+        )
+
+    def count_tasks(self, filters: TaskFilter | None = None, mode: str = 'exact') -> TaskCounts:
+        """Число задач, подходящих под фильтр, всего и по статусам
+
+        Режимы:
+        - exact: точный COUNT с группировкой по статусу (читает все подходящие строки)
+        - estimated: оценка планировщика PostgreSQL по статистике таблицы, без чтения строк.
+          На других СУБД вместо нее используется cached
+        - cached: счетчики процесса, которые поддерживают записи TaskService.
+          С фильтром по title_prefix используется exact
+
+        Режим, которым число получено на самом деле, возвращается в поле mode.
+        """
+        statuses = filters.status if filters is not None and filters.status else TASK_STATUSES
+        title_prefix = filters.title_prefix if filters is not None else None
+        if mode == 'estimated' and self.db.get_bind().dialect.name != 'postgresql':
+            mode = 'cached'
+        if mode == 'cached' and title_prefix is not None:
+            mode = 'exact'
+        try:
+            if mode == 'estimated':
+                counts = self._estimated_counts(statuses, title_prefix)
+            elif mode == 'cached':
+                counts = self._cached_counts()
+            else:
+                counts = self._exact_counts(filters)
+        except SQLAlchemyError as e:
+            logger.error(f"Error counting tasks: {str(e)}")
+            raise
+        by_status = {status: counts.get(status, 0) for status in statuses}
+        return TaskCounts(total=sum(by_status.values()), by_status=by_status, mode=mode)
+
+    def _exact_counts(self, filters: TaskFilter | None) -> dict[str, int]:
+        """Точное число задач по статусам одним запросом с GROUP BY"""
+        statement = select(Task.status, func.count()).where(NOT_DELETED).group_by(Task.status)
+        if filters is not None:
+            statement = statement.where(*self._filter_clauses(filters))
+        return dict(self.db.execute(statement).all())
+
+    def _estimated_counts(self, statuses, title_prefix: str | None) -> dict[str, int]:
+        """Оценка числа задач по статусам из EXPLAIN: планирование без выполнения запроса"""
+        counts = {}
+        for status in statuses:
+            # Колонка без типа: результат EXPLAIN не разбирается как строки задач
+            statement = select(literal_column('1')).select_from(Task).where(NOT_DELETED, Task.status == status)
+            if title_prefix is not None:
+                statement = statement.where(self._title_prefix_clause(title_prefix))
+            counts[status] = plan_rows(self.db.execute(explain(statement)).scalar_one())
+        return counts
+
+    def _cached_counts(self) -> dict[str, int]:
+        """Счетчики по статусам из TaskCounter; при промахе - точный подсчет"""
+        counts = self.counter.get()
+        if counts is None:
+            token = self.counter.begin_read()
+            counts = self._exact_counts(None)
+            self.counter.set(counts, token)
+        return counts
+
+    def iter_task_partitions(
+        self,
+        filters: TaskFilter | None = None,
+        order: str = 'asc',
+        batch_size: int = EXPORT_BATCH_SIZE,
+    ) -> Iterator[list[Row]]:
+        """Потоково прочитать все задачи порциями по batch_size строк
+
+        Выбираются только колонки (без ORM-объектов) через серверный курсор
+        (yield_per), поэтому в памяти одновременно находится не больше одной
+        порции, каким бы большим ни был результат. Сессия закрывается по
+        окончании чтения.
+        """
+        try:
+            result = self.db.execute(
+                self.export_statement(filters, order).execution_options(yield_per=batch_size)
+            )
+            yield from result.partitions()
+        except SQLAlchemyError as e:
+            logger.error(f"Error exporting tasks: {str(e)}")
+            raise
+        finally:
+            self.db.close()
+
+    def export_statement(self, filters: TaskFilter | None = None, order: str = 'asc'):
+        """Запрос колонок всех задач для выгрузки"""
+        statement = select(*TASK_COLUMNS).where(NOT_DELETED)
+        if filters is not None:
+            statement = statement.where(*self._filter_clauses(filters))
+        if order == 'desc':
+            return statement.order_by(Task.created_at.desc(), Task.id.desc())
+        return statement.order_by(Task.created_at, Task.id)
+
+    def _filter_clauses(self, filters: TaskFilter) -> list:
+        """Условия WHERE для фильтра списка задач"""
+        clauses = []
+        if filters.status:
+            clauses.append(Task.status.in_(filters.status))
+        if filters.title_prefix:
+            clauses.append(self._title_prefix_clause(filters.title_prefix))
+        return clauses
+
+    def _title_prefix_clause(self, prefix: str):
+        """Условие "название начинается с prefix", использующее индекс по title
+
+        На PostgreSQL это LIKE 'prefix%' по индексу с text_pattern_ops.
+        В остальных диалектах - диапазон [prefix, следующая строка), который
+        при бинарном сравнении строк эквивалентен префиксу и читается по
+        обычному индексу (LIKE в SQLite регистронезависим и индекс не использует).
+        """
+        if self.db.get_bind().dialect.name == 'postgresql':
+            return Task.title.startswith(prefix, autoescape=True)
+        upper = prefix.rstrip(chr(0x10FFFF))
+        if not upper:
+            return Task.title >= prefix
+        upper = upper[:-1] + chr(ord(upper[-1]) + 1)
+        return and_(Task.title >= prefix, Task.title < upper)
+
+    @staticmethod
+    def next_cursor(tasks: list[Task], limit: int, order: str = 'asc') -> str | None:
+        """Курсор следующей страницы или None, если страница последняя"""
+        if limit <= 0 or len(tasks) < limit:
+            return None
+        last = tasks[-1]
+        return encode_cursor(last.created_at, last.id, order)
     
-    def create_task(self, task: TaskCreate) -> Task:
-        """Создать новую задачу"""
+    def create_task(self, task: TaskCreate, idempotency: IdempotentRequest | None = None) -> Task:
+        """Создать новую задачу
+
+        С ключом идемпотентности ответ сохраняется в той же транзакции; если
+        тот же ключ уже зафиксирован, задача не создается (DuplicateRequestError).
+        """
         try:
             db_task = Task(**task.model_dump())
             self.db.add(db_task)
+            if idempotency is not None:
+                self.db.flush()
+                self._store_response(idempotency, lambda: TaskSchema.model_validate(db_task))
             self.db.commit()
             self.db.refresh(db_task)
+            self.counter.add({db_task.status: 1})
+            self._publish(lambda: [created_event(db_task)])
             return db_task
         except SQLAlchemyError as e:
             self.db.rollback()
             logger.error(f"Error creating task: {str(e)}")
             raise
     
-    def update_task(self, task_id: UUID, task_update: TaskUpdate) -> Task | None:
-        """Обновить существующую задачу"""
+    def create_tasks(
+        self,
+        tasks: list[TaskCreate],
+        chunk_size: int = BULK_CHUNK_SIZE,
+        atomic: bool = True,
+        idempotency: IdempotentRequest | None = None,
+    ) -> BulkCreateResult:
+        """Создать пакет задач многострочными INSERT ... RETURNING
+
+        Задачи вставляются порциями по chunk_size строк в одной транзакции.
+        В режиме atomic любая ошибка откатывает весь пакет и пробрасывается.
+        Иначе каждая порция выполняется в своей точке сохранения, а при ошибке
+        порция повторяется построчно, и ошибки возвращаются по индексам задач.
+        """
+        result = BulkCreateResult()
+        rows = [task.model_dump() for task in tasks]
+        try:
+            for start in range(0, len(rows), chunk_size):
+                chunk = rows[start:start + chunk_size]
+                if atomic:
+                    result.created.extend(self._insert_rows(chunk))
+                else:
+                    self._insert_chunk_per_item(chunk, start, result)
+            self._store_response(idempotency, lambda: TaskBulkResult.model_validate(result))
+            self.db.commit()
+            self.counter.add(Counter(task.status for task in result.created))
+            self._publish(lambda: [created_event(task) for task in result.created])
+            return result
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            logger.error(f"Error creating tasks in bulk: {str(e)}")
+            raise
+
+    def _insert_rows(self, rows: list[dict]) -> list[Task]:
+        """Вставить строки одним многострочным INSERT ... RETURNING"""
+        statement = insert(Task).returning(*Task.__table__.c, sort_by_parameter_order=True)
+        return [self._task_from_row(row) for row in self.db.execute(statement, rows)]
+
+    @staticmethod
+    def _task_from_row(row) -> Task:
+        """Задача из строки RETURNING, не привязанная к сессии
+
+        После фиксации такой объект не истекает и не перечитывается из БД.
+        """
+        return Task(**row._mapping)
+
+    def _supports_returning(self, statement_kind: str) -> bool:
+        """Поддерживает ли диалект UPDATE/DELETE ... RETURNING"""
+        return getattr(self.db.get_bind().dialect, f'{statement_kind}_returning', False)
+
+    def _insert_chunk_per_item(self, chunk: list[dict], offset: int, result: BulkCreateResult):
+        """Вставить порцию в точке сохранения, при ошибке - по одной строке"""
         try:
+            with self.db.begin_nested():
+                result.created.extend(self._insert_rows(chunk))
+            return
+        except SQLAlchemyError:
+            pass
+
+        for index, row in enumerate(chunk, start=offset):
+            try:
+                with self.db.begin_nested():
+                    result.created.extend(self._insert_rows([row]))
+            except IntegrityError as e:
+                result.errors.append(BulkItemError(index=index, detail=str(e.orig).splitlines()[0]))
+            except SQLAlchemyError as e:
+                logger.error(f"Error creating task {index} in bulk: {str(e)}")
+                result.errors.append(BulkItemError(index=index, detail="Database error"))
+    
+    def update_task(
+        self,
+        task_id: UUID,
+        task_update: TaskUpdate,
+        expected_versions: Collection[int] | None = None,
+    ) -> Task | None:
+        """Обновить существующую задачу
+
+        Обновляются только переданные поля. Если диалект поддерживает RETURNING,
+        изменение и чтение результата выполняются одним запросом.
+
+        С expected_versions задача изменяется, только если ее текущая версия
+        среди них: сравнение и замена выполняются тем же UPDATE, без блокировок.
+        Иначе выбрасывается VersionConflictError.
+        """
+        if not self._supports_returning('update'):
+            return self._update_task_orm(task_id, task_update, expected_versions)
+        update_data = task_update.model_dump(exclude_unset=True)
+        if not update_data:
             db_task = self.get_task(task_id)
-            if db_task:
-                update_data = task_update.model_dump(exclude_unset=True)
-                for field, value in update_data.items():
-                    setattr(db_task, field, value)
-                self.db.commit()
-                self.db.refresh(db_task)
+            self._check_version(db_task, expected_versions)
+            return db_task
+        try:
+            statement = (
+                update(Task)
+                .where(self._write_condition(task_id, expected_versions))
+                .values(**update_data, version=Task.version + 1)
+                .returning(*Task.__table__.c)
+            )
+            row = self.db.execute(statement).one_or_none()
+            # Инвалидирую до и после фиксации, чтобы после возврата
+            # кэш не мог отдать старую версию задачи
+            self.cache.delete(task_id)
+            self.db.commit()
+            self.cache.delete(task_id)
+            if row is None:
+                return self._missing_or_conflict(task_id, expected_versions)
+            if 'status' in update_data:
+                # Прежний статус RETURNING не возвращает: счетчики пересчитаются при чтении
+                self.counter.invalidate()
+            db_task = self._task_from_row(row)
+            self._publish(lambda: [updated_event(db_task, update_data)])
             return db_task
         except SQLAlchemyError as e:
             self.db.rollback()
             logger.error(f"Error updating task {task_id}: {str(e)}")
             raise
+
+    @staticmethod
+    def _write_condition(task_id: UUID, expected_versions: Collection[int] | None):
+        """Условие WHERE изменения одной задачи, с проверкой версии, если она задана"""
+        condition = and_(Task.id == task_id, NOT_DELETED)
+        if expected_versions is not None:
+            condition = and_(condition, Task.version.in_(expected_versions))
+        return condition
+
+    @staticmethod
+    def _check_version(db_task: Task | None, expected_versions: Collection[int] | None) -> None:
+        if db_task is not None and expected_versions is not None and db_task.version not in expected_versions:
+            raise VersionConflictError(db_task.id, db_task.version)
+
+    def _missing_or_conflict(self, task_id: UUID, expected_versions: Collection[int] | None) -> None:
+        """Разобрать, почему изменение не нашло строку
+
+        Возвращает None, если задачи нет, и выбрасывает VersionConflictError,
+        если задача есть, но ее версия не подошла.
+        """
+        if expected_versions is None:
+            return None
+        current = self.db.scalar(select(Task.version).where(Task.id == task_id, NOT_DELETED))
+        if current is not None:
+            raise VersionConflictError(task_id, current)
+        return None
+
+    def _get_task_for_write(self, task_id: UUID) -> Task | None:
+        """Прочитать задачу для изменения через ORM, обновив объект в сессии
+
+        Версия объекта должна быть свежей: с ней сравнивается версия в UPDATE.
+        """
+        statement = select(Task).where(Task.id == task_id, NOT_DELETED).execution_options(populate_existing=True)
+        return self.db.scalars(statement).first()
     
-    def delete_task(self, task_id: UUID) -> Task | None:
-        """Удалить задачу"""
+    def update_tasks(
+        self,
+        bulk: TaskBulkUpdate,
+        returning: bool = False,
+        idempotency: IdempotentRequest | None = None,
+    ) -> BulkUpdateResult:
+        """Применить изменения к списку задач или к задачам по фильтру
+
+        Выполняется одним UPDATE в одной транзакции; версия каждой измененной
+        задачи увеличивается. Если returning, возвращаются измененные задачи,
+        иначе только их число. Кэш инвалидируется по ID измененных задач.
+        """
+        values = dict(bulk.update.model_dump(exclude_unset=True), version=Task.version + 1)
+        columns = Task.__table__.c if returning else (Task.id,)
         try:
-            db_task = self.get_task(task_id)
-            if db_task:
-                self.db.delete(db_task)
+            def response(rows: list[Row]) -> TaskBulkUpdateResult:
+                tasks = [self._task_from_row(row) for row in rows] if returning else None
+                return TaskBulkUpdateResult(updated=len(rows), tasks=tasks)
+
+            def store(rows: list[Row]) -> None:
+                self._store_response(idempotency, lambda: response(rows))
+
+            rows = self._update_many(self._bulk_condition(bulk), values, columns, store)
+            if rows and 'status' in values:
+                self.counter.invalidate()
+            tasks = [self._task_from_row(row) for row in rows] if returning else None
+            fields = bulk.update.model_dump(exclude_unset=True)
+            if returning:
+                self._publish(lambda: [updated_event(task, fields) for task in tasks])
+            else:
+                self._publish(lambda: [updated_id_event(row.id, fields) for row in rows])
+            return BulkUpdateResult(updated=len(rows), tasks=tasks)
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            logger.error(f"Error updating tasks in bulk: {str(e)}")
+            raise
+
+    def delete_tasks(self, bulk: TaskBulkTarget, idempotency: IdempotentRequest | None = None) -> int:
+        """Мягко удалить список задач или задачи по фильтру
+
+        Задачи только помечаются удаленными одним UPDATE; физически их удаляет
+        PurgeWorker. Возвращает число удаленных задач.
+        """
+        values = {'deleted_at': utcnow(), 'version': Task.version + 1}
+        try:
+            def store(rows: list[Row]) -> None:
+                self._store_response(idempotency, lambda: TaskBulkDeleteResult(deleted=len(rows)))
+
+            columns = (Task.id, Task.status, Task.version)
+            rows = self._update_many(self._bulk_condition(bulk), values, columns, store)
+            self.counter.add({status: -count for status, count in Counter(row.status for row in rows).items()})
+            self._publish(lambda: [deleted_event(row.id, row.version, row.status) for row in rows])
+            return len(rows)
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            logger.error(f"Error deleting tasks in bulk: {str(e)}")
+            raise
+
+    def _bulk_condition(self, bulk: TaskBulkTarget):
+        """Условие WHERE для задач пакетной операции"""
+        if bulk.ids is not None:
+            return and_(Task.id.in_(bulk.ids), NOT_DELETED)
+        return and_(*self._filter_clauses(bulk.filter), NOT_DELETED)
+
+    def _update_many(
+        self,
+        condition,
+        values: dict,
+        columns,
+        before_commit: Callable[[list[Row]], None] | None = None,
+    ) -> list[Row]:
+        """Изменить задачи по условию одним UPDATE, зафиксировать и инвалидировать кэш
+
+        Первой колонкой в columns должен идти ID задачи. before_commit
+        вызывается с измененными строками в той же транзакции.
+        """
+        if self._supports_returning('update'):
+            statement = update(Task).where(condition).values(**values).returning(*columns)
+            rows = self.db.execute(statement).all()
+        else:
+            # Без RETURNING выбираю ID с блокировкой строк и обновляю по ним
+            ids = self.db.scalars(select(Task.id).where(condition).with_for_update()).all()
+            self.db.execute(update(Task).where(Task.id.in_(ids)).values(**values))
+            rows = self.db.execute(select(*columns).where(Task.id.in_(ids))).all()
+        for row in rows:
+            self.cache.delete(row[0])
+        if before_commit is not None:
+            before_commit(rows)
+        self.db.commit()
+        for row in rows:
+            self.cache.delete(row[0])
+        return rows
+
+    def _update_task_orm(
+        self,
+        task_id: UUID,
+        task_update: TaskUpdate,
+        expected_versions: Collection[int] | None = None,
+    ) -> Task | None:
+        """Обновить задачу через ORM для диалектов без UPDATE ... RETURNING
+
+        UPDATE сравнивает версию с прочитанной (version_id_col модели), поэтому
+        изменение, сделанное между чтением и записью, не теряется: с
+        expected_versions выбрасывается VersionConflictError, без них изменение
+        применяется заново к свежей версии задачи.
+        """
+        update_data = task_update.model_dump(exclude_unset=True)
+        for attempt in range(ORM_WRITE_ATTEMPTS):
+            try:
+                db_task = self._get_task_for_write(task_id)
+                if db_task is None:
+                    return None
+                self._check_version(db_task, expected_versions)
+                old_status = db_task.status
+                for name, value in update_data.items():
+                    setattr(db_task, name, value)
+                self.cache.delete(task_id)
                 self.db.commit()
-            return db_task
+                self.cache.delete(task_id)
+                self.db.refresh(db_task)
+                if db_task.status != old_status:
+                    self.counter.add({old_status: -1, db_task.status: 1})
+                if update_data:
+                    self._publish(lambda: [updated_event(db_task, update_data)])
+                return db_task
+            except StaleDataError as e:
+                self.db.rollback()
+                if expected_versions is not None:
+                    return self._missing_or_conflict(task_id, expected_versions)
+                if attempt == ORM_WRITE_ATTEMPTS - 1:
+                    logger.error(f"Error updating task {task_id}: {str(e)}")
+                    raise
+            except SQLAlchemyError as e:
+                self.db.rollback()
+                logger.error(f"Error updating task {task_id}: {str(e)}")
+                raise
+    
+    def delete_task(self, task_id: UUID, expected_versions: Collection[int] | None = None) -> Task | None:
+        """Удалить задачу
+
+        Удаление мягкое: задача помечается удаленной и больше не читается,
+        а физически ее удаляет PurgeWorker. Возвращает удаленную задачу
+        (последнее состояние) или None, если задачи нет. Если диалект
+        поддерживает RETURNING, пометка и чтение строки выполняются одним запросом.
+        Версия проверяется так же, как в update_task.
+        """
+        if not self._supports_returning('update'):
+            return self._delete_task_orm(task_id, expected_versions)
+        try:
+            statement = (
+                update(Task)
+                .where(self._write_condition(task_id, expected_versions))
+                .values(deleted_at=utcnow(), version=Task.version + 1)
+                .returning(*Task.__table__.c)
+            )
+            row = self.db.execute(statement).one_or_none()
+            self.cache.delete(task_id)
+            self.db.commit()
+            self.cache.delete(task_id)
+            if row is None:
+                return self._missing_or_conflict(task_id, expected_versions)
+            self.counter.add({row.status: -1})
+            self._publish(lambda: [deleted_event(row.id, row.version, row.status)])
+            return self._task_from_row(row)
         except SQLAlchemyError as e:
             self.db.rollback()
             logger.error(f"Error deleting task {task_id}: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+    
+    def _delete_task_orm(self, task_id: UUID, expected_versions: Collection[int] | None = None) -> Task | None:
+        """Удалить задачу через ORM для диалектов без UPDATE ... RETURNING
+
+        Конкурентные изменения обрабатываются так же, как в _update_task_orm.
+        """
+        for attempt in range(ORM_WRITE_ATTEMPTS):
+            try:
+                db_task = self._get_task_for_write(task_id)
+                if db_task is None:
+                    return None
+                self._check_version(db_task, expected_versions)
+                db_task.deleted_at = utcnow()
+                self.cache.delete(task_id)
+                self.db.commit()
+                self.cache.delete(task_id)
+                self.db.refresh(db_task)
+                self.counter.add({db_task.status: -1})
+                self._publish(lambda: [deleted_event(db_task.id, db_task.version, db_task.status)])
+                return db_task
+            except StaleDataError as e:
+                self.db.rollback()
+                if expected_versions is not None:
+                    return self._missing_or_conflict(task_id, expected_versions)
+                if attempt == ORM_WRITE_ATTEMPTS - 1:
+                    logger.error(f"Error deleting task {task_id}: {str(e)}")
+                    raise
+            except SQLAlchemyError as e:
+                self.db.rollback()
+                logger.error(f"Error deleting task {task_id}: {str(e)}")
+                raise
@@ -0,0 +1,223 @@
+from typing import Any, AsyncIterator, Callable, Collection
+from uuid import UUID
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.config import BULK_CHUNK_SIZE, EXPORT_BATCH_SIZE
+from app.crud.cache import CacheBackend, task_cache
+from app.crud.idempotency import IdempotentRequest
+from app.crud.task import BulkCreateResult, BulkUpdateResult, TaskCounts, TaskService
+from app.models.task import Task
+from app.schemas.task import Task as TaskSchema, TaskBulkTarget, TaskBulkUpdate, TaskCreate, TaskFilter, TaskUpdate
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncTaskService:
+    """Асинхронный сервис для работы с задачами
+
+    Выполняет методы TaskService на AsyncSession через run_sync: запросы
+    идут через асинхронный драйвер и не занимают поток, а логика запросов
+    остается единой для обоих режимов.
+    """
+
+    def __init__(self, db: AsyncSession, cache: CacheBackend | None = None):
+        self.db = db
+        self.cache = cache if cache is not None else task_cache
+
+    async def _run(self, method: Callable[..., Any], *args, **kwargs) -> Any:
+        return await self.db.run_sync(lambda session: method(TaskService(session, self.cache), *args, **kwargs))
+
+    async def get_stored_response(self, request: IdempotentRequest) -> str | None:
+        """Сохраненный ответ на запрос с тем же ключом идемпотентности"""
+        return await self._run(TaskService.get_stored_response, request)
+
+    async def get_task(self, task_id: UUID) -> Task | None:
+        """Получить задачу по ID"""
+        return await self._run(TaskService.get_task, task_id)
+
+    async def get_task_cached(self, task_id: UUID) -> TaskSchema | None:
+        """Получить задачу по ID через кэш чтения
+
+        Попадание в кэш обслуживается без обращения к сессии.
+        """
+        cached = self.cache.get(task_id)
+        if cached is not None:
+            return cached
+        return await self._run(TaskService.load_task_snapshot, task_id)
+
+    async def get_task_version(self, task_id: UUID) -> int | None:
+        """Версия задачи без чтения остальных колонок"""
+        cached = self.cache.get(task_id)
+        if cached is not None:
+            return cached.version
+        return await self._run(TaskService.get_task_version, task_id)
+
+    async def get_tasks(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: str | None = None,
+        filters: TaskFilter | None = None,
+        order: str = 'asc',
+    ) -> list[Task]:
+        """Получить список задач с пагинацией"""
+        return await self._run(
+            TaskService.get_tasks, skip=skip, limit=limit, cursor=cursor, filters=filters, order=order
+        )
+
+    async def get_task_partial(
+        self,
+        task_id: UUID,
+        fields: Collection[str] | None = None,
+    ) -> TaskSchema | Row | None:
+        """Задача с выбранными полями: снимок из кэша или строка только этих колонок"""
+        cached = self.cache.get(task_id)
+        if cached is not None:
+            return cached
+        return await self._run(TaskService.get_task_partial, task_id, fields)
+
+    async def get_task_rows(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: str | None = None,
+        filters: TaskFilter | None = None,
+        order: str = 'asc',
+        fields: Collection[str] | None = None,
+    ) -> list[Row]:
+        """Страница списка задач строками колонок ответа API"""
+        return await self._run(
+            TaskService.get_task_rows,
+            skip=skip, limit=limit, cursor=cursor, filters=filters, order=order, fields=fields,
+        )
+
+    async def get_task_versions(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: str | None = None,
+        filters: TaskFilter | None = None,
+        order: str = 'asc',
+    ) -> list[Row]:
+        """Ключи страницы списка задач: (id, version, created_at)"""
+        return await self._run(
+            TaskService.get_task_versions, skip=skip, limit=limit, cursor=cursor, filters=filters, order=order
+        )
+
+    async def search_tasks(
+        self,
+        query: str,
+        skip: int = 0,
+        limit: int = 100,
+        filters: TaskFilter | None = None,
+    ) -> list[Task]:
+        """Полнотекстовый поиск по названию и описанию"""
+        return await self._run(TaskService.search_tasks, query, skip=skip, limit=limit, filters=filters)
+
+    async def search_task_rows(
+        self,
+        query: str,
+        skip: int = 0,
+        limit: int = 100,
+        filters: TaskFilter | None = None,
+    ) -> list[Row]:
+        """Полнотекстовый поиск, возвращающий строки колонок ответа API"""
+        return await self._run(TaskService.search_task_rows, query, skip=skip, limit=limit, filters=filters)
+
+    async def count_tasks(self, filters: TaskFilter | None = None, mode: str = 'exact') -> TaskCounts:
+        """Число задач, подходящих под фильтр, всего и по статусам"""
+        return await self._run(TaskService.count_tasks, filters=filters, mode=mode)
+
+    @staticmethod
+    def next_cursor(tasks: list[Task], limit: int, order: str = 'asc') -> str | None:
+        """Курсор следующей страницы или None, если страница последняя"""
+        return TaskService.next_cursor(tasks, limit, order)
+
+    async def iter_task_partitions(
+        self,
+        filters: TaskFilter | None = None,
+        order: str = 'asc',
+        batch_size: int = EXPORT_BATCH_SIZE,
+    ) -> AsyncIterator[list[Row]]:
+        """Потоково прочитать все задачи порциями через AsyncSession.stream"""
+        statement = TaskService(self.db.sync_session, self.cache).export_statement(filters, order)
+        try:
+            result = await self.db.stream(statement.execution_options(yield_per=batch_size))
+            async for partition in result.partitions():
+                yield partition
+        except SQLAlchemyError as e:
+            logger.error(f"Error exporting tasks: {str(e)}")
+            raise
+        finally:
+            await self.db.close()
+
+    async def create_task(self, task: TaskCreate, idempotency: IdempotentRequest | None = None) -> Task:
+        """Создать новую задачу"""
+        return await self._run(TaskService.create_task, task, idempotency)
+
+    async def create_tasks(
+        self,
+        tasks: list[TaskCreate],
+        chunk_size: int = BULK_CHUNK_SIZE,
+        atomic: bool = True,
+        idempotency: IdempotentRequest | None = None,
+    ) -> BulkCreateResult:
+        """Создать пакет задач"""
+        return await self._run(
+            TaskService.create_tasks, tasks, chunk_size=chunk_size, atomic=atomic, idempotency=idempotency
+        )
+
+    async def update_task(
+        self,
+        task_id: UUID,
+        task_update: TaskUpdate,
+        expected_versions: Collection[int] | None = None,
+    ) -> Task | None:
+        """Обновить существующую задачу"""
+        return await self._run(TaskService.update_task, task_id, task_update, expected_versions)
+
+    async def update_tasks(
+        self,
+        bulk: TaskBulkUpdate,
+        returning: bool = False,
+        idempotency: IdempotentRequest | None = None,
+    ) -> BulkUpdateResult:
+        """Применить изменения к списку задач или к задачам по фильтру"""
+        return await self._run(TaskService.update_tasks, bulk, returning=returning, idempotency=idempotency)
+
+    async def delete_task(self, task_id: UUID, expected_versions: Collection[int] | None = None) -> Task | None:
+        """Удалить задачу"""
+        return await self._run(TaskService.delete_task, task_id, expected_versions)
+
+    async def delete_tasks(self, bulk: TaskBulkTarget, idempotency: IdempotentRequest | None = None) -> int:
+        """Пометить удаленными задачи по списку ID или по фильтру"""
+        return await self._run(TaskService.delete_tasks, bulk, idempotency)
+
+
+class ThreadedTaskService(AsyncTaskService):
+    """Синхронный TaskService с асинхронным интерфейсом
+
+    Используется в режиме DB_MODE=sync: каждый вызов выполняется в пуле
+    потоков Starlette на обычной Session с синхронным драйвером.
+    """
+
+    db: Session
+
+    async def _run(self, method: Callable[..., Any], *args, **kwargs) -> Any:
+        return await run_in_threadpool(method, TaskService(self.db, self.cache), *args, **kwargs)
+
+    def iter_task_partitions(
+        self,
+        filters: TaskFilter | None = None,
+        order: str = 'asc',
+        batch_size: int = EXPORT_BATCH_SIZE,
+    ):
+        """Потоково прочитать все задачи порциями
+
+        Возвращает обычный итератор: StreamingResponse сам читает его в пуле потоков.
+        """
+        return TaskService(self.db, self.cache).iter_task_partitions(filters, order, batch_size)
@@ -1,16 +1,183 @@
+import asyncio
+import os
+import threading
 from sqlalchemy import create_engine
+from sqlalchemy.engine import URL, Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from app.config import DSN
+from app.config import ASYNC_DSN, DB_MODE, DB_SETTINGS, DSN, REPLICA_DSNS
+from app.pool import engine_options
+from app.replicas import Replica, ReplicaSet
+
+# Асинхронные драйверы для синхронных DSN
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+
+def to_async_dsn(dsn: str) -> URL:
+    """Получить DSN асинхронного драйвера из синхронного DSN"""
+    url = make_url(dsn)
+    backend = url.get_backend_name()
+    if url.get_driver_name() in ('asyncpg', 'aiosqlite') or backend not in ASYNC_DRIVERS:
+        return url
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+def create_async_db_engine(dsn: str | URL):
+    url = make_url(dsn)
+    return create_async_engine(url, **engine_options(url, DB_SETTINGS, is_async=True))
+
 
-#Инициализирую БД
-engine = create_engine(DSN)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+#Фабрики сессий привязываются к движкам при их создании.
+#Асинхронные сессии не истекают после commit: ленивая подгрузка в них невозможна
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=DB_SETTINGS.expire_on_commit)
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
+
+#Движки создаются при первом обращении, а не при импорте: импорт приложения
+#не требует DSN, не загружает драйвер БД и не обращается к базе
+_engine: Engine | None = None
+_async_engine: AsyncEngine | None = None
+_replicas: ReplicaSet | None = None
+_engines_lock = threading.Lock()
+
+
+def get_engine() -> Engine:
+    """Синхронный движок приложения"""
+    global _engine
+    if _engine is None:
+        with _engines_lock:
+            if _engine is None:
+                if not DSN:
+                    raise RuntimeError('DSN is not set')
+                engine = create_engine(DSN, **engine_options(make_url(DSN), DB_SETTINGS))
+                SessionLocal.configure(bind=engine)
+                _engine = engine
+    return _engine
+
+
+def get_async_engine() -> AsyncEngine | None:
+    """Асинхронный движок; создается только в режиме DB_MODE=async, иначе None"""
+    global _async_engine
+    if DB_MODE != 'async':
+        return None
+    if _async_engine is None:
+        with _engines_lock:
+            if _async_engine is None:
+                if not (ASYNC_DSN or DSN):
+                    raise RuntimeError('DSN is not set')
+                engine = create_async_db_engine(ASYNC_DSN or to_async_dsn(DSN))
+                AsyncSessionLocal.configure(bind=engine)
+                _async_engine = engine
+    return _async_engine
+
+
+def create_replica(name: str, dsn: str) -> Replica:
+    """Реплика с движком для проверок и движком запросов для текущего режима"""
+    url = make_url(dsn)
+    engine = create_engine(url, **engine_options(url, DB_SETTINGS))
+    async_engine = create_async_db_engine(to_async_dsn(dsn)) if DB_MODE == 'async' else None
+    return Replica(name, engine, async_engine)
+
+
+def get_replicas() -> ReplicaSet:
+    """Реплики для чтения из REPLICA_DSNS; без них - пустой набор, и чтения идут на основную БД"""
+    global _replicas
+    if _replicas is None:
+        with _engines_lock:
+            if _replicas is None:
+                _replicas = ReplicaSet([create_replica(f'replica{i}', dsn) for i, dsn in enumerate(REPLICA_DSNS)])
+    return _replicas
+
+
+def current_engines() -> dict[str, Engine | None]:
+    """Уже созданные движки (для метрик и статистики): без создания новых"""
+    engines = {'sync': _engine, 'async': _async_engine and _async_engine.sync_engine}
+    if _replicas is not None:
+        engines.update({replica.name: replica.request_engine for replica in _replicas.replicas})
+    return engines
+
+
+def init_engines() -> None:
+    """Создать движки для текущего режима и привязать к ним фабрики сессий"""
+    get_engine()
+    get_async_engine()
+    get_replicas()
+
+
+def warm_up(engine: Engine, connections: int) -> int:
+    """Открыть connections соединений и вернуть их в пул
+
+    Соединения удерживаются одновременно, поэтому пул создает их все, а не
+    выдает одно и то же. Возвращает число открытых соединений.
+    """
+    opened = []
+    try:
+        for _ in range(connections):
+            opened.append(engine.connect())
+        return len(opened)
+    finally:
+        for connection in opened:
+            connection.close()
+
+
+async def warm_up_async(engine: AsyncEngine, connections: int) -> int:
+    """Открыть connections соединений асинхронного движка одновременно и вернуть их в пул"""
+    opened = await asyncio.gather(*(engine.connect().start() for _ in range(connections)))
+    for connection in opened:
+        await connection.close()
+    return len(opened)
+
+
+async def dispose_engines() -> None:
+    """Закрыть соединения движков; при следующем обращении движки создаются заново"""
+    global _engine, _async_engine, _replicas
+    with _engines_lock:
+        engine, async_engine, replicas = _engine, _async_engine, _replicas
+        _engine = _async_engine = _replicas = None
+    if engine is not None:
+        engine.dispose()
+    if async_engine is not None:
+        await async_engine.dispose()
+    for replica in replicas.replicas if replicas is not None else ():
+        replica.engine.dispose()
+        if replica.async_engine is not None:
+            await replica.async_engine.dispose()
+
+
+def _reset_engines_after_fork() -> None:
+    """Не использовать в дочернем процессе соединения, открытые до fork
+
+    Пулы заменяются пустыми без закрытия соединений: ими продолжает
+    пользоваться родитель. Так безопасен запуск под сервером с fork после
+    импорта приложения (например gunicorn --preload).
+    """
+    global _engines_lock
+    _engines_lock = threading.Lock()
+    if _engine is not None:
+        _engine.dispose(close=False)
+    if _async_engine is not None:
+        _async_engine.sync_engine.dispose(close=False)
+    if _replicas is not None:
+        _replicas.reset_after_fork()
+
+
+os.register_at_fork(after_in_child=_reset_engines_after_fork)
+
+
 def get_db():
+    get_engine()
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    get_async_engine()
+    async with AsyncSessionLocal() as db:
+        yield db
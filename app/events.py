@@ -0,0 +1,438 @@
+"""Лента изменений задач
+
+TaskService после фиксации транзакции публикует события created, updated и
+deleted в EventBroker. Брокер нумерует события, хранит последние из них для
+продолжения ленты после переподключения и раздает их подписчикам через
+ограниченные очереди: подписчик, который не успевает читать, отключается,
+а не замедляет запись и не копит память.
+
+Между процессами события передает EventBackend: PostgresNotifyBackend через
+LISTEN/NOTIFY, LocalEventBackend внутри процесса (с общей LocalEventBus - между
+брокерами в тестах). События других процессов также инвалидируют кэш задач
+и счетчики этого процесса.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Iterable
+from uuid import UUID, uuid4
+
+from sqlalchemy import func
+from sqlalchemy import select as sql_select
+from sqlalchemy.engine import Engine
+
+from app.api.serialization import TASK_FIELDS, json_dumps
+from app.config import EVENTS_BACKEND, EVENTS_BACKLOG, EVENTS_CHANNEL, EVENTS_QUEUE_SIZE
+from app.crud.cache import CacheBackend, task_cache
+from app.crud.counts import TaskCounter, task_counter
+
+logger = logging.getLogger(__name__)
+
+
+def task_snapshot(task) -> dict:
+    """Задача в виде JSON-совместимого словаря с полями схемы Task"""
+    snapshot = {field: getattr(task, field) for field in TASK_FIELDS}
+    snapshot['id'] = str(snapshot['id'])
+    return snapshot
+
+
+def created_event(task) -> dict:
+    return {'type': 'created', 'id': str(task.id), 'version': task.version, 'task': task_snapshot(task)}
+
+
+def updated_event(task, fields: Iterable[str]) -> dict:
+    return {
+        'type': 'updated', 'id': str(task.id), 'version': task.version,
+        'task': task_snapshot(task), 'fields': sorted(fields),
+    }
+
+
+def updated_id_event(task_id: UUID, fields: Iterable[str]) -> dict:
+    """Изменение задачи, новое состояние которой неизвестно (пакетное обновление без returning)"""
+    return {'type': 'updated', 'id': str(task_id), 'version': None, 'task': None, 'fields': sorted(fields)}
+
+
+def deleted_event(task_id: UUID, version: int | None, status: str) -> dict:
+    return {'type': 'deleted', 'id': str(task_id), 'version': version, 'status': status}
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    """Событие ленты: номер в брокере, тип и JSON-тело, закодированное один раз для всех подписчиков"""
+    seq: int
+    type: str
+    data: bytes
+
+
+class SubscriptionDropped(Exception):
+    """Подписчик не успевал читать события: его очередь переполнилась"""
+
+
+class Subscription:
+    """Подписка на ленту с ограниченной очередью
+
+    Брокер кладет события из любого потока, читатель забирает их в своем
+    цикле событий asyncio через get().
+    """
+
+    def __init__(self, broker: 'EventBroker', maxsize: int, loop: asyncio.AbstractEventLoop):
+        self.broker = broker
+        self.maxsize = maxsize
+        self.dropped = False
+        #Продолжить ленту с переданного номера нельзя: клиенту нужно перечитать задачи
+        self.reset = False
+        self.start_id: str | None = None
+        self._loop = loop
+        self._events: deque[ChangeEvent] = deque()
+        self._wakeup = asyncio.Event()
+
+    def _push(self, events: list[ChangeEvent]) -> bool:
+        """Добавить события; False, если подписчик отключен"""
+        if self.dropped:
+            return False
+        if len(self._events) + len(events) > self.maxsize:
+            self.dropped = True
+        else:
+            self._events.extend(events)
+        try:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        except RuntimeError:
+            # Цикл событий читателя уже закрыт
+            self.dropped = True
+        return not self.dropped
+
+    async def get(self, timeout: float | None = None) -> ChangeEvent | None:
+        """Следующее событие или None, если за timeout секунд событий не было
+
+        Когда прочитаны все события до переполнения очереди, выбрасывает SubscriptionDropped.
+        """
+        if not self._events and not self.dropped:
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        if self._events:
+            return self._events.popleft()
+        if self.dropped:
+            raise SubscriptionDropped()
+        return None
+
+    def poll(self) -> ChangeEvent | None:
+        """Следующее уже полученное событие без ожидания"""
+        return self._events.popleft() if self._events else None
+
+    def close(self) -> None:
+        self.broker.unsubscribe(self)
+
+
+class EventBackend(ABC):
+    """Передача событий между процессами"""
+
+    #Доставляет ли бэкенд события в другие процессы
+    remote: bool = False
+
+    @abstractmethod
+    def start(self, deliver: Callable[[list[dict]], None]) -> None:
+        """Начать получать события других процессов и передавать их в deliver"""
+
+    @abstractmethod
+    def publish(self, events: list[dict]) -> None:
+        """Отправить события этого процесса другим процессам"""
+
+    @abstractmethod
+    def stop(self) -> None:
+        """Прекратить получение событий"""
+
+
+class LocalEventBus:
+    """Шина между бэкендами внутри процесса: замена LISTEN/NOTIFY для тестов"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._members: dict['LocalEventBackend', Callable[[list[dict]], None]] = {}
+
+    def join(self, backend: 'LocalEventBackend', deliver: Callable[[list[dict]], None]) -> None:
+        with self._lock:
+            self._members[backend] = deliver
+
+    def leave(self, backend: 'LocalEventBackend') -> None:
+        with self._lock:
+            self._members.pop(backend, None)
+
+    def send(self, sender: 'LocalEventBackend', events: list[dict]) -> None:
+        with self._lock:
+            receivers = [deliver for backend, deliver in self._members.items() if backend is not sender]
+        # Как и NOTIFY, получатели видят копию событий, а не общие объекты
+        payload = json.dumps(events)
+        for deliver in receivers:
+            deliver(json.loads(payload))
+
+
+class LocalEventBackend(EventBackend):
+    """События внутри процесса; с общей шиной - между брокерами одного процесса"""
+
+    def __init__(self, bus: LocalEventBus | None = None):
+        self.bus = bus
+        self.remote = bus is not None
+
+    def start(self, deliver: Callable[[list[dict]], None]) -> None:
+        if self.bus is not None:
+            self.bus.join(self, deliver)
+
+    def publish(self, events: list[dict]) -> None:
+        if self.bus is not None:
+            self.bus.send(self, events)
+
+    def stop(self) -> None:
+        if self.bus is not None:
+            self.bus.leave(self)
+
+
+class PostgresNotifyBackend(EventBackend):
+    """События между процессами через PostgreSQL LISTEN/NOTIFY (драйвер psycopg2)
+
+    Публикация идет NOTIFY через отдельное соединение в режиме autocommit,
+    прием - в фоновом потоке, который слушает канал на своем соединении и
+    переподключается при ошибках. Свои уведомления процесс пропускает: их
+    подписчики этого процесса уже получили.
+    """
+
+    remote = True
+    #Ограничение PostgreSQL на размер уведомления - 8000 байт
+    MAX_PAYLOAD = 7000
+
+    def __init__(self, engine: Engine | None = None, channel: str = EVENTS_CHANNEL, poll_interval: float = 1.0):
+        #Без явного движка используется движок приложения, созданный при первом обращении
+        self._engine = engine
+        self.channel = channel
+        self.poll_interval = poll_interval
+        self.origin = uuid4().hex
+        self._publish_lock = threading.Lock()
+        self._publisher = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def engine(self) -> Engine:
+        if self._engine is None:
+            from app.database import get_engine
+            self._engine = get_engine()
+        return self._engine
+
+    def start(self, deliver: Callable[[list[dict]], None]) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._listen, args=(deliver,), name='task-events-listener', daemon=True)
+        self._thread.start()
+
+    def publish(self, events: list[dict]) -> None:
+        with self._publish_lock:
+            try:
+                if self._publisher is None:
+                    self._publisher = self.engine.connect().execution_options(isolation_level='AUTOCOMMIT')
+                for payload in self._payloads(events):
+                    self._publisher.execute(sql_select(func.pg_notify(self.channel, payload)))
+            except Exception as e:
+                logger.error(f"Error publishing task events: {str(e)}")
+                self._close_publisher()
+
+    def _payloads(self, events: list[dict]) -> Iterable[str]:
+        """Уведомления с пачками событий, каждое не больше MAX_PAYLOAD байт"""
+        head = '{"origin":"%s","events":[' % self.origin
+        chunk: list[str] = []
+        size = len(head) + 2
+        for event in events:
+            encoded = json.dumps(event, ensure_ascii=False, separators=(',', ':'))
+            encoded_size = len(encoded.encode()) + 1
+            if chunk and size + encoded_size > self.MAX_PAYLOAD:
+                yield head + ','.join(chunk) + ']}'
+                chunk, size = [], len(head) + 2
+            chunk.append(encoded)
+            size += encoded_size
+        if chunk:
+            yield head + ','.join(chunk) + ']}'
+
+    def _listen(self, deliver: Callable[[list[dict]], None]) -> None:
+        while not self._stop.is_set():
+            try:
+                connection = self.engine.raw_connection()
+                try:
+                    self._listen_on(connection.driver_connection, deliver)
+                finally:
+                    connection.invalidate()
+            except Exception as e:
+                logger.error(f"Error listening for task events: {str(e)}")
+                self._stop.wait(self.poll_interval)
+
+    def _listen_on(self, dbapi_connection, deliver: Callable[[list[dict]], None]) -> None:
+        dbapi_connection.autocommit = True
+        with dbapi_connection.cursor() as cursor:
+            cursor.execute(f'LISTEN {self.channel}')
+        while not self._stop.is_set():
+            if select.select([dbapi_connection], [], [], self.poll_interval) == ([], [], []):
+                continue
+            dbapi_connection.poll()
+            while dbapi_connection.notifies:
+                message = json.loads(dbapi_connection.notifies.pop(0).payload)
+                if message['origin'] != self.origin:
+                    deliver(message['events'])
+
+    def _close_publisher(self) -> None:
+        if self._publisher is not None:
+            try:
+                self._publisher.close()
+            except Exception:
+                pass
+            self._publisher = None
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval * 2)
+            self._thread = None
+        with self._publish_lock:
+            self._close_publisher()
+
+
+class EventBroker:
+    """Раздача событий подписчикам процесса и продолжение ленты по номеру
+
+    Номера событий растут внутри брокера; вместе с эпохой брокера они образуют
+    ID события "<эпоха>-<номер>". Продолжить ленту можно с любого события,
+    которое еще хранится в backlog этого брокера, иначе подписка начинается с reset.
+    """
+
+    def __init__(
+        self,
+        backend: EventBackend | None = None,
+        queue_size: int = EVENTS_QUEUE_SIZE,
+        backlog: int = EVENTS_BACKLOG,
+        cache: CacheBackend | None = None,
+        counter: TaskCounter | None = None,
+    ):
+        self.backend = backend if backend is not None else LocalEventBackend()
+        self.queue_size = queue_size
+        self.cache = cache if cache is not None else task_cache
+        self.counter = counter if counter is not None else task_counter
+        self.epoch = uuid4().hex[:12]
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._backlog: deque[ChangeEvent] = deque(maxlen=backlog)
+        self._subscribers: set[Subscription] = set()
+        self._dropped = 0
+        #Номер последнего изменения, события которого не собирались: продолжить ленту раньше него нельзя
+        self._gap = 0
+
+    def start(self) -> None:
+        self.backend.start(self._deliver_remote)
+
+    def stop(self) -> None:
+        self.backend.stop()
+
+    def event_id(self, event: ChangeEvent) -> str:
+        return f'{self.epoch}-{event.seq}'
+
+    def publish(self, events: list[dict]) -> None:
+        """Опубликовать события этого процесса"""
+        if not events:
+            return
+        self._deliver(events)
+        if self.backend.remote:
+            self.backend.publish(events)
+
+    def publish_changes(self, build: Callable[[], list[dict]]) -> None:
+        """Опубликовать события изменения, собрав их, только если их кто-то получает
+
+        Без подписчиков и других процессов события не собираются, но номер
+        ленты растет: подписка, продолжающая ленту с более раннего ID, начнется
+        с reset, а не пропустит изменение молча.
+        """
+        if not self.backend.remote:
+            with self._lock:
+                if not self._subscribers:
+                    self._seq += 1
+                    self._gap = self._seq
+                    return
+        self.publish(build())
+
+    def _deliver_remote(self, events: list[dict]) -> None:
+        """Принять события другого процесса: инвалидировать кэш и счетчики и раздать подписчикам"""
+        for event in events:
+            if event['type'] != 'created':
+                self.cache.delete(UUID(event['id']))
+            if event['type'] == 'created':
+                self.counter.add({event['task']['status']: 1})
+            elif event['type'] == 'deleted':
+                self.counter.add({event['status']: -1})
+            elif 'status' in event['fields']:
+                self.counter.invalidate()
+        self._deliver(events)
+
+    def _deliver(self, events: list[dict]) -> None:
+        with self._lock:
+            batch = []
+            for event in events:
+                self._seq += 1
+                batch.append(ChangeEvent(self._seq, event['type'], json_dumps(event)))
+            self._backlog.extend(batch)
+            for subscription in list(self._subscribers):
+                if not subscription._push(batch):
+                    self._subscribers.discard(subscription)
+                    self._dropped += 1
+
+    def subscribe(self, last_event_id: str | None = None, loop: asyncio.AbstractEventLoop | None = None) -> Subscription:
+        """Подписаться на ленту; с last_event_id - получить сначала пропущенные события"""
+        subscription = Subscription(self, self.queue_size, loop or asyncio.get_running_loop())
+        with self._lock:
+            #ID, с которого продолжать ленту, если подписка начнется с reset
+            subscription.start_id = f'{self.epoch}-{self._seq}'
+            if last_event_id is not None:
+                missed = self._replay(last_event_id)
+                if missed is None:
+                    subscription.reset = True
+                else:
+                    subscription._events.extend(missed)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def _replay(self, last_event_id: str) -> list[ChangeEvent] | None:
+        """События после last_event_id или None, если часть из них уже потеряна"""
+        epoch, _, seq = last_event_id.rpartition('-')
+        if epoch != self.epoch or not seq.isdigit() or int(seq) > self._seq:
+            return None
+        seq = int(seq)
+        if seq < self._gap:
+            return None
+        oldest = self._backlog[0].seq if self._backlog else self._seq + 1
+        if seq < oldest - 1:
+            return None
+        return [event for event in self._backlog if event.seq > seq]
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'backend': type(self.backend).__name__,
+                'subscribers': len(self._subscribers),
+                'last_seq': self._seq,
+                'backlog': len(self._backlog),
+                'dropped': self._dropped,
+            }
+
+
+def create_event_backend() -> EventBackend:
+    """Бэкенд событий по настройкам из окружения"""
+    if EVENTS_BACKEND == 'postgres':
+        return PostgresNotifyBackend()
+    return LocalEventBackend()
+
+
+task_events = EventBroker(create_event_backend())
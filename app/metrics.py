@@ -0,0 +1,337 @@
+"""Метрики приложения в формате Prometheus
+
+Содержит простые потокобезопасные счетчики и гистограммы, ASGI-middleware
+для задержек запросов по маршрутам и статусам и обработчики событий
+SQLAlchemy, считающие запросы к БД и время в БД на каждый HTTP-запрос.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Iterable
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.pool import pool_status
+
+#Границы корзин гистограмм длительности в секундах
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+#Границы корзин гистограммы числа запросов к БД на HTTP-запрос
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Монотонно растущий счетчик с метками"""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} counter'
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами и метками"""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # метки -> [счетчики по корзинам (последняя - +Inf), сумма, количество]
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> Iterable[str]:
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} histogram'
+        with self._lock:
+            items = [(labels, (list(counts), total, count)) for labels, (counts, total, count) in self._series.items()]
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = 'le="' + _format_value(float(bound)) + '"'
+                yield f'{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}'
+            yield f'{self.name}_count{_format_labels(self.labelnames, labels)} {count}'
+
+
+class MetricsRegistry:
+    """Набор метрик и сборщиков, вычисляющих значения в момент выгрузки"""
+
+    def __init__(self):
+        self._metrics: list = []
+        self._collectors: list[Callable[[], Iterable[str]]] = []
+
+    def counter(self, *args, **kwargs) -> Counter:
+        metric = Counter(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        metric = Histogram(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[str]]) -> None:
+        """Добавить функцию, возвращающую строки в текстовом формате Prometheus"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return '\n'.join(lines) + '\n'
+
+
+def gauge_lines(name: str, documentation: str, samples: Iterable[tuple[dict, float]], kind: str = 'gauge') -> list[str]:
+    """Строки метрики-значения для сборщиков: samples - пары (метки, значение)"""
+    lines = [f'# HELP {name} {documentation}', f'# TYPE {name} {kind}']
+    for labels, value in samples:
+        if value is None:
+            continue
+        names, values = tuple(labels), tuple(labels.values())
+        lines.append(f'{name}{_format_labels(names, values)} {_format_value(value)}')
+    return lines
+
+
+def pool_collector(
+    engines: dict[str, Engine | None] | Callable[[], dict[str, Engine | None]],
+) -> Callable[[], list[str]]:
+    """Сборщик состояния пулов соединений: занятые, свободные, превышение и ожидание
+
+    engines - движки по именам или функция, возвращающая их при каждом сборе
+    (для движков, создаваемых после регистрации сборщика).
+    """
+    gauges = (
+        ('db_pool_size', 'Configured pool size', 'size', 'gauge'),
+        ('db_pool_checked_out', 'Connections currently checked out', 'checked_out', 'gauge'),
+        ('db_pool_checked_in', 'Idle connections in the pool', 'checked_in', 'gauge'),
+        ('db_pool_overflow', 'Connections opened above pool_size', 'overflow', 'gauge'),
+        ('db_pool_checkouts_total', 'Connection checkouts', 'checkouts', 'counter'),
+        ('db_pool_timeouts_total', 'Checkouts that timed out waiting for a connection', 'timeouts', 'counter'),
+        ('db_pool_wait_seconds_total', 'Total time spent waiting for a connection', 'wait_seconds_total', 'counter'),
+        ('db_pool_wait_seconds_max', 'Longest wait for a connection', 'wait_seconds_max', 'gauge'),
+    )
+
+    def collect() -> list[str]:
+        current = engines() if callable(engines) else engines
+        statuses = {name: pool_status(engine) for name, engine in current.items()}
+        lines = []
+        for metric, documentation, key, kind in gauges:
+            samples = [({'engine': name}, status.get(key)) for name, status in statuses.items() if status]
+            if any(value is not None for _, value in samples):
+                lines.extend(gauge_lines(metric, documentation, samples, kind))
+        return lines
+
+    return collect
+
+
+def cache_collector(cache) -> Callable[[], list[str]]:
+    """Сборщик счетчиков кэша задач"""
+    counters = ('hits', 'misses', 'evictions', 'expirations', 'invalidations', 'rejected')
+
+    def collect() -> list[str]:
+        stats = cache.stats()
+        if not stats.get('enabled'):
+            return []
+        lines = gauge_lines('task_cache_size', 'Entries in the task cache', [({}, stats['size'])])
+        lines.extend(gauge_lines(
+            'task_cache_events_total', 'Task cache events by kind',
+            [({'event': name}, stats[name]) for name in counters], kind='counter',
+        ))
+        return lines
+
+    return collect
+
+
+def admission_collector(controller) -> Callable[[], list[str]]:
+    """Сборщик состояния контроля допуска: занятые места, очередь и отклоненные запросы"""
+
+    def collect() -> list[str]:
+        stats = controller.stats()
+        limiters = [('read', stats['read']), ('write', stats['write'])] + list(stats['routes'].items())
+        lines = gauge_lines(
+            'admission_active', 'Requests holding an admission slot',
+            [({'limiter': name}, limiter['active']) for name, limiter in limiters],
+        )
+        lines.extend(gauge_lines(
+            'admission_waiting', 'Requests waiting for an admission slot',
+            [({'limiter': name}, limiter['waiting']) for name, limiter in limiters],
+        ))
+        lines.extend(gauge_lines(
+            'admission_shed_total', 'Requests rejected with 503 by admission control',
+            [({'limiter': name, 'reason': reason}, count)
+             for name, limiter in limiters for reason, count in limiter['shed'].items()],
+            kind='counter',
+        ))
+        if stats['rate_limit'] is not None:
+            lines.extend(gauge_lines(
+                'admission_rate_limited_total', 'Requests rejected with 429 by per-client rate limits',
+                [({}, stats['rate_limit']['limited'])], kind='counter',
+            ))
+        return lines
+
+    return collect
+
+
+registry = MetricsRegistry()
+
+http_requests = registry.counter(
+    'http_requests_total', 'HTTP requests by route and status', ('method', 'route', 'status'),
+)
+http_request_duration = registry.histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route and status', ('method', 'route', 'status'),
+)
+http_request_db_queries = registry.histogram(
+    'http_request_db_queries', 'Database queries per HTTP request', ('method', 'route'), buckets=QUERY_COUNT_BUCKETS,
+)
+http_request_db_duration = registry.histogram(
+    'http_request_db_duration_seconds', 'Time spent in the database per HTTP request', ('method', 'route'),
+)
+db_queries = registry.counter('db_queries_total', 'Database queries executed', ('engine',))
+db_query_seconds = registry.counter('db_query_seconds_total', 'Time spent executing database queries', ('engine',))
+
+
+class RequestDBStats:
+    """Запросы к БД в рамках одного HTTP-запроса"""
+    __slots__ = ('queries', 'seconds', 'engines')
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+        # Имя диалекта -> [запросы, секунды]; сбрасывается в общие счетчики в конце запроса
+        self.engines: dict[str, list] = {}
+
+    def record(self, engine_name: str, elapsed: float) -> None:
+        self.queries += 1
+        self.seconds += elapsed
+        totals = self.engines.get(engine_name)
+        if totals is None:
+            totals = self.engines[engine_name] = [0, 0.0]
+        totals[0] += 1
+        totals[1] += elapsed
+
+    def flush(self) -> None:
+        for engine_name, (queries, seconds) in self.engines.items():
+            db_queries.inc(engine_name, amount=queries)
+            db_query_seconds.inc(engine_name, amount=seconds)
+
+
+#Статистика БД текущего HTTP-запроса; копируется в потоки пула и greenlet вместе с контекстом
+current_request_db: ContextVar[RequestDBStats | None] = ContextVar('current_request_db', default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Внутри HTTP-запроса обхожусь без блокировок: счетчики копятся в статистике запроса
+    started = getattr(context, '_metrics_started', None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    stats = current_request_db.get()
+    if stats is not None:
+        stats.record(context.dialect.name, elapsed)
+    else:
+        db_queries.inc(context.dialect.name)
+        db_query_seconds.inc(context.dialect.name, amount=elapsed)
+
+
+def instrument_sqlalchemy() -> None:
+    """Подписать счетчики запросов на события всех движков SQLAlchemy"""
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: задержка, статус и запросы к БД по маршрутам
+
+    Маршрут берется из шаблона пути (/tasks/{task_id}), а не из самого пути,
+    чтобы число серий не росло с количеством задач. Время считается до
+    отправки последнего куска тела ответа, включая потоковые ответы.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        db_stats = RequestDBStats()
+        token = current_request_db.set(db_stats)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request_db.reset(token)
+            elapsed = time.perf_counter() - started
+            route = scope.get('route')
+            if route is not None:
+                route_name = route.path
+            else:
+                route_name = '<unmatched>' if status_code == 404 else '<other>'
+            method = scope['method']
+            http_requests.inc(method, route_name, status_code)
+            http_request_duration.observe(elapsed, method, route_name, status_code)
+            http_request_db_queries.observe(db_stats.queries, method, route_name)
+            http_request_db_duration.observe(db_stats.seconds, method, route_name)
+            db_stats.flush()
@@ -0,0 +1,124 @@
+"""Создание и обновление схемы БД
+
+    python -m app.migrate
+
+Приложение при запуске схему не трогает: ее обновляет этот шаг развертывания,
+выполняемый один раз перед запуском процессов приложения (или в lifespan при
+DB_AUTO_MIGRATE=1). Шаг идемпотентен: создает недостающие таблицы, колонки и
+индексы, уже существующие не изменяет. На PostgreSQL миграция идет в одной
+транзакции под advisory-блокировкой, поэтому одновременные запуски не мешают
+друг другу.
+"""
+import logging
+
+from sqlalchemy import func, inspect, literal, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import Column
+
+from app.database import Base, get_engine
+from app.models.idempotency import IdempotencyKey  # noqa: F401
+from app.models.task import rebuild_search_index
+
+logger = logging.getLogger(__name__)
+
+#Ключ advisory-блокировки миграций PostgreSQL
+MIGRATION_LOCK_ID = 0x7461736B
+
+
+def migrate(engine: Engine) -> list[str]:
+    """Привести схему к моделям; возвращает описания выполненных изменений"""
+    with engine.begin() as connection:
+        if connection.dialect.name == 'postgresql':
+            connection.execute(select(func.pg_advisory_xact_lock(MIGRATION_LOCK_ID)))
+        return migrate_connection(connection)
+
+
+def migrate_connection(connection: Connection) -> list[str]:
+    inspector = inspect(connection)
+    applied = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            #Вместе с таблицей задач создаются и ее индексы, и FTS5-таблица SQLite
+            table.create(connection)
+            applied.append(f'create table {table.name}')
+            continue
+
+        columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in columns:
+                connection.exec_driver_sql(add_column_ddl(column, connection))
+                applied.append(f'add column {table.name}.{column.name}')
+
+        indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        missing = [index for index in sorted(table.indexes, key=lambda index: index.name) if index.name not in indexes]
+        for index in missing:
+            #create пропускает индексы, созданные только для другого диалекта (ddl_if)
+            index.create(connection, checkfirst=True)
+        if missing:
+            created = {index['name'] for index in inspect(connection).get_indexes(table.name)}
+            applied.extend(f'create index {index.name}' for index in missing if index.name in created)
+
+    if connection.dialect.name == 'sqlite' and not inspector.has_table('tasks_fts'):
+        rebuild_search_index(connection)
+        applied.append('create search index tasks_fts')
+    return applied
+
+
+def add_column_ddl(column: Column, connection: Connection) -> str:
+    """ALTER TABLE ... ADD COLUMN для колонки модели
+
+    Существующие строки получают значение по умолчанию колонки, поэтому
+    NOT NULL колонку без значения по умолчанию (default или server_default)
+    добавить нельзя.
+    """
+    dialect = connection.dialect
+    preparer = dialect.identifier_preparer
+    ddl = (
+        f'ALTER TABLE {preparer.format_table(column.table)} '
+        f'ADD COLUMN {preparer.format_column(column)} {column.type.compile(dialect=dialect)}'
+    )
+    default = column_default_sql(column, connection)
+    if default is not None:
+        ddl += ' DEFAULT ' + default
+    if not column.nullable:
+        if default is None:
+            raise RuntimeError(f'Cannot add NOT NULL column {column} without a default')
+        ddl += ' NOT NULL'
+    return ddl
+
+
+def column_default_sql(column: Column, connection: Connection) -> str | None:
+    """SQL значения по умолчанию добавляемой колонки: скалярный default или server_default
+
+    SQLite не принимает в ADD COLUMN невычисленное значение по умолчанию
+    (например CURRENT_TIMESTAMP), поэтому на ней выражение server_default
+    вычисляется один раз при миграции, и существующие строки получают его значение.
+    """
+    dialect = connection.dialect
+
+    def render(value) -> str:
+        return str(literal(value).compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+
+    if column.default is not None and column.default.is_scalar:
+        return render(column.default.arg)
+    if column.server_default is None:
+        return None
+    expression = column.server_default.arg
+    if isinstance(expression, str):
+        return render(expression)
+    sql = str(expression.compile(dialect=dialect))
+    if dialect.name == 'sqlite':
+        return render(connection.exec_driver_sql(f'SELECT {sql}').scalar())
+    return sql
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    applied = migrate(get_engine())
+    for step in applied:
+        logger.info(f"Applied: {step}")
+    logger.info(f"Schema is up to date ({len(applied)} changes)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, DateTime, Index, String, Text
+from app.database import Base
+
+
+class IdempotencyKey(Base):
+    """Сохраненный ответ на запрос с заголовком Idempotency-Key
+
+    Первичный ключ (scope, key) разрешает одновременные повторы: запись
+    вставляется в одной транзакции с изменением, и из двух одинаковых
+    запросов зафиксировать ее может только один.
+    """
+    __tablename__ = 'idempotency_keys'
+
+    # Операция, к которой относится ключ, например "POST /tasks/"
+    scope = Column(String(50), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    # Отпечаток тела и параметров запроса: повтор с другим запросом - ошибка клиента
+    fingerprint = Column(String(64), nullable=False)
+    # Тело успешного ответа в JSON; код ответа определяется операцией
+    response = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        # Очередь удаления истекших ключей (app.purge)
+        Index('ix_idempotency_keys_expires_at', 'expires_at'),
+    )
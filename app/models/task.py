@@ -1,8 +1,27 @@
-from sqlalchemy import Column, String, Text
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import (
+    DDL, Column, DateTime, Index, Integer, String, Text, cast, column, event, func, literal_column, table, text,
+)
+from sqlalchemy.dialects.postgresql import REGCONFIG, UUID
+from datetime import datetime, timezone
 import uuid
+from app.config import SEARCH_CONFIG
 from app.database import Base
 
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _search_config():
+    return cast(literal_column(f"'{SEARCH_CONFIG}'"), REGCONFIG)
+
+
+def _search_vector(title, description):
+    # Запрос поиска должен использовать то же выражение, что и GIN-индекс,
+    # иначе индекс не будет применен
+    return func.to_tsvector(_search_config(), title + literal_column("' '") + description)
+
+
 class Task(Base):
     """Модель для задач"""
     __tablename__ = 'tasks'
@@ -11,3 +30,81 @@ class Task(Base):
     title = Column(String(100), nullable=False)
     description = Column(Text, nullable=False)
     status = Column(String(20), default='created', nullable=False)
+    # Значения по умолчанию на стороне БД заполняют строки, существовавшие до
+    # добавления колонки миграцией (app.migrate)
+    created_at = Column(DateTime(timezone=True), default=utcnow, server_default=func.now(), nullable=False)
+    # Номер версии задачи: увеличивается при каждом изменении, из него строится ETag
+    version = Column(Integer, default=1, server_default=text('1'), nullable=False)
+    # Время мягкого удаления: удаленные задачи не читаются, а физически удаляются позже (app.purge)
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Стабильный ключ сортировки для keyset-пагинации: (created_at, id).
+        # Индексы списка частичные: в них только неудаленные задачи
+        Index(
+            'ix_tasks_created_at_id', 'created_at', 'id',
+            postgresql_where=deleted_at.is_(None), sqlite_where=deleted_at.is_(None),
+        ),
+        # Фильтр по статусу с той же сортировкой
+        Index(
+            'ix_tasks_status_created_at_id', 'status', 'created_at', 'id',
+            postgresql_where=deleted_at.is_(None), sqlite_where=deleted_at.is_(None),
+        ),
+        # Поиск по префиксу названия; на PostgreSQL LIKE 'prefix%' требует text_pattern_ops
+        Index('ix_tasks_title', 'title', postgresql_ops={'title': 'text_pattern_ops'}),
+        # Очередь физического удаления: только удаленные задачи
+        Index(
+            'ix_tasks_deleted_at', 'deleted_at',
+            postgresql_where=deleted_at.isnot(None), sqlite_where=deleted_at.isnot(None),
+        ),
+        # Полнотекстовый поиск: GIN-индекс по выражению, только в PostgreSQL
+        Index('ix_tasks_search', _search_vector(title, description), postgresql_using='gin').ddl_if(
+            dialect='postgresql'
+        ),
+    )
+    # Изменения через ORM сравнивают версию с прочитанной (UPDATE ... WHERE version = :old)
+    # и увеличивают ее: конкурентное изменение дает StaleDataError, а не теряется
+    __mapper_args__ = {'version_id_col': version}
+
+
+def search_document():
+    """Документ полнотекстового поиска PostgreSQL по названию и описанию задачи"""
+    return _search_vector(Task.title, Task.description)
+
+
+def search_query(text: str):
+    """Поисковый запрос PostgreSQL в синтаксисе веб-поиска: "фразы", OR, -исключения"""
+    return func.websearch_to_tsquery(_search_config(), text)
+
+
+# В SQLite поиск идет по внешней FTS5-таблице, которую триггеры синхронизируют с tasks
+# при любых INSERT, UPDATE и DELETE, в том числе пакетных. Строки связаны по rowid;
+# VACUUM может перенумеровать rowid, после него индекс нужно перестроить (rebuild_search_index)
+SQLITE_SEARCH_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5("
+    "title, description, content='tasks', content_rowid='rowid')",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN "
+    "INSERT INTO tasks_fts(rowid, title, description) VALUES (new.rowid, new.title, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN "
+    "INSERT INTO tasks_fts(tasks_fts, rowid, title, description) "
+    "VALUES ('delete', old.rowid, old.title, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, description ON tasks BEGIN "
+    "INSERT INTO tasks_fts(tasks_fts, rowid, title, description) "
+    "VALUES ('delete', old.rowid, old.title, old.description); "
+    "INSERT INTO tasks_fts(rowid, title, description) VALUES (new.rowid, new.title, new.description); END",
+)
+
+#FTS5-таблица для запросов поиска; в метаданные не входит, создается DDL выше
+tasks_fts = table('tasks_fts', column('rowid'))
+
+for statement in SQLITE_SEARCH_DDL:
+    event.listen(Task.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+event.listen(Task.__table__, 'before_drop', DDL('DROP TABLE IF EXISTS tasks_fts').execute_if(dialect='sqlite'))
+
+
+def rebuild_search_index(connection) -> None:
+    """Перестроить FTS5-индекс SQLite по текущему содержимому tasks"""
+    if connection.dialect.name == 'sqlite':
+        for statement in SQLITE_SEARCH_DDL:
+            connection.exec_driver_sql(statement)
+        connection.exec_driver_sql("INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')")
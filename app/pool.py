@@ -0,0 +1,123 @@
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.engine import Engine, URL
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+
+from app.config import DatabaseSettings
+
+
+class PoolStats:
+    """Накопительная статистика ожидания соединений из пула"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, wait: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += wait
+            self.wait_seconds_max = max(self.wait_seconds_max, wait)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'wait_seconds_total': round(self.wait_seconds_total, 6),
+                'wait_seconds_max': round(self.wait_seconds_max, 6),
+                'wait_seconds_avg': round(self.wait_seconds_total / self.checkouts, 6) if self.checkouts else 0.0,
+            }
+
+
+class TimedPoolMixin:
+    """Замер времени получения соединения из пула
+
+    Время включает ожидание свободного соединения и, если пул создает новое
+    соединение сверх pool_size, время подключения.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self):
+        # Статистика переживает dispose() движка
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - started)
+        return connection
+
+
+class TimedQueuePool(TimedPoolMixin, QueuePool):
+    """QueuePool со статистикой ожидания"""
+
+
+class TimedAsyncAdaptedQueuePool(TimedPoolMixin, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool со статистикой ожидания"""
+
+
+def is_memory_sqlite(url: URL) -> bool:
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def engine_options(url: URL, settings: DatabaseSettings, is_async: bool = False) -> dict:
+    """Аргументы create_engine / create_async_engine для настроек пула
+
+    SQLite в памяти использует собственный пул на одно соединение, поэтому
+    параметры размера пула к нему не применяются. Ограничение времени запроса
+    передается через параметры подключения PostgreSQL.
+    """
+    options = {'pool_pre_ping': settings.pool_pre_ping}
+    if not is_memory_sqlite(url):
+        options.update(
+            poolclass=TimedAsyncAdaptedQueuePool if is_async else TimedQueuePool,
+            pool_size=settings.pool_size,
+            max_overflow=settings.max_overflow,
+            pool_timeout=settings.pool_timeout,
+            pool_recycle=settings.pool_recycle,
+        )
+    if settings.statement_timeout_ms and url.get_backend_name() == 'postgresql':
+        if is_async:
+            options['connect_args'] = {'server_settings': {'statement_timeout': str(settings.statement_timeout_ms)}}
+        else:
+            options['connect_args'] = {'options': f'-c statement_timeout={settings.statement_timeout_ms}'}
+    return options
+
+
+def pool_status(engine: Engine | None) -> dict | None:
+    """Текущее состояние пула движка: занятые соединения, превышение и ожидание"""
+    if engine is None:
+        return None
+    pool: Pool = engine.pool
+    status = {'pool': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+            max_overflow=pool._max_overflow,
+            timeout=pool.timeout(),
+        )
+    stats = getattr(pool, 'stats', None)
+    if stats is not None:
+        status.update(stats.snapshot())
+    return status
@@ -0,0 +1,150 @@
+"""Фоновое физическое удаление мягко удаленных задач и истекших ключей идемпотентности
+
+    python -m app.purge          # работать постоянно, удаляя в окне PURGE_WINDOW_*
+    python -m app.purge --once   # удалить все, что можно, и выйти
+
+Задачи удаляются небольшими порциями в отдельных транзакциях с паузой между
+порциями, чтобы не держать долгих блокировок и не создавать всплесков нагрузки.
+"""
+import argparse
+import logging
+import signal
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable
+
+from sqlalchemy import delete, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import sessionmaker
+
+from app.config import (
+    PURGE_BATCH_SIZE, PURGE_IDLE_INTERVAL, PURGE_INTERVAL, PURGE_RETENTION, PURGE_WINDOW_END, PURGE_WINDOW_START,
+)
+from app.crud.idempotency import IdempotencyStore
+from app.database import SessionLocal, init_engines
+from app.models.task import Task, utcnow
+
+logger = logging.getLogger(__name__)
+
+
+class PurgeWorker:
+    """Удаляет задачи, помеченные удаленными раньше retention секунд назад"""
+
+    def __init__(
+        self,
+        session_factory: sessionmaker = SessionLocal,
+        batch_size: int = PURGE_BATCH_SIZE,
+        interval: float = PURGE_INTERVAL,
+        retention: float = PURGE_RETENTION,
+        window: tuple[int, int] = (PURGE_WINDOW_START, PURGE_WINDOW_END),
+        idle_interval: float = PURGE_IDLE_INTERVAL,
+        clock: Callable[[], datetime] = utcnow,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.interval = interval
+        self.retention = timedelta(seconds=retention)
+        self.window = window
+        self.idle_interval = idle_interval
+        self.clock = clock
+        self.sleep = sleep
+
+    def in_window(self) -> bool:
+        """Находится ли текущее время в окне удаления (часы UTC, окно может переходить через полночь)"""
+        start, end = self.window
+        if start == end:
+            return True
+        hour = self.clock().hour
+        return start <= hour < end if start < end else hour >= start or hour < end
+
+    def purge_batch(self) -> int:
+        """Удалить одну порцию задач в своей транзакции и вернуть их число
+
+        Строки, заблокированные другими транзакциями, пропускаются (SKIP LOCKED
+        на PostgreSQL), поэтому удаление не ждет запросы пользователей.
+        """
+        cutoff = self.clock() - self.retention
+        batch = (
+            select(Task.id)
+            .where(Task.deleted_at.isnot(None), Task.deleted_at < cutoff)
+            .order_by(Task.deleted_at)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        with self.session_factory() as db:
+            try:
+                result = db.execute(
+                    delete(Task).where(Task.id.in_(batch)).execution_options(synchronize_session=False)
+                )
+                db.commit()
+                return result.rowcount
+            except SQLAlchemyError as e:
+                db.rollback()
+                logger.error(f"Error purging deleted tasks: {str(e)}")
+                raise
+
+    def purge_idempotency_keys(self, stop: threading.Event | None = None, ignore_window: bool = False) -> int:
+        """Удалить истекшие ключи идемпотентности порциями и вернуть их число"""
+        total = 0
+        while stop is None or not stop.is_set():
+            with self.session_factory() as db:
+                purged = IdempotencyStore(db, clock=self.clock).purge_expired(self.batch_size)
+            total += purged
+            if purged < self.batch_size or not (ignore_window or self.in_window()):
+                break
+            self.sleep(self.interval)
+        if total:
+            logger.info(f"Purged {total} expired idempotency keys")
+        return total
+
+    def run_once(self, stop: threading.Event | None = None, ignore_window: bool = False) -> int:
+        """Удалять порции, пока они полные и не вышло окно; вернуть число удаленных задач
+
+        С ignore_window окно не проверяется: удаляется все, что можно.
+        Затем тем же способом удаляются истекшие ключи идемпотентности.
+        """
+        total = 0
+        while stop is None or not stop.is_set():
+            purged = self.purge_batch()
+            total += purged
+            if purged < self.batch_size or not (ignore_window or self.in_window()):
+                break
+            self.sleep(self.interval)
+        if total:
+            logger.info(f"Purged {total} deleted tasks")
+        self.purge_idempotency_keys(stop, ignore_window)
+        return total
+
+    def run(self, stop: threading.Event) -> None:
+        """Работать до установки stop, удаляя задачи только в окне"""
+        while not stop.is_set():
+            if self.in_window():
+                try:
+                    self.run_once(stop)
+                except SQLAlchemyError:
+                    pass
+            stop.wait(self.idle_interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--once', action='store_true', help='удалить все, что можно, без учета окна, и выйти')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    init_engines()
+    worker = PurgeWorker()
+    if args.once:
+        worker.run_once(ignore_window=True)
+        return
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    worker.run(stop)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,268 @@
+"""Чтение с реплик БД
+
+Запросы на чтение (список задач, задача по ID, поиск, подсчет и выгрузка)
+выполняются на репликах из REPLICA_DSNS, изменения - на основной БД. Реплика
+выбирается по очереди или по наименьшему числу занятых соединений пула.
+Фоновый поток периодически проверяет реплики запросом SELECT 1: недоступная
+реплика исключается из выбора до следующей успешной проверки, а если
+доступных реплик нет, чтение идет с основной БД.
+
+Реплики отстают от основной БД, поэтому клиент, который только что изменил
+задачи, некоторое время читает с основной БД: после успешного изменения
+ReadYourWritesMiddleware возвращает момент, до которого чтения клиента идут
+на основную БД, в cookie и в заголовке X-Read-Primary-Until. Cookie или
+повторенный клиентом заголовок действуют при любом числе процессов и
+экземпляров приложения. Для клиентов, которые не делают ни того, ни другого,
+процесс также запоминает этот момент по заголовку X-Client-Id. IP-адрес для
+этого не подходит: за прокси или NAT он общий у многих клиентов, и изменение
+одного из них отправляло бы на основную БД чтения всех.
+"""
+import itertools
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+
+from app.admission import READ_METHODS
+from app.config import REPLICA_HEALTH_INTERVAL, REPLICA_SELECTION, REPLICA_STICKY_SECONDS
+
+logger = logging.getLogger(__name__)
+
+#Cookie с моментом (Unix time), до которого чтения клиента идут на основную БД
+READ_PRIMARY_COOKIE = 'read_primary_until'
+#Заголовок с тем же моментом: в ответе на изменение и в запросах клиентов без cookie
+READ_PRIMARY_HEADER = 'X-Read-Primary-Until'
+#Заголовок, по которому процесс запоминает изменения клиента
+CLIENT_ID_HEADER = b'x-client-id'
+
+
+class Replica:
+    """Реплика: движки для запросов и проверок и состояние доступности"""
+
+    def __init__(self, name: str, engine: Engine, async_engine: AsyncEngine | None = None):
+        self.name = name
+        #Синхронный движок проверяет доступность и обслуживает запросы в режиме DB_MODE=sync
+        self.engine = engine
+        self.async_engine = async_engine
+        self.healthy = True
+        self.failures = 0
+        self.last_error: str | None = None
+
+    @property
+    def request_engine(self) -> Engine:
+        """Синхронный движок пула, из которого берутся соединения запросов"""
+        return self.async_engine.sync_engine if self.async_engine is not None else self.engine
+
+    def busy(self) -> int:
+        """Число занятых соединений пула запросов"""
+        checkedout = getattr(self.request_engine.pool, 'checkedout', None)
+        return checkedout() if checkedout is not None else 0
+
+
+class ReplicaSet:
+    """Реплики для чтения с выбором доступной реплики и фоновой проверкой доступности"""
+
+    def __init__(self, replicas: list[Replica], selection: str = REPLICA_SELECTION):
+        self.replicas = replicas
+        self.selection = selection
+        self.reads = {replica.name: 0 for replica in replicas}
+        self.primary_reads = 0
+        self._counter = itertools.count()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def choose(self) -> Replica | None:
+        """Реплика для очередного чтения или None - читать с основной БД"""
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            if self.replicas:
+                self.primary_reads += 1
+            return None
+        if self.selection == 'least_busy':
+            replica = min(healthy, key=lambda replica: replica.busy())
+        else:
+            replica = healthy[next(self._counter) % len(healthy)]
+        self.reads[replica.name] += 1
+        return replica
+
+    def mark_failed(self, replica: Replica, error: Exception) -> None:
+        """Исключить реплику из выбора до следующей успешной проверки"""
+        if replica.healthy:
+            logger.error(f"Replica {replica.name} is unavailable: {str(error)}")
+        replica.healthy = False
+        replica.failures += 1
+        replica.last_error = str(error).splitlines()[0] if str(error) else type(error).__name__
+
+    def check(self) -> None:
+        """Проверить доступность всех реплик запросом SELECT 1"""
+        for replica in self.replicas:
+            try:
+                with replica.engine.connect() as connection:
+                    connection.execute(text('SELECT 1'))
+            except Exception as e:
+                self.mark_failed(replica, e)
+                continue
+            if not replica.healthy:
+                logger.info(f"Replica {replica.name} is available again")
+            replica.healthy = True
+
+    def start(self, interval: float = REPLICA_HEALTH_INTERVAL) -> None:
+        """Запустить фоновую проверку доступности реплик"""
+        if not self.replicas or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name='replica-health', daemon=True)
+        self._thread.start()
+
+    def _run(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            self.check()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def reset_after_fork(self) -> None:
+        """В дочернем процессе после fork: пустые пулы и незапущенная проверка доступности"""
+        self._stop = threading.Event()
+        self._thread = None
+        for replica in self.replicas:
+            replica.engine.dispose(close=False)
+            if replica.async_engine is not None:
+                replica.async_engine.sync_engine.dispose(close=False)
+
+    def stats(self) -> dict:
+        return {
+            'selection': self.selection,
+            'replicas': {
+                replica.name: {
+                    'healthy': replica.healthy,
+                    'busy': replica.busy(),
+                    'reads': self.reads[replica.name],
+                    'failures': replica.failures,
+                    'last_error': replica.last_error,
+                }
+                for replica in self.replicas
+            },
+            'primary_reads': self.primary_reads,
+        }
+
+
+def client_id(scope) -> str | None:
+    """Идентификатор клиента из заголовка X-Client-Id или None, если клиент его не передал"""
+    for name, value in scope['headers']:
+        if name == CLIENT_ID_HEADER:
+            return value.decode('latin-1') or None
+    return None
+
+
+class RecentWriters:
+    """Клиенты с X-Client-Id, недавно изменявшие задачи, и моменты, до которых они читают с основной БД
+
+    Хранится в памяти процесса, не больше max_clients клиентов: вытесняются
+    изменявшие задачи раньше остальных.
+    """
+
+    def __init__(self, max_clients: int = 10000):
+        self.max_clients = max_clients
+        self._until: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, client: str, until: float) -> None:
+        with self._lock:
+            self._until.pop(client, None)
+            self._until[client] = until
+            while len(self._until) > self.max_clients:
+                self._until.popitem(last=False)
+
+    def until(self, client: str) -> float:
+        with self._lock:
+            return self._until.get(client, 0.0)
+
+
+recent_writers = RecentWriters()
+
+
+def reads_primary(
+    connection: HTTPConnection,
+    clock: Callable[[], float] = time.time,
+    writers: RecentWriters | None = None,
+) -> bool:
+    """Должен ли клиент читать с основной БД: он недавно изменял задачи
+
+    Момент берется из cookie, из заголовка X-Read-Primary-Until и, если
+    клиент передает X-Client-Id, из его изменений в текущем процессе.
+    """
+    now = clock()
+    for value in (connection.cookies.get(READ_PRIMARY_COOKIE), connection.headers.get(READ_PRIMARY_HEADER)):
+        try:
+            if value is not None and float(value) > now:
+                return True
+        except ValueError:
+            pass
+    client = client_id(connection.scope)
+    if client is None:
+        return False
+    writers = writers if writers is not None else recent_writers
+    return writers.until(client) > now
+
+
+class ReadYourWritesMiddleware:
+    """ASGI-middleware: после успешного изменения задач клиент sticky секунд читает с основной БД
+
+    Cookie и заголовок X-Read-Primary-Until ставятся в ответ на запросы
+    с методами изменения к маршрутам с префиксом prefix, завершившиеся с кодом
+    меньше 400; для клиента с X-Client-Id тот же момент запоминается в writers.
+    """
+
+    def __init__(
+        self,
+        app,
+        sticky: float = REPLICA_STICKY_SECONDS,
+        prefix: str = '/tasks',
+        clock: Callable[[], float] = time.time,
+        writers: RecentWriters | None = None,
+    ):
+        self.app = app
+        self.sticky = sticky
+        self.prefix = prefix
+        self.clock = clock
+        self.writers = writers
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope['type'] != 'http'
+            or scope['method'] in READ_METHODS
+            or not scope['path'].startswith(self.prefix)
+            or self.sticky <= 0
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message):
+            if message['type'] == 'http.response.start' and message['status'] < 400:
+                until = self.clock() + self.sticky
+                client = client_id(scope)
+                if client is not None:
+                    writers = self.writers if self.writers is not None else recent_writers
+                    writers.add(client, until)
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    'set-cookie',
+                    f'{READ_PRIMARY_COOKIE}={until:.3f}; Max-Age={math.ceil(self.sticky)}; '
+                    f'Path={self.prefix}; HttpOnly; SameSite=Lax',
+                )
+                headers[READ_PRIMARY_HEADER] = f'{until:.3f}'
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
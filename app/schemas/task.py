@@ -1,12 +1,22 @@
 from uuid import UUID
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, model_validator
+from typing import Dict, List, Literal, Optional
+from app.config import BULK_MAX_ITEMS
+
+#Допустимые статусы задачи
+TaskStatus = Literal['created', 'in_progress', 'completed']
+#Направление сортировки списка задач по времени создания
+TaskOrder = Literal['asc', 'desc']
+#Поля задачи, которые можно запросить параметром fields
+TaskField = Literal['id', 'title', 'description', 'status', 'version']
+#Способ подсчета числа задач: точно, оценкой планировщика или по счетчикам процесса
+TaskCountMode = Literal['exact', 'estimated', 'cached']
 
 class TaskBase(BaseModel):
     """Схема с общими атрибутами для создания и чтения"""
     title: str = Field(..., min_length=1, max_length=100)
     description: Optional[str] = Field(None, min_length=1, max_length=1000)
-    status: Optional[str] = Field(default='created')
+    status: Optional[TaskStatus] = Field(default='created')
 
 class TaskCreate(TaskBase):
     """Схема создания задачи"""
@@ -16,11 +26,85 @@ class TaskUpdate(BaseModel):
     """Схема для обновления задачи"""
     title: Optional[str] = Field(None, min_length=1, max_length=100)
     description: Optional[str] = Field(None, min_length=1, max_length=1000)
-    status: Optional[str] = Field(None)
+    status: Optional[TaskStatus] = Field(None)
+
+class TaskFilter(BaseModel):
+    """Схема фильтра списка задач"""
+    status: Optional[List[TaskStatus]] = Field(None, min_length=1)
+    title_prefix: Optional[str] = Field(None, min_length=1, max_length=100)
 
 class Task(TaskBase):
     """Схема для чтения и возврата данных о задаче"""
     id: UUID
+    version: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+class TaskPartial(BaseModel):
+    """Задача только с полями, выбранными параметром fields (id есть всегда)"""
+    id: UUID
+    title: Optional[str] = None
+    description: Optional[str] = None
+    status: Optional[TaskStatus] = None
+    version: Optional[int] = None
+
+class TaskBulkError(BaseModel):
+    """Ошибка создания одной задачи из пакета"""
+    index: int
+    detail: str
+
+    class Config:
+        from_attributes = True
+
+class TaskBulkResult(BaseModel):
+    """Результат пакетного создания задач"""
+    created: List[Task]
+    errors: List[TaskBulkError] = []
+
+    class Config:
+        from_attributes = True
+
+class TaskBulkTarget(BaseModel):
+    """Задачи пакетной операции: список ID или фильтр"""
+    ids: Optional[List[UUID]] = Field(None, min_length=1, max_length=BULK_MAX_ITEMS)
+    filter: Optional[TaskFilter] = None
+
+    @model_validator(mode='after')
+    def check_target(self):
+        if (self.ids is None) == (self.filter is None):
+            raise ValueError('Exactly one of ids or filter must be set')
+        if self.filter is not None and not self.filter.model_dump(exclude_none=True):
+            raise ValueError('filter must contain at least one condition')
+        return self
+
+class TaskBulkUpdate(TaskBulkTarget):
+    """Схема пакетного обновления: изменения для списка ID или для фильтра"""
+    update: TaskUpdate
+
+    @model_validator(mode='after')
+    def check_update(self):
+        if not self.update.model_dump(exclude_unset=True):
+            raise ValueError('update must set at least one field')
+        return self
+
+class TaskBulkUpdateResult(BaseModel):
+    """Результат пакетного обновления: число измененных задач и, по запросу, сами задачи"""
+    updated: int
+    tasks: Optional[List[Task]] = None
+
+    class Config:
+        from_attributes = True
+
+class TaskBulkDeleteResult(BaseModel):
+    """Результат пакетного удаления: число удаленных задач"""
+    deleted: int
+
+class TaskCountResult(BaseModel):
+    """Число задач: всего и по статусам, и режим, которым оно получено"""
+    total: int
+    by_status: Dict[TaskStatus, int]
+    mode: TaskCountMode
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
@@ -0,0 +1,110 @@
+"""Запуск приложения в нескольких процессах для продакшена
+
+    python -m app.serve                                  # по процессу на CPU
+    python -m app.serve --workers 4 --db-connections 40 --migrate
+
+Процессы-обработчики запускает uvicorn. Каждый процесс импортирует приложение
+заново и создает свои движки БД при запуске, поэтому соединения между
+процессами не разделяются (при fork после импорта пулы сбрасывает
+app.database). Общий бюджет соединений с БД (--db-connections) делится
+между процессами поровну. По SIGTERM процессы перестают принимать
+соединения, дожидаются выполняющихся запросов не дольше --graceful-timeout
+секунд, дописывают задачи групповой фиксации и закрывают соединения с БД.
+
+Значения по умолчанию берутся из SERVE_HOST, SERVE_PORT, SERVE_WORKERS,
+DB_CONNECTION_BUDGET и SERVE_GRACEFUL_TIMEOUT. Настройки приложения
+(app.config) здесь не импортируются до того, как в окружение записаны
+настройки пула одного процесса.
+"""
+import argparse
+import asyncio
+import logging
+import os
+
+import uvicorn
+
+logger = logging.getLogger(__name__)
+
+
+def default_workers() -> int:
+    """Число процессов по умолчанию: по одному на CPU"""
+    return os.cpu_count() or 1
+
+
+def worker_environment(workers: int, db_connections: int, environ=os.environ) -> dict[str, str]:
+    """Настройки одного процесса при workers процессах и общем бюджете соединений db_connections
+
+    Пул процесса получает свою долю бюджета без превышения сверх нее, чтобы
+    все процессы вместе не открыли больше соединений. Лимиты контроля допуска,
+    если не заданы явно, делятся в той же доле (две трети на чтения), чтобы
+    запросы не ждали соединений пула. 0 - бюджет не задан, пул не меняется.
+
+    Кэш задач процесса инвалидируют только его записи и события других
+    процессов, которые передает EVENTS_BACKEND=postgres. С локальной передачей
+    событий при нескольких процессах кэш выключается, иначе процессы отдавали
+    бы удаленную или устаревшую задачу, измененную в другом процессе.
+    """
+    settings = {}
+    if workers > 1 and environ.get('EVENTS_BACKEND', 'local') != 'postgres':
+        settings['TASK_CACHE_ENABLED'] = '0'
+    if db_connections <= 0:
+        return settings
+    per_worker = db_connections // workers
+    if per_worker < 1:
+        raise ValueError(f"DB connection budget {db_connections} is less than the number of workers {workers}")
+    settings.update({
+        'DB_POOL_SIZE': str(per_worker),
+        'DB_MAX_OVERFLOW': '0',
+        'DB_POOL_WARMUP': str(min(int(environ.get('DB_POOL_WARMUP') or per_worker), per_worker)),
+    })
+    write = max(1, per_worker // 3)
+    defaults = {
+        'ADMISSION_READ_CONCURRENCY': str(max(1, per_worker - write)),
+        'ADMISSION_WRITE_CONCURRENCY': str(write),
+    }
+    settings.update({name: value for name, value in defaults.items() if not environ.get(name)})
+    return settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default=os.getenv('SERVE_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=os.getenv('SERVE_PORT', '8000'))
+    parser.add_argument('--workers', type=int, default=os.getenv('SERVE_WORKERS') or default_workers())
+    parser.add_argument(
+        '--db-connections', type=int, default=os.getenv('DB_CONNECTION_BUDGET', '0'),
+        help='соединений с БД на все процессы вместе, 0 - пул каждого процесса по DB_POOL_SIZE',
+    )
+    parser.add_argument('--graceful-timeout', type=float, default=os.getenv('SERVE_GRACEFUL_TIMEOUT', '30'))
+    parser.add_argument('--migrate', action='store_true', help='обновить схему БД до запуска процессов')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    environment = worker_environment(args.workers, args.db_connections)
+    os.environ.update(environment)
+    for name, value in environment.items():
+        logger.info(f"{name}={value}")
+    if args.workers > 1 and os.getenv('EVENTS_BACKEND', 'local') != 'postgres':
+        logger.warning(
+            "EVENTS_BACKEND=local with several workers: task cache is disabled, "
+            "GET /tasks/events subscribers only receive changes made by their own worker"
+        )
+
+    if args.migrate:
+        #Схему обновляет один процесс до запуска обработчиков
+        from app.database import dispose_engines, get_engine
+        from app.migrate import migrate
+        migrate(get_engine())
+        asyncio.run(dispose_engines())
+
+    uvicorn.run(
+        'main:app',
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        timeout_graceful_shutdown=args.graceful_timeout,
+    )
+
+
+if __name__ == '__main__':
+    main()
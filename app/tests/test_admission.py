@@ -0,0 +1,119 @@
+import asyncio
+import httpx
+import pytest
+from fastapi import FastAPI
+from app.admission import AdmissionController, AdmissionMiddleware, ConcurrencyLimiter, RateLimiter, parse_route_limits
+
+
+def test_concurrency_limiter_queue_and_timeout():
+    """Тест лимита: ожидание в очереди, отказ по таймауту и при заполненной очереди"""
+    limiter = ConcurrencyLimiter("read", limit=1, queue_size=1, max_wait=0.05)
+    
+    async def scenario():
+        assert await limiter.acquire()
+        waiting = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        # Очередь занята ожидающим запросом
+        assert not await limiter.acquire()
+        assert not await waiting
+        
+        handed_over = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        limiter.release()
+        assert await handed_over
+        assert limiter.active == 1
+        limiter.release()
+    
+    asyncio.run(scenario())
+    assert limiter.stats() == {
+        "limit": 1, "active": 0, "waiting": 0, "admitted": 2, "shed": {"queue_full": 1, "timeout": 1},
+    }
+
+
+def test_rate_limiter_token_bucket():
+    """Тест token bucket: всплеск до burst, затем rate запросов в секунду на клиента"""
+    now = [0.0]
+    limiter = RateLimiter(rate=2, burst=2, clock=lambda: now[0])
+    
+    assert limiter.acquire("a") == 0 and limiter.acquire("a") == 0
+    assert limiter.acquire("a") == pytest.approx(0.5)
+    assert limiter.acquire("b") == 0
+    now[0] = 0.5
+    assert limiter.acquire("a") == 0
+    assert limiter.stats()["limited"] == 1
+
+
+def test_parse_route_limits():
+    """Тест разбора лимитов маршрутов из настроек"""
+    assert parse_route_limits("get /tasks/export=2, POST /tasks/bulk=4") == {
+        "GET /tasks/export": 2, "POST /tasks/bulk": 4,
+    }
+    assert parse_route_limits("") == {}
+    with pytest.raises(ValueError):
+        parse_route_limits("/tasks/export=two")
+
+
+def make_app(controller):
+    app = FastAPI()
+    
+    @app.get("/tasks/events")
+    async def events():
+        await asyncio.sleep(0.05)
+        return {}
+    
+    @app.get("/tasks/{task_id}")
+    async def read(task_id: str):
+        await asyncio.sleep(0.05)
+        return {"id": task_id}
+    
+    @app.post("/tasks/")
+    async def create():
+        await asyncio.sleep(0.05)
+        return {}
+    
+    app.add_middleware(AdmissionMiddleware, controller=controller)
+    return app
+
+
+def send_concurrently(app, *requests):
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(client.request(method, url) for method, url in requests))
+    return asyncio.run(scenario())
+
+
+def test_middleware_sheds_reads_separately_from_writes():
+    """Тест: лишнее чтение получает 503 с Retry-After, изменения и лента не ограничиваются лимитом чтений"""
+    controller = AdmissionController(
+        read=ConcurrencyLimiter("read", 1), write=ConcurrencyLimiter("write", 1), retry_after=2,
+    )
+    app = make_app(controller)
+    
+    responses = send_concurrently(
+        app, ("GET", "/tasks/1"), ("GET", "/tasks/2"), ("POST", "/tasks/"), ("GET", "/tasks/events"),
+    )
+    assert sorted(response.status_code for response in responses[:2]) == [200, 503]
+    rejected = next(response for response in responses if response.status_code == 503)
+    assert rejected.headers["Retry-After"] == "2"
+    assert responses[2].status_code == 200
+    assert responses[3].status_code == 200
+    assert controller.stats()["read"]["shed"]["queue_full"] == 1
+    assert controller.stats()["write"]["active"] == 0
+
+
+def test_middleware_route_limit_and_rate_limit():
+    """Тест лимита маршрута и ограничения частоты запросов клиента (429)"""
+    controller = AdmissionController(
+        read=ConcurrencyLimiter("read", 10),
+        write=ConcurrencyLimiter("write", 10),
+        routes={"POST /tasks/": 1},
+    )
+    app = make_app(controller)
+    statuses = [response.status_code for response in send_concurrently(app, ("POST", "/tasks/"), ("POST", "/tasks/"))]
+    assert sorted(statuses) == [200, 503]
+    
+    controller.rate_limiter = RateLimiter(rate=1, burst=1)
+    first, second = send_concurrently(app, ("GET", "/tasks/1"), ("GET", "/tasks/2"))
+    assert {first.status_code, second.status_code} == {200, 429}
+    assert (first if first.status_code == 429 else second).headers["Retry-After"] == "1"
@@ -1,3 +1,6 @@
+import csv
+import io
+import json
 import pytest
 from fastapi import status
 from uuid import UUID
@@ -91,4 +94,379 @@ def test_validation_errors(client):
         "title": "A" * 101,  # > 100 символов
         "description": "Test"
     })
-    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
\ No newline at end of file
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+def test_get_tasks_list_cursor(client):
+    """Тест обхода списка задач по курсору из заголовка X-Next-Cursor"""
+    for i in range(5):
+        client.post("/tasks/", json={"title": f"Task {i}", "description": "D"})
+    
+    titles = []
+    response = client.get("/tasks/?limit=2")
+    while True:
+        assert response.status_code == status.HTTP_200_OK
+        titles.extend(task["title"] for task in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        response = client.get("/tasks/", params={"limit": 2, "cursor": cursor})
+    
+    assert titles == [f"Task {i}" for i in range(5)]
+
+
+def test_get_tasks_list_invalid_cursor(client):
+    """Тест невалидного курсора"""
+    response = client.get("/tasks/?cursor=not-a-cursor")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_create_tasks_bulk(client):
+    """Тест пакетного создания задач через API"""
+    payload = [{"title": f"Task {i}", "description": "D"} for i in range(3)]
+    
+    response = client.post("/tasks/bulk?chunk_size=2", json=payload)
+    
+    assert response.status_code == status.HTTP_201_CREATED
+    data = response.json()
+    assert [t["title"] for t in data["created"]] == ["Task 0", "Task 1", "Task 2"]
+    assert data["errors"] == []
+    assert len(client.get("/tasks/").json()) == 3
+
+
+def test_create_tasks_bulk_atomic_conflict(client):
+    """Тест: ошибка в атомарном пакете возвращает 409 и ничего не создает"""
+    payload = [{"title": "Task 0", "description": "D"}, {"title": "Task 1"}]
+    
+    response = client.post("/tasks/bulk", json=payload)
+    
+    assert response.status_code == status.HTTP_409_CONFLICT
+    assert client.get("/tasks/").json() == []
+
+
+def test_create_tasks_bulk_partial(client):
+    """Тест пакета без atomic: ошибки возвращаются по индексам"""
+    payload = [{"title": "Task 0", "description": "D"}, {"title": "Task 1"}]
+    
+    response = client.post("/tasks/bulk?atomic=false", json=payload)
+    
+    assert response.status_code == status.HTTP_201_CREATED
+    data = response.json()
+    assert [t["title"] for t in data["created"]] == ["Task 0"]
+    assert data["errors"][0]["index"] == 1
+
+
+def test_create_tasks_bulk_validation(client):
+    """Тест валидации пакета"""
+    assert client.post("/tasks/bulk", json=[]).status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    response = client.post("/tasks/bulk", json=[{"title": "A" * 101, "description": "D"}])
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_get_task_after_update_and_delete_not_stale(client, created_task):
+    """Тест: закэшированная задача не отдается после изменения и удаления"""
+    task_id = created_task["id"]
+    client.get(f"/tasks/{task_id}")
+    
+    client.patch(f"/tasks/{task_id}", json={"status": "completed"})
+    assert client.get(f"/tasks/{task_id}").json()["status"] == "completed"
+    
+    client.delete(f"/tasks/{task_id}")
+    assert client.get(f"/tasks/{task_id}").status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_cache_stats(client, created_task):
+    """Тест счетчиков кэша"""
+    client.get(f"/tasks/{created_task['id']}")
+    client.get(f"/tasks/{created_task['id']}")
+    
+    response = client.get("/stats/cache")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["hits"] >= 1
+    assert {"misses", "evictions", "size"} <= set(response.json())
+
+
+def test_get_tasks_list_filters(client):
+    """Тест фильтрации и сортировки списка задач через API"""
+    for title, task_status in [("Alpha", "created"), ("Beta", "in_progress"), ("Alpine", "completed")]:
+        client.post("/tasks/", json={"title": title, "description": "D", "status": task_status})
+    
+    response = client.get("/tasks/?status=created&status=completed&order=desc")
+    assert response.status_code == status.HTTP_200_OK
+    assert [t["title"] for t in response.json()] == ["Alpine", "Alpha"]
+    
+    response = client.get("/tasks/?title_prefix=Alp")
+    assert [t["title"] for t in response.json()] == ["Alpha", "Alpine"]
+
+
+def test_get_tasks_list_invalid_filters(client):
+    """Тест валидации параметров фильтрации"""
+    assert client.get("/tasks/?status=unknown").status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert client.get("/tasks/?order=sideways").status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_export_ndjson(client):
+    """Тест потоковой выгрузки задач в NDJSON"""
+    client.post("/tasks/bulk", json=[{"title": f"Task {i}", "description": "D"} for i in range(3)])
+    
+    response = client.get("/tasks/export")
+    
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["title"] for line in lines] == ["Task 0", "Task 1", "Task 2"]
+    assert set(lines[0]) == {"id", "title", "description", "status"}
+
+
+def test_export_csv_with_filter(client):
+    """Тест выгрузки в CSV с фильтром по статусу"""
+    client.post("/tasks/", json={"title": "Done, really", "description": "D", "status": "completed"})
+    client.post("/tasks/", json={"title": "Open", "description": "D", "status": "created"})
+    
+    response = client.get("/tasks/export?format=csv&status=completed")
+    
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == ["id", "title", "description", "status"]
+    assert [row[1] for row in rows[1:]] == ["Done, really"]
+
+
+def test_pool_stats(client):
+    """Тест эндпоинта статистики пула соединений"""
+    response = client.get("/stats/pool")
+    assert response.status_code == status.HTTP_200_OK
+    assert "sync" in response.json()
+
+
+def test_admission_stats(client, created_task):
+    """Тест эндпоинта контроля допуска: запросы к /tasks учитываются в лимитах"""
+    client.get(f"/tasks/{created_task['id']}")
+    stats = client.get("/stats/admission").json()
+    assert stats["read"]["admitted"] >= 1
+    assert stats["write"]["active"] == 0
+
+
+def test_metrics_endpoint(client, created_task):
+    """Тест метрик по шаблону маршрута и запросов к БД"""
+    client.get(f"/tasks/{created_task['id']}")
+    client.get("/tasks/")
+    
+    response = client.get("/metrics")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'http_requests_total{method="GET",route="/tasks/{task_id}",status="200"}' in body
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/tasks/",status="200",le="+Inf"}' in body
+    assert 'http_request_db_queries_count{method="GET",route="/tasks/"}' in body
+    assert "db_queries_total" in body
+    assert created_task["id"] not in body
+
+
+def test_read_task_not_modified(client, created_task):
+    """Тест ответа 304 на совпадающий If-None-Match для задачи"""
+    url = f"/tasks/{created_task['id']}"
+    response = client.get(url)
+    etag = response.headers["ETag"]
+    assert response.json()["version"] == 1
+    
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+    
+    client.patch(url, json={"status": "completed"})
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["ETag"] != etag
+    assert response.json()["version"] == 2
+
+
+def test_read_task_list_not_modified(client, sample_task_data):
+    """Тест ответа 304 для страницы списка и смены ETag при изменении страницы"""
+    ids = [client.post("/tasks/", json=sample_task_data).json()["id"] for _ in range(3)]
+    
+    response = client.get("/tasks/", params={"limit": 2})
+    etag = response.headers["ETag"]
+    next_cursor = response.headers["X-Next-Cursor"]
+    
+    response = client.get("/tasks/", params={"limit": 2}, headers={"If-None-Match": f'W/{etag}, "other"'})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.headers["X-Next-Cursor"] == next_cursor
+    
+    # Изменение задачи за пределами страницы не меняет ETag
+    client.patch(f"/tasks/{ids[2]}", json={"title": "Changed"})
+    response = client.get("/tasks/", params={"limit": 2}, headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    
+    client.patch(f"/tasks/{ids[0]}", json={"title": "Changed"})
+    response = client.get("/tasks/", params={"limit": 2}, headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["ETag"] != etag
+    assert len(response.json()) == 2
+
+
+def test_search_tasks(client):
+    """Тест эндпоинта полнотекстового поиска"""
+    client.post("/tasks/bulk", json=[
+        {"title": "Buy milk", "description": "Go to the store"},
+        {"title": "Write report", "description": "Quarterly report"},
+    ])
+    
+    response = client.get("/tasks/search", params={"q": "report"})
+    assert response.status_code == status.HTTP_200_OK
+    assert [t["title"] for t in response.json()] == ["Write report"]
+    
+    assert client.get("/tasks/search", params={"q": "report", "status": "completed"}).json() == []
+    assert client.get("/tasks/search").status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_list_response_schema_in_openapi(client, created_task):
+    """Тест: ответ списка из строк совпадает с GET по ID, схема OpenAPI - список Task или TaskPartial"""
+    listed = client.get("/tasks/").json()
+    assert listed == [client.get(f"/tasks/{created_task['id']}").json()]
+    
+    schema = client.get("/openapi.json").json()
+    list_schema = schema["paths"]["/tasks/"]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+    assert list_schema["items"]["anyOf"] == [
+        {"$ref": "#/components/schemas/Task"}, {"$ref": "#/components/schemas/TaskPartial"},
+    ]
+
+
+def test_update_tasks_bulk(client):
+    """Тест эндпоинта пакетного обновления"""
+    created = client.post("/tasks/bulk", json=[
+        {"title": f"Task {i}", "description": "D", "status": "in_progress"} for i in range(3)
+    ]).json()["created"]
+    
+    response = client.patch("/tasks/bulk", json={
+        "filter": {"status": ["in_progress"]}, "update": {"status": "completed"},
+    })
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"updated": 3, "tasks": None}
+    
+    response = client.patch("/tasks/bulk?returning=true", json={
+        "ids": [created[0]["id"]], "update": {"title": "Renamed"},
+    })
+    assert [t["title"] for t in response.json()["tasks"]] == ["Renamed"]
+    
+    response = client.patch("/tasks/bulk", json={"update": {"status": "completed"}})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_delete_tasks_bulk(client):
+    """Тест эндпоинта пакетного удаления"""
+    created = client.post("/tasks/bulk", json=[
+        {"title": f"Task {i}", "description": "D"} for i in range(3)
+    ]).json()["created"]
+    
+    response = client.post("/tasks/bulk/delete", json={"ids": [created[0]["id"], created[1]["id"]]})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"deleted": 2}
+    assert client.get(f"/tasks/{created[0]['id']}").status_code == status.HTTP_404_NOT_FOUND
+    assert client.delete(f"/tasks/{created[0]['id']}").status_code == status.HTTP_404_NOT_FOUND
+    assert [t["id"] for t in client.get("/tasks/").json()] == [created[2]["id"]]
+    
+    response = client.post("/tasks/bulk/delete", json={"filter": {"title_prefix": "Task"}})
+    assert response.json() == {"deleted": 1}
+    
+    response = client.post("/tasks/bulk/delete", json={})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_count_tasks(client):
+    """Тест числа задач в заголовке списка и в GET /tasks/count"""
+    client.post("/tasks/bulk", json=[
+        {"title": f"Task {i}", "description": "D", "status": ("created", "in_progress")[i % 2]} for i in range(3)
+    ])
+    
+    response = client.get("/tasks/?limit=1&total=exact&status=created")
+    assert response.headers["X-Total-Count"] == "2"
+    assert "X-Total-Count" not in client.get("/tasks/").headers
+    
+    response = client.get("/tasks/count?mode=cached")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "total": 3, "by_status": {"created": 2, "in_progress": 1, "completed": 0}, "mode": "cached",
+    }
+    assert client.get("/tasks/count?mode=everything").status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_update_and_delete_with_if_match(client, created_task):
+    """Тест If-Match: изменение по устаревшему ETag дает 412 с текущей версией"""
+    url = f"/tasks/{created_task['id']}"
+    etag = client.get(url).headers["ETag"]
+    
+    response = client.patch(url, json={"title": "First"}, headers={"If-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    current = response.headers["ETag"]
+    assert current != etag
+    
+    response = client.patch(url, json={"title": "Lost"}, headers={"If-Match": etag})
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+    assert response.headers["ETag"] == current
+    assert client.get(url).json()["title"] == "First"
+    # Слабый ETag не подходит для If-Match
+    assert client.delete(url, headers={"If-Match": f"W/{current}"}).status_code == status.HTTP_412_PRECONDITION_FAILED
+    
+    assert client.delete(url, headers={"If-Match": f'"other", {current}'}).status_code == status.HTTP_200_OK
+    assert client.patch(url, json={"title": "Gone"}, headers={"If-Match": "*"}).status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_create_task_idempotency_key(client, sample_task_data):
+    """Тест Idempotency-Key: повтор возвращает сохраненный ответ и не создает задачу снова"""
+    headers = {"Idempotency-Key": "create-1"}
+    first = client.post("/tasks/", json=sample_task_data, headers=headers)
+    assert first.status_code == status.HTTP_201_CREATED
+    assert "Idempotent-Replayed" not in first.headers
+    
+    retry = client.post("/tasks/", json=sample_task_data, headers=headers)
+    assert retry.status_code == status.HTTP_201_CREATED
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+    assert len(client.get("/tasks/").json()) == 1
+    
+    other = dict(sample_task_data, title="Other")
+    assert client.post("/tasks/", json=other, headers=headers).status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert client.post("/tasks/", json=other, headers={"Idempotency-Key": "k" * 256}).status_code == 422
+
+
+def test_bulk_idempotency_key(client):
+    """Тест Idempotency-Key пакетных операций: повтор не выполняет операцию снова"""
+    tasks = [{"title": f"Task {i}", "description": "D"} for i in range(3)]
+    created = client.post("/tasks/bulk", json=tasks, headers={"Idempotency-Key": "bulk"})
+    retry = client.post("/tasks/bulk", json=tasks, headers={"Idempotency-Key": "bulk"})
+    assert retry.status_code == status.HTTP_201_CREATED
+    assert retry.json() == created.json()
+    assert len(client.get("/tasks/").json()) == 3
+    
+    body = {"filter": {"status": ["created"]}}
+    headers = {"Idempotency-Key": "delete"}
+    assert client.post("/tasks/bulk/delete", json=body, headers=headers).json() == {"deleted": 3}
+    # Без ключа повтор ничего не удаляет, с ключом возвращает первый ответ
+    assert client.post("/tasks/bulk/delete", json=body).json() == {"deleted": 0}
+    assert client.post("/tasks/bulk/delete", json=body, headers=headers).json() == {"deleted": 3}
+
+
+def test_sparse_fieldsets(client, sql_statements):
+    """Тест fields: в ответе и в запросе к БД только выбранные поля, id - всегда"""
+    created = client.post("/tasks/bulk", json=[
+        {"title": f"Task {i}", "description": "x" * 1000} for i in range(3)
+    ]).json()["created"]
+    
+    sql_statements.clear()
+    response = client.get("/tasks/?fields=title,status&limit=2")
+    assert response.status_code == status.HTTP_200_OK
+    assert [set(task) for task in response.json()] == [{"title", "status", "id"}] * 2
+    assert "X-Next-Cursor" in response.headers
+    assert all("description" not in statement for statement in sql_statements)
+    
+    task_id = created[0]["id"]
+    response = client.get(f"/tasks/{task_id}?fields=description")
+    assert response.json() == {"description": "x" * 1000, "id": task_id}
+    assert response.headers["ETag"] == client.get(f"/tasks/{task_id}").headers["ETag"]
+    # Снимок из кэша тоже отдается только с выбранными полями
+    assert client.get(f"/tasks/{task_id}?fields=status").json() == {"status": "created", "id": task_id}
+    
+    assert client.get("/tasks/?fields=title,secret").status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert client.get(f"/tasks/{task_id}?fields=").status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
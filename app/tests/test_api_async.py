@@ -0,0 +1,72 @@
+import json
+from fastapi import status
+from app.database import to_async_dsn
+
+
+def test_to_async_dsn():
+    """Тест выбора асинхронного драйвера по DSN"""
+    assert to_async_dsn("sqlite:///tasks.db").drivername == "sqlite+aiosqlite"
+    assert to_async_dsn("postgresql://u:p@host/db").drivername == "postgresql+asyncpg"
+    assert to_async_dsn("postgresql+psycopg2://u:p@host/db").drivername == "postgresql+asyncpg"
+    assert to_async_dsn("postgresql+asyncpg://u:p@host/db").drivername == "postgresql+asyncpg"
+
+
+def test_async_crud(async_client, sample_task_data):
+    """Тест полного цикла работы с задачей через асинхронный драйвер"""
+    response = async_client.post("/tasks/", json=sample_task_data)
+    assert response.status_code == status.HTTP_201_CREATED
+    task_id = response.json()["id"]
+    
+    response = async_client.get(f"/tasks/{task_id}")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["title"] == "Test Task"
+    
+    response = async_client.patch(f"/tasks/{task_id}", json={"status": "completed"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["status"] == "completed"
+    assert response.json()["description"] == "Test Description"
+    
+    response = async_client.delete(f"/tasks/{task_id}")
+    assert response.status_code == status.HTTP_200_OK
+    
+    response = async_client.get(f"/tasks/{task_id}")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_async_list_and_bulk(async_client):
+    """Тест пакетного создания и обхода списка по курсору через асинхронный драйвер"""
+    payload = [{"title": f"Task {i}", "description": "D"} for i in range(5)]
+    response = async_client.post("/tasks/bulk", json=payload)
+    assert response.status_code == status.HTTP_201_CREATED
+    
+    response = async_client.get("/tasks/?limit=3")
+    assert [t["title"] for t in response.json()] == ["Task 0", "Task 1", "Task 2"]
+    
+    cursor = response.headers["X-Next-Cursor"]
+    response = async_client.get("/tasks/", params={"limit": 3, "cursor": cursor})
+    assert [t["title"] for t in response.json()] == ["Task 3", "Task 4"]
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_async_export(async_client):
+    """Тест потоковой выгрузки через AsyncSession.stream"""
+    async_client.post("/tasks/bulk", json=[{"title": f"Task {i}", "description": "D"} for i in range(3)])
+    
+    response = async_client.get("/tasks/export?order=desc")
+    
+    assert response.status_code == status.HTTP_200_OK
+    titles = [json.loads(line)["title"] for line in response.text.splitlines()]
+    assert titles == ["Task 2", "Task 1", "Task 0"]
+
+
+def test_async_not_modified(async_client, sample_task_data):
+    """Тест ответов 304 через асинхронный драйвер"""
+    task_id = async_client.post("/tasks/", json=sample_task_data).json()["id"]
+    
+    etag = async_client.get(f"/tasks/{task_id}").headers["ETag"]
+    response = async_client.get(f"/tasks/{task_id}", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    
+    etag = async_client.get("/tasks/").headers["ETag"]
+    response = async_client.get("/tasks/", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
@@ -0,0 +1,82 @@
+from app.crud.cache import LRUTTLCache, NullCache
+
+
+class FakeClock:
+    """Управляемые часы для проверки TTL"""
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+def test_cache_hit_and_miss():
+    """Тест попаданий и промахов"""
+    cache = LRUTTLCache(maxsize=10, ttl=60)
+    assert cache.get("a") is None
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["size"] == 1
+
+
+def test_cache_lru_eviction():
+    """Тест вытеснения давно не использованных записей"""
+    cache = LRUTTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_ttl():
+    """Тест истечения времени жизни записи"""
+    clock = FakeClock()
+    cache = LRUTTLCache(maxsize=10, ttl=5, clock=clock)
+    cache.set("a", 1)
+    clock.now = 4.9
+    assert cache.get("a") == 1
+    clock.now = 5.0
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_cache_rejects_stale_read():
+    """Тест: чтение, начатое до инвалидации, не попадает в кэш"""
+    cache = LRUTTLCache(maxsize=10, ttl=60)
+    token = cache.begin_read()
+    cache.delete("a")
+    cache.set("a", "stale", token)
+    
+    assert cache.get("a") is None
+    assert cache.stats()["rejected"] == 1
+    
+    cache.set("a", "fresh", cache.begin_read())
+    assert cache.get("a") == "fresh"
+
+
+def test_cache_rejects_read_older_than_invalidation_log():
+    """Тест: при усеченном журнале инвалидаций старые чтения отбрасываются"""
+    cache = LRUTTLCache(maxsize=2, ttl=60)
+    token = cache.begin_read()
+    for key in ("a", "b", "c"):
+        cache.delete(key)
+    
+    cache.set("a", "stale", token)
+    assert cache.get("a") is None
+
+
+def test_null_cache():
+    """Тест отключенного кэша"""
+    cache = NullCache()
+    cache.set("a", 1)
+    assert cache.get("a") is None
+    assert cache.stats() == {"enabled": False}
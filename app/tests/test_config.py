@@ -1,5 +1,37 @@
-from app.config import DSN, TEST_DSN
+from app.config import DSN, TEST_DSN, DatabaseSettings
 
 def test_config_values():
     assert DSN is not None
-    assert TEST_DSN is not None
\ No newline at end of file
+    assert TEST_DSN is not None
+
+def test_database_settings_defaults(monkeypatch):
+    """Тест настроек пула по умолчанию"""
+    for name in ("DB_POOL_SIZE", "DB_MAX_OVERFLOW", "DB_POOL_PRE_PING", "DB_EXPIRE_ON_COMMIT"):
+        monkeypatch.delenv(name, raising=False)
+    settings = DatabaseSettings.from_env()
+    assert settings == DatabaseSettings()
+    assert settings.pool_pre_ping is True
+
+
+def test_database_settings_from_env(monkeypatch):
+    """Тест чтения настроек пула из переменных окружения"""
+    monkeypatch.setenv("DB_POOL_SIZE", "20")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "0")
+    monkeypatch.setenv("DB_POOL_TIMEOUT", "2.5")
+    monkeypatch.setenv("DB_POOL_RECYCLE", "600")
+    monkeypatch.setenv("DB_POOL_PRE_PING", "false")
+    monkeypatch.setenv("DB_STATEMENT_TIMEOUT_MS", "5000")
+    monkeypatch.setenv("DB_EXPIRE_ON_COMMIT", "0")
+    
+    settings = DatabaseSettings.from_env()
+    
+    assert settings == DatabaseSettings(
+        pool_size=20,
+        max_overflow=0,
+        pool_timeout=2.5,
+        pool_recycle=600,
+        pool_pre_ping=False,
+        statement_timeout_ms=5000,
+        expire_on_commit=False,
+        pool_warmup=20,
+    )
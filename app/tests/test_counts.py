@@ -0,0 +1,50 @@
+from sqlalchemy import literal_column, select
+from sqlalchemy.dialects import postgresql
+from app.crud.counts import TaskCounter, explain, plan_rows
+from app.models.task import Task
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_counter_applies_writes_and_expires():
+    """Тест: записи меняют загруженные счетчики, по TTL счетчики устаревают"""
+    clock = FakeClock()
+    counter = TaskCounter(ttl=10, clock=clock)
+    assert counter.get() is None
+    
+    counter.set({"created": 2}, counter.begin_read())
+    counter.add({"created": -1, "completed": 1})
+    assert counter.get() == {"created": 1, "in_progress": 0, "completed": 1}
+    
+    clock.now = 10
+    assert counter.get() is None
+
+
+def test_counter_rejects_count_started_before_write():
+    """Тест: подсчет, начатый до записи, не сохраняется"""
+    counter = TaskCounter(ttl=10)
+    token = counter.begin_read()
+    counter.add({"created": 1})
+    counter.set({"created": 0}, token)
+    assert counter.get() is None
+    
+    counter.set({"created": 1}, counter.begin_read())
+    counter.invalidate()
+    assert counter.get() is None
+
+
+def test_explain_statement():
+    """Тест EXPLAIN для PostgreSQL и разбора оценки строк"""
+    statement = explain(select(literal_column("1")).select_from(Task).where(Task.status == "created"))
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+    assert sql.startswith("EXPLAIN (FORMAT JSON) SELECT 1")
+    
+    plan = [{"Plan": {"Node Type": "Index Only Scan", "Plan Rows": 42}}]
+    assert plan_rows(plan) == 42
+    assert plan_rows('[{"Plan": {"Plan Rows": 7}}]') == 7
@@ -1,7 +1,14 @@
+import tracemalloc
 import pytest
-from uuid import UUID
-from app.crud.task import TaskService
-from app.schemas.task import TaskCreate, TaskUpdate
+from uuid import UUID, uuid4
+from sqlalchemy import create_engine, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+from app.crud.task import TaskService, VersionConflictError
+from app.database import Base
+from app.models.task import Task
+from app.schemas.task import TaskBulkTarget, TaskBulkUpdate, TaskCreate, TaskFilter, TaskUpdate
+from app.crud.pagination import InvalidCursorError
 
 
 def test_create_task(task_service, sample_task_data):
@@ -111,4 +118,445 @@ def test_pagination(task_service):
     tasks = task_service.get_tasks(skip=2, limit=2)
     assert len(tasks) == 2
     assert tasks[0].title == "Task 2"
-    assert tasks[1].title == "Task 3"
\ No newline at end of file
+    assert tasks[1].title == "Task 3"
+
+def test_cursor_pagination(task_service):
+    """Тест keyset-пагинации по курсору"""
+    for i in range(5):
+        task_service.create_task(TaskCreate(
+            title=f"Task {i}",
+            description=f"Description {i}",
+            status="created"
+        ))
+    
+    first_page = task_service.get_tasks(limit=2)
+    cursor = task_service.next_cursor(first_page, limit=2)
+    assert cursor is not None
+    
+    second_page = task_service.get_tasks(limit=2, cursor=cursor)
+    assert [t.title for t in second_page] == ["Task 2", "Task 3"]
+    
+    cursor = task_service.next_cursor(second_page, limit=2)
+    last_page = task_service.get_tasks(limit=2, cursor=cursor)
+    assert [t.title for t in last_page] == ["Task 4"]
+    # Неполная страница - последняя, курсора нет
+    assert task_service.next_cursor(last_page, limit=2) is None
+
+
+def test_cursor_ignores_skip(task_service):
+    """Тест: при переданном курсоре skip игнорируется"""
+    for i in range(4):
+        task_service.create_task(TaskCreate(title=f"Task {i}", description="D"))
+    
+    first_page = task_service.get_tasks(limit=1)
+    cursor = task_service.next_cursor(first_page, limit=1)
+    
+    tasks = task_service.get_tasks(skip=2, limit=1, cursor=cursor)
+    assert tasks[0].title == "Task 1"
+
+
+def test_create_tasks_bulk(task_service):
+    """Тест пакетного создания задач порциями"""
+    tasks = [TaskCreate(title=f"Task {i}", description=f"Description {i}") for i in range(7)]
+    
+    result = task_service.create_tasks(tasks, chunk_size=3)
+    
+    assert [t.title for t in result.created] == [f"Task {i}" for i in range(7)]
+    assert result.errors == []
+    assert len(task_service.get_tasks()) == 7
+
+
+def test_create_tasks_bulk_atomic_rollback(task_service):
+    """Тест: в режиме atomic ошибка одной задачи откатывает весь пакет"""
+    tasks = [
+        TaskCreate(title="Task 0", description="Description 0"),
+        TaskCreate(title="Task 1"),  # description обязателен в БД
+        TaskCreate(title="Task 2", description="Description 2"),
+    ]
+    
+    with pytest.raises(IntegrityError):
+        task_service.create_tasks(tasks, chunk_size=1)
+    
+    assert task_service.get_tasks() == []
+
+
+def test_create_tasks_bulk_per_item_errors(task_service):
+    """Тест: без atomic создаются корректные задачи, ошибки - по индексам"""
+    tasks = [
+        TaskCreate(title="Task 0", description="Description 0"),
+        TaskCreate(title="Task 1"),
+        TaskCreate(title="Task 2", description="Description 2"),
+    ]
+    
+    result = task_service.create_tasks(tasks, chunk_size=2, atomic=False)
+    
+    assert [t.title for t in result.created] == ["Task 0", "Task 2"]
+    assert [error.index for error in result.errors] == [1]
+    assert len(task_service.get_tasks()) == 2
+
+
+def test_get_task_cached(task_service, sample_task_data):
+    """Тест чтения задачи через кэш"""
+    created_task = task_service.create_task(TaskCreate(**sample_task_data))
+    hits_before = task_service.cache.stats()["hits"]
+    
+    first = task_service.get_task_cached(created_task.id)
+    second = task_service.get_task_cached(created_task.id)
+    
+    assert first.title == "Test Task"
+    assert second is first
+    assert task_service.cache.stats()["hits"] == hits_before + 1
+
+
+def test_cache_invalidated_on_update_and_delete(task_service, sample_task_data):
+    """Тест: обновление и удаление инвалидируют кэш"""
+    created_task = task_service.create_task(TaskCreate(**sample_task_data))
+    task_service.get_task_cached(created_task.id)
+    
+    task_service.update_task(created_task.id, TaskUpdate(title="Updated Title"))
+    assert task_service.get_task_cached(created_task.id).title == "Updated Title"
+    
+    task_service.delete_task(created_task.id)
+    assert task_service.get_task_cached(created_task.id) is None
+
+
+def test_update_task_single_statement(task_service, sample_task_data, sql_statements):
+    """Тест: обновление выполняется одним UPDATE ... RETURNING"""
+    created_task = task_service.create_task(TaskCreate(**sample_task_data))
+    sql_statements.clear()
+    
+    updated_task = task_service.update_task(created_task.id, TaskUpdate(status="completed"))
+    
+    assert updated_task.status == "completed"
+    assert updated_task.title == "Test Task"
+    assert len(sql_statements) == 1
+    assert sql_statements[0].startswith("UPDATE") and "RETURNING" in sql_statements[0]
+
+
+def test_delete_task_single_statement(task_service, sample_task_data, sql_statements):
+    """Тест: мягкое удаление выполняется одним UPDATE ... RETURNING"""
+    created_task = task_service.create_task(TaskCreate(**sample_task_data))
+    task_id = created_task.id
+    sql_statements.clear()
+    
+    deleted_task = task_service.delete_task(task_id)
+    
+    assert deleted_task.id == task_id
+    assert deleted_task.description == "Test Description"
+    assert len(sql_statements) == 1
+    assert sql_statements[0].startswith("UPDATE") and "RETURNING" in sql_statements[0]
+    assert deleted_task.deleted_at is not None
+
+
+def test_update_and_delete_missing_task(task_service):
+    """Тест: изменение и удаление несуществующей задачи возвращают None"""
+    missing_id = UUID("00000000-0000-0000-0000-000000000000")
+    assert task_service.update_task(missing_id, TaskUpdate(title="New")) is None
+    assert task_service.delete_task(missing_id) is None
+
+
+def test_update_and_delete_orm_fallback(task_service, sample_task_data, monkeypatch):
+    """Тест ORM-пути для диалектов без RETURNING"""
+    monkeypatch.setattr(TaskService, "_supports_returning", lambda self, kind: False)
+    created_task = task_service.create_task(TaskCreate(**sample_task_data))
+    
+    updated_task = task_service.update_task(created_task.id, TaskUpdate(status="completed"))
+    assert updated_task.status == "completed"
+    assert updated_task.description == "Test Description"
+    
+    deleted_task = task_service.delete_task(created_task.id)
+    assert deleted_task.id == created_task.id
+    assert task_service.get_task(created_task.id) is None
+
+
+def test_create_tasks_bulk_no_refetch(task_service, sql_statements):
+    """Тест: созданные пакетом задачи не перечитываются из БД после фиксации"""
+    result = task_service.create_tasks([TaskCreate(title=f"Task {i}", description="D") for i in range(3)])
+    
+    assert [t.title for t in result.created] == ["Task 0", "Task 1", "Task 2"]
+    assert not any(statement.startswith("SELECT") for statement in sql_statements)
+
+
+def test_get_tasks_filters(task_service):
+    """Тест фильтрации списка по статусам и префиксу названия"""
+    task_service.create_tasks([
+        TaskCreate(title="Alpha", description="D", status="created"),
+        TaskCreate(title="Alpine", description="D", status="in_progress"),
+        TaskCreate(title="Beta", description="D", status="completed"),
+        TaskCreate(title="alpha lower", description="D", status="created"),
+    ])
+    
+    tasks = task_service.get_tasks(filters=TaskFilter(status=["created", "in_progress"]))
+    assert sorted(t.title for t in tasks) == ["Alpha", "Alpine", "alpha lower"]
+    
+    tasks = task_service.get_tasks(filters=TaskFilter(title_prefix="Alp"))
+    assert sorted(t.title for t in tasks) == ["Alpha", "Alpine"]
+    
+    tasks = task_service.get_tasks(filters=TaskFilter(status=["created"], title_prefix="Alp"))
+    assert [t.title for t in tasks] == ["Alpha"]
+
+
+def test_get_tasks_desc_order_with_cursor(task_service):
+    """Тест обратной сортировки и курсора в обратном направлении"""
+    for i in range(5):
+        task_service.create_task(TaskCreate(title=f"Task {i}", description="D"))
+    
+    first_page = task_service.get_tasks(limit=2, order="desc")
+    assert [t.title for t in first_page] == ["Task 4", "Task 3"]
+    
+    cursor = task_service.next_cursor(first_page, limit=2, order="desc")
+    second_page = task_service.get_tasks(limit=2, cursor=cursor, order="desc")
+    assert [t.title for t in second_page] == ["Task 2", "Task 1"]
+    
+    # Курсор выдан для обратного направления и не подходит для прямого
+    with pytest.raises(InvalidCursorError):
+        task_service.get_tasks(limit=2, cursor=cursor, order="asc")
+
+
+def test_export_memory_does_not_grow_with_rows(task_service):
+    """Тест: пиковая память потоковой выгрузки не растет с количеством строк"""
+    description = "D" * 500
+    
+    def peak_export_memory() -> int:
+        tracemalloc.start()
+        try:
+            for partition in task_service.iter_task_partitions(batch_size=200):
+                assert len(partition) <= 200
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    
+    task_service.create_tasks([TaskCreate(title=f"Task {i}", description=description) for i in range(1000)])
+    small_peak = peak_export_memory()
+    
+    task_service.create_tasks([TaskCreate(title=f"Task {i}", description=description) for i in range(7000)])
+    large_peak = peak_export_memory()
+    
+    # 8x строк, пиковая память - в пределах погрешности
+    assert large_peak < small_peak * 1.5
+
+
+def test_update_task_bumps_version(task_service, sample_task_data, monkeypatch):
+    """Тест увеличения версии при изменении задачи в обоих путях обновления"""
+    created = task_service.create_task(TaskCreate(**sample_task_data))
+    assert created.version == 1
+    
+    updated = task_service.update_task(created.id, TaskUpdate(title="First"))
+    assert updated.version == 2
+    assert task_service.get_task_version(created.id) == 2
+    
+    monkeypatch.setattr(task_service, "_supports_returning", lambda kind: False)
+    updated = task_service.update_task(created.id, TaskUpdate(title="Second"))
+    assert updated.version == 3
+    
+    # Пустое обновление не меняет версию
+    assert task_service.update_task(created.id, TaskUpdate()).version == 3
+
+
+def test_get_task_versions_reads_keys_only(task_service, sample_task_data, sql_statements):
+    """Тест чтения ключей страницы без названия и описания"""
+    for _ in range(3):
+        task_service.create_task(TaskCreate(**sample_task_data))
+    sql_statements.clear()
+    
+    keys = task_service.get_task_versions(limit=2)
+    assert [key.id for key in keys] == [task.id for task in task_service.get_tasks(limit=2)]
+    assert all(key.version == 1 for key in keys)
+    assert "description" not in sql_statements[0]
+    assert task_service.get_task_version(uuid4()) is None
+
+
+def test_search_tasks(task_service):
+    """Тест полнотекстового поиска и синхронизации индекса при изменениях"""
+    milk = task_service.create_task(TaskCreate(title="Buy milk", description="Go to the store"))
+    report = task_service.create_task(TaskCreate(title="Write report", description="Quarterly milk report"))
+    task_service.create_tasks([TaskCreate(title="Call Bob", description="About the milk delivery")])
+    
+    assert {t.title for t in task_service.search_tasks("milk")} == {"Buy milk", "Write report", "Call Bob"}
+    assert [t.id for t in task_service.search_tasks("report milk")] == [report.id]
+    assert len(task_service.search_tasks("milk", skip=1, limit=1)) == 1
+    assert task_service.search_tasks('milk"*)(', filters=TaskFilter(title_prefix="Buy"))[0].id == milk.id
+    
+    task_service.update_task(report.id, TaskUpdate(description="Quarterly numbers"))
+    task_service.delete_task(milk.id)
+    assert [t.title for t in task_service.search_tasks("milk")] == ["Call Bob"]
+    assert [t.id for t in task_service.search_tasks("numbers")] == [report.id]
+    assert task_service.search_tasks("*") == []
+
+
+def test_rebuild_search_index(db_session, task_service):
+    """Тест перестройки FTS5-индекса по содержимому таблицы"""
+    from app.models.task import rebuild_search_index
+    
+    task = task_service.create_task(TaskCreate(title="Buy milk", description="Store"))
+    db_session.execute(text("DELETE FROM tasks_fts"))
+    assert task_service.search_tasks("milk") == []
+    
+    rebuild_search_index(db_session.connection())
+    assert [t.id for t in task_service.search_tasks("milk")] == [task.id]
+
+
+def test_update_tasks_by_ids_and_filter(task_service, sql_statements):
+    """Тест пакетного обновления одним UPDATE по списку ID и по фильтру"""
+    tasks = task_service.create_tasks(
+        [TaskCreate(title=f"Task {i}", description="D", status="in_progress") for i in range(4)]
+    ).created
+    task_service.get_task_cached(tasks[0].id)
+    sql_statements.clear()
+    
+    result = task_service.update_tasks(TaskBulkUpdate(ids=[tasks[0].id, tasks[1].id], update={"title": "Renamed"}))
+    assert result.updated == 2
+    assert result.tasks is None
+    assert len([s for s in sql_statements if s.startswith("UPDATE")]) == 1
+    # Кэш инвалидирован, версия увеличена
+    snapshot = task_service.get_task_cached(tasks[0].id)
+    assert snapshot.title == "Renamed"
+    assert snapshot.version == 2
+    
+    result = task_service.update_tasks(
+        TaskBulkUpdate(filter={"status": ["in_progress"]}, update={"status": "completed"}), returning=True
+    )
+    assert result.updated == 4
+    assert {task.status for task in result.tasks} == {"completed"}
+    assert task_service.get_tasks(filters=TaskFilter(status=["in_progress"])) == []
+
+
+def test_update_tasks_without_returning(task_service, monkeypatch):
+    """Тест пакетного обновления для диалектов без UPDATE ... RETURNING"""
+    tasks = task_service.create_tasks([TaskCreate(title=f"Task {i}", description="D") for i in range(3)]).created
+    monkeypatch.setattr(task_service, "_supports_returning", lambda kind: False)
+    
+    result = task_service.update_tasks(
+        TaskBulkUpdate(ids=[task.id for task in tasks[:2]], update={"status": "completed"}), returning=True
+    )
+    assert result.updated == 2
+    assert [task.version for task in result.tasks] == [2, 2]
+
+
+def test_bulk_update_schema_validation():
+    """Тест проверки цели и изменений пакетного обновления"""
+    with pytest.raises(ValueError):
+        TaskBulkUpdate(update={"status": "completed"})
+    with pytest.raises(ValueError):
+        TaskBulkUpdate(ids=[uuid4()], filter={"status": ["created"]}, update={"status": "completed"})
+    with pytest.raises(ValueError):
+        TaskBulkUpdate(filter={}, update={"status": "completed"})
+    with pytest.raises(ValueError):
+        TaskBulkUpdate(ids=[uuid4()], update={})
+
+
+def test_soft_deleted_task_hidden_from_reads(task_service):
+    """Тест: мягко удаленная задача не видна ни в одном чтении"""
+    kept, deleted = task_service.create_tasks(
+        [TaskCreate(title="Alpha kept", description="D"), TaskCreate(title="Alpha gone", description="D")]
+    ).created
+    assert task_service.delete_task(deleted.id) is not None
+    
+    assert task_service.get_task(deleted.id) is None
+    assert task_service.get_task_cached(deleted.id) is None
+    assert task_service.get_task_version(deleted.id) is None
+    assert [task.id for task in task_service.get_tasks()] == [kept.id]
+    assert [task.id for task in task_service.search_tasks("alpha")] == [kept.id]
+    exported = [row for partition in task_service.iter_task_partitions() for row in partition]
+    assert [row.id for row in exported] == [kept.id]
+    # Повторное удаление и изменение удаленной задачи не находят ее
+    assert task_service.delete_task(deleted.id) is None
+    assert task_service.update_task(deleted.id, TaskUpdate(title="Back")) is None
+
+
+def test_delete_tasks_bulk(task_service, sql_statements):
+    """Тест пакетного мягкого удаления одним UPDATE по списку ID и по фильтру"""
+    tasks = task_service.create_tasks(
+        [TaskCreate(title=f"Task {i}", description="D", status="completed" if i % 2 else "created") for i in range(4)]
+    ).created
+    sql_statements.clear()
+    
+    assert task_service.delete_tasks(TaskBulkTarget(ids=[tasks[0].id, tasks[1].id])) == 2
+    assert [s for s in sql_statements if s.startswith("DELETE")] == []
+    assert task_service.delete_tasks(TaskBulkTarget(ids=[tasks[0].id])) == 0
+    assert task_service.delete_tasks(TaskBulkTarget(filter={"status": ["completed"]})) == 1
+    assert [task.id for task in task_service.get_tasks()] == [tasks[2].id]
+
+
+def test_count_tasks_modes(task_service, sql_statements):
+    """Тест подсчета задач: точный, по счетчикам и запасной режим для SQLite"""
+    tasks = task_service.create_tasks([
+        TaskCreate(title=f"Task {i}", description="D", status=("created", "completed")[i % 2]) for i in range(5)
+    ]).created
+    
+    exact = task_service.count_tasks()
+    assert (exact.total, exact.by_status, exact.mode) == (5, {"created": 3, "in_progress": 0, "completed": 2}, "exact")
+    # Оценка планировщика есть только в PostgreSQL
+    assert task_service.count_tasks(mode="estimated").mode == "cached"
+    
+    filtered = task_service.count_tasks(TaskFilter(status=["completed"]), mode="cached")
+    assert (filtered.total, filtered.by_status) == (2, {"completed": 2})
+    # Счетчики не знают о названиях: с title_prefix считаю точно
+    assert task_service.count_tasks(TaskFilter(title_prefix="Task"), mode="cached").mode == "exact"
+    
+    # Записи поддерживают счетчики без повторного подсчета
+    sql_statements.clear()
+    task_service.create_task(TaskCreate(title="New", description="D"))
+    task_service.delete_task(tasks[1].id)
+    task_service.delete_tasks(TaskBulkTarget(ids=[tasks[0].id]))
+    cached = task_service.count_tasks(mode="cached")
+    assert cached.by_status == {"created": 3, "in_progress": 0, "completed": 1}
+    assert not any("count(" in s.lower() for s in sql_statements)
+    
+    # Смена статуса сбрасывает счетчики, и они пересчитываются
+    task_service.update_task(tasks[2].id, TaskUpdate(status="in_progress"))
+    assert task_service.count_tasks(mode="cached").by_status == {"created": 2, "in_progress": 1, "completed": 1}
+
+
+@pytest.mark.parametrize("returning", [True, False])
+def test_update_and_delete_with_expected_version(task_service, monkeypatch, returning):
+    """Тест сравнения версии при изменении и удалении (UPDATE ... RETURNING и ORM)"""
+    monkeypatch.setattr(TaskService, "_supports_returning", lambda self, kind: returning)
+    task = task_service.create_task(TaskCreate(title="Task", description="D"))
+    
+    updated = task_service.update_task(task.id, TaskUpdate(title="First"), expected_versions=[1])
+    assert (updated.title, updated.version) == ("First", 2)
+    with pytest.raises(VersionConflictError) as conflict:
+        task_service.update_task(task.id, TaskUpdate(title="Lost"), expected_versions=[1])
+    assert conflict.value.current_version == 2
+    assert task_service.get_task(task.id).title == "First"
+    
+    with pytest.raises(VersionConflictError):
+        task_service.delete_task(task.id, expected_versions=[1, 3])
+    assert task_service.delete_task(task.id, expected_versions=[1, 2]).id == task.id
+    # Удаленной задачи нет: 404, а не конфликт версий
+    assert task_service.update_task(task.id, TaskUpdate(title="Gone"), expected_versions=[3]) is None
+
+
+def test_orm_update_detects_concurrent_change(tmp_path, monkeypatch):
+    """Тест: ORM-изменение не затирает изменение, сделанное между чтением и записью"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'cas.db'}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(TaskService, "_supports_returning", lambda self, kind: False)
+    
+    with Session() as db:
+        service = TaskService(db)
+        task_id = service.create_task(TaskCreate(title="Task", description="D")).id
+        load = TaskService._get_task_for_write
+        
+        def load_then_concurrent_write(self, task_id):
+            task = load(self, task_id)
+            if task.version == 1:
+                # Другой процесс успевает изменить задачу после чтения
+                with Session() as other:
+                    other.execute(update(Task).where(Task.id == task_id).values(title="Other", version=2))
+                    other.commit()
+            return task
+        
+        monkeypatch.setattr(TaskService, "_get_task_for_write", load_then_concurrent_write)
+        with pytest.raises(VersionConflictError) as conflict:
+            service.update_task(task_id, TaskUpdate(status="completed"), expected_versions=[1])
+        assert conflict.value.current_version == 2
+        
+        # Без условия на версию изменение повторяется поверх свежей версии
+        db.execute(update(Task).where(Task.id == task_id).values(version=1))
+        db.commit()
+        updated = service.update_task(task_id, TaskUpdate(status="completed"))
+        assert (updated.title, updated.status, updated.version) == ("Other", "completed", 3)
+    engine.dispose()
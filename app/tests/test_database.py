@@ -1,6 +1,110 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError
+from app.config import DatabaseSettings
+from app.database import warm_up
+from app.pool import TimedQueuePool, engine_options, pool_status
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
 def test_get_db(db_session):
     """Тест получения сессии БД"""
     from app.database import get_db
     db = next(get_db())
     assert db is not None
-    db.close()
\ No newline at end of file
+    db.close()
+
+def test_engine_options_postgres():
+    """Тест параметров движка PostgreSQL из настроек"""
+    settings = DatabaseSettings(pool_size=7, max_overflow=3, statement_timeout_ms=1500)
+    
+    options = engine_options(make_url("postgresql://u:p@host/db"), settings)
+    assert options["pool_size"] == 7
+    assert options["max_overflow"] == 3
+    assert options["poolclass"] is TimedQueuePool
+    assert options["connect_args"] == {"options": "-c statement_timeout=1500"}
+    
+    async_options = engine_options(make_url("postgresql+asyncpg://u:p@host/db"), settings, is_async=True)
+    assert async_options["connect_args"] == {"server_settings": {"statement_timeout": "1500"}}
+
+
+def test_engine_options_memory_sqlite():
+    """Тест: к SQLite в памяти параметры размера пула не применяются"""
+    options = engine_options(make_url("sqlite:///:memory:"), DatabaseSettings())
+    assert "pool_size" not in options
+    assert "connect_args" not in options
+
+
+def test_pool_status_wait_and_timeouts(tmp_path):
+    """Тест статистики пула: занятые соединения, превышение и таймауты ожидания"""
+    url = make_url(f"sqlite:///{tmp_path / 'pool.db'}")
+    settings = DatabaseSettings(pool_size=1, max_overflow=1, pool_timeout=0.05)
+    engine = create_engine(url, **engine_options(url, settings))
+    
+    first = engine.connect()
+    second = engine.connect()
+    status = pool_status(engine)
+    assert status["checked_out"] == 2
+    assert status["overflow"] == 1
+    assert status["checkouts"] == 2
+    
+    with pytest.raises(TimeoutError):
+        engine.connect()
+    status = pool_status(engine)
+    assert status["timeouts"] == 1
+    assert status["wait_seconds_max"] >= 0.05
+    
+    first.close()
+    second.close()
+    assert pool_status(engine)["checked_out"] == 0
+    engine.dispose()
+
+
+def test_import_does_not_create_engine():
+    """Тест: импорт приложения не требует DSN и не создает движков"""
+    code = (
+        "import main, app.database as database\n"
+        "assert database.current_engines() == {'sync': None, 'async': None}\n"
+    )
+    env = {key: value for key, value in os.environ.items() if key not in ("DSN", "ASYNC_DSN")}
+    subprocess.run([sys.executable, "-c", code], env=env, cwd=ROOT, check=True)
+
+
+def test_warm_up_opens_pool_connections(tmp_path):
+    """Тест прогрева: соединения открываются одновременно и остаются в пуле"""
+    url = make_url(f"sqlite:///{tmp_path / 'warm.db'}")
+    engine = create_engine(url, **engine_options(url, DatabaseSettings(pool_size=3)))
+    
+    assert warm_up(engine, 3) == 3
+    status = pool_status(engine)
+    assert status["checked_in"] == 3
+    assert status["checked_out"] == 0
+    engine.dispose()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="fork is not available")
+def test_engine_pool_reset_after_fork(tmp_path):
+    """Тест: дочерний процесс после fork получает пустой пул, соединения родителя не закрываются"""
+    code = (
+        "import os\n"
+        "import app.database as database\n"
+        "engine = database.get_engine()\n"
+        "connection = engine.connect()\n"
+        "pool = engine.pool\n"
+        "pid = os.fork()\n"
+        "if pid == 0:\n"
+        "    ok = engine.pool is not pool and engine.pool.checkedout() == 0\n"
+        "    os._exit(0 if ok else 1)\n"
+        "_, status = os.waitpid(pid, 0)\n"
+        "assert os.waitstatus_to_exitcode(status) == 0\n"
+        "assert engine.pool is pool and pool.checkedout() == 1\n"
+        "connection.close()\n"
+    )
+    env = os.environ | {"DSN": f"sqlite:///{tmp_path / 'fork.db'}", "DB_MODE": "sync"}
+    subprocess.run([sys.executable, "-c", code], env=env, cwd=ROOT, check=True)
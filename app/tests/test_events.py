@@ -0,0 +1,182 @@
+import asyncio
+import json
+from uuid import uuid4
+from app.api.events import sse_stream
+from app.crud.cache import LRUTTLCache
+from app.crud.counts import TaskCounter
+from app.crud.task import TaskService
+from app.events import (
+    EventBroker, LocalEventBackend, LocalEventBus, PostgresNotifyBackend, SubscriptionDropped, deleted_event,
+)
+from app.schemas.task import TaskBulkTarget, TaskBulkUpdate, TaskCreate, TaskUpdate
+
+
+def drain(subscription):
+    events = []
+    while (event := subscription.poll()) is not None:
+        events.append(event)
+    return events
+
+
+def test_task_service_publishes_changes(db_session):
+    """Тест: записи TaskService публикуют события подписчикам"""
+    broker = EventBroker()
+    service = TaskService(db_session, events=broker)
+    
+    async def scenario():
+        subscription = broker.subscribe()
+        task = service.create_task(TaskCreate(title="Task", description="D"))
+        service.update_task(task.id, TaskUpdate(status="completed"))
+        service.update_tasks(TaskBulkUpdate(ids=[task.id], update={"title": "Renamed"}))
+        service.delete_tasks(TaskBulkTarget(ids=[task.id]))
+        return task, drain(subscription)
+    
+    task, events = asyncio.run(scenario())
+    assert [(event.seq, event.type) for event in events] == [
+        (1, "created"), (2, "updated"), (3, "updated"), (4, "deleted"),
+    ]
+    created, updated, bulk_updated, deleted = [json.loads(event.data) for event in events]
+    assert created["task"]["title"] == "Task"
+    assert (updated["task"]["status"], updated["fields"], updated["version"]) == ("completed", ["status"], 2)
+    assert (bulk_updated["id"], bulk_updated["task"], bulk_updated["fields"]) == (str(task.id), None, ["title"])
+    assert (deleted["id"], deleted["status"], deleted["version"]) == (str(task.id), "completed", 4)
+
+
+def test_no_events_built_without_subscribers(db_session, monkeypatch):
+    """Тест: без подписчиков и других процессов события не собираются"""
+    broker = EventBroker()
+    monkeypatch.setattr(broker, "publish", lambda events: (_ for _ in ()).throw(AssertionError("published")))
+    TaskService(db_session, events=broker).create_task(TaskCreate(title="Task", description="D"))
+    assert broker.stats()["last_seq"] == 1
+
+
+def test_resume_after_write_without_subscribers(db_session):
+    """Тест: клиент отключился, задачу изменили, клиент вернулся - продолжение ленты начинается с reset"""
+    broker = EventBroker()
+    service = TaskService(db_session, events=broker)
+
+    async def scenario():
+        subscription = broker.subscribe()
+        task = service.create_task(TaskCreate(title="Task", description="D"))
+        last_seen = broker.event_id(subscription.poll())
+        subscription.close()
+
+        service.update_task(task.id, TaskUpdate(status="completed"))
+
+        resumed = broker.subscribe(last_seen)
+        assert resumed.reset
+        assert drain(resumed) == []
+        # С ID, выданного вместе с reset, лента продолжается без потерь
+        service.delete_tasks(TaskBulkTarget(ids=[task.id]))
+        assert not broker.subscribe(resumed.start_id).reset
+        assert [event.type for event in drain(resumed)] == ["deleted"]
+
+    asyncio.run(scenario())
+
+
+def test_resume_from_event_id():
+    """Тест продолжения ленты по ID события и reset, если продолжить нельзя"""
+    broker = EventBroker(backlog=3)
+    
+    async def scenario():
+        first = broker.subscribe()
+        broker.publish([deleted_event(uuid4(), 1, "created") for _ in range(2)])
+        last_seen = broker.event_id(first.poll())
+        broker.publish([deleted_event(uuid4(), 1, "created")])
+        
+        resumed = broker.subscribe(last_seen)
+        assert not resumed.reset
+        assert [event.seq for event in drain(resumed)] == [2, 3]
+        
+        # Событие 2 уже вытеснено из backlog, чужая эпоха неизвестна
+        broker.publish([deleted_event(uuid4(), 1, "created") for _ in range(2)])
+        assert broker.subscribe(last_seen).reset
+        assert broker.subscribe("other-3").reset
+        assert broker.subscribe(f"{broker.epoch}-99").reset
+    
+    asyncio.run(scenario())
+
+
+def test_slow_consumer_dropped():
+    """Тест: подписчик с переполненной очередью отключается, остальные получают события"""
+    broker = EventBroker(queue_size=2)
+    
+    async def scenario():
+        slow = broker.subscribe()
+        fast = broker.subscribe()
+        for _ in range(3):
+            broker.publish([deleted_event(uuid4(), 1, "created")])
+            if fast.poll() is None:
+                raise AssertionError("fast subscriber missed an event")
+        assert slow.dropped
+        assert broker.stats()["subscribers"] == 1
+        assert [event.seq for event in [await slow.get(0.1), await slow.get(0.1)]] == [1, 2]
+        try:
+            await slow.get(0.1)
+        except SubscriptionDropped:
+            return
+        raise AssertionError("dropped subscriber kept reading")
+    
+    asyncio.run(scenario())
+
+
+def test_remote_events_invalidate_cache_and_reach_subscribers():
+    """Тест: события другого процесса доходят до подписчиков и инвалидируют кэш"""
+    bus = LocalEventBus()
+    cache = LRUTTLCache(maxsize=10, ttl=60)
+    counter = TaskCounter(ttl=60)
+    writer = EventBroker(LocalEventBackend(bus))
+    reader = EventBroker(LocalEventBackend(bus), cache=cache, counter=counter)
+    writer.start()
+    reader.start()
+    task_id = uuid4()
+    cache.set(task_id, "stale")
+    counter.set({"created": 5}, counter.begin_read())
+    
+    async def scenario():
+        subscription = reader.subscribe()
+        writer.publish([deleted_event(task_id, 2, "created")])
+        return drain(subscription)
+    
+    events = asyncio.run(scenario())
+    assert [json.loads(event.data)["id"] for event in events] == [str(task_id)]
+    assert cache.get(task_id) is None
+    assert counter.get()["created"] == 4
+    reader.stop()
+    writer.stop()
+
+
+def test_sse_stream_format():
+    """Тест формата Server-Sent Events, heartbeat и отключения медленного подписчика"""
+    broker = EventBroker(queue_size=2)
+    
+    async def scenario():
+        subscription = broker.subscribe("unknown-1")
+        stream = sse_stream(broker, subscription, heartbeat=0.01)
+        chunks = [await stream.__anext__(), await stream.__anext__(), await stream.__anext__()]
+        broker.publish([deleted_event(uuid4(), 1, "created")])
+        chunks.append(await stream.__anext__())
+        broker.publish([deleted_event(uuid4(), 1, "created") for _ in range(3)])
+        chunks.append(await stream.__anext__())
+        await stream.aclose()
+        return chunks
+    
+    connected, reset, ping, event, dropped = asyncio.run(scenario())
+    assert connected.startswith(b"retry: ")
+    assert reset == b'id: %s-0\nevent: reset\ndata: {"reason":"resume"}\n\n' % broker.epoch.encode()
+    assert ping == b": ping\n\n"
+    assert event.startswith(b"id: %s-1\nevent: deleted\ndata: {" % broker.epoch.encode())
+    assert b'"reason":"slow_consumer"' in dropped
+    assert broker.stats()["subscribers"] == 0
+
+
+def test_notify_payloads_fit_limit():
+    """Тест: события разбиваются на уведомления не больше лимита NOTIFY"""
+    backend = PostgresNotifyBackend(engine=None)
+    events = [deleted_event(uuid4(), 1, "created") for _ in range(200)]
+    payloads = list(backend._payloads(events))
+    assert len(payloads) > 1
+    assert all(len(payload.encode()) <= backend.MAX_PAYLOAD for payload in payloads)
+    decoded = [json.loads(payload) for payload in payloads]
+    assert {message["origin"] for message in decoded} == {backend.origin}
+    assert sum(len(message["events"]) for message in decoded) == 200
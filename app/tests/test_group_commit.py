@@ -0,0 +1,88 @@
+import asyncio
+from contextlib import asynccontextmanager
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from app.api.api import TaskAPIRouter
+from app.crud.group_commit import GroupCommitWriter
+from app.crud.task_async import ThreadedTaskService
+from app.database import get_db
+from app.models.task import Task
+from app.schemas.task import TaskCreate
+
+
+@pytest.fixture
+def writer(db_session):
+    """Групповая запись на тестовой сессии"""
+
+    @asynccontextmanager
+    async def service_scope():
+        yield ThreadedTaskService(db_session)
+
+    return GroupCommitWriter(service_scope, max_batch=20, max_delay=0.05)
+
+
+def test_group_commit_batches_concurrent_creates(db_session, writer):
+    """Тест: одновременные создания фиксируются пакетами, каждый запрос получает свою задачу"""
+
+    async def create_all():
+        tasks = await asyncio.gather(
+            *(writer.submit(TaskCreate(title=f"Task {i}", description="D")) for i in range(50))
+        )
+        await writer.stop()
+        return tasks
+
+    tasks = asyncio.run(create_all())
+
+    assert [task.title for task in tasks] == [f"Task {i}" for i in range(50)]
+    assert len({task.id for task in tasks}) == 50
+    assert db_session.scalar(select(func.count()).select_from(Task)) == 50
+    stats = writer.stats()
+    assert stats["tasks"] == 50
+    assert stats["batches"] == 3
+    assert stats["largest_batch"] == 20
+    assert stats["queued"] == 0
+
+
+def test_group_commit_isolates_failing_task(db_session, writer):
+    """Тест: ошибка одной задачи пакета достается только ее запросу"""
+    #Задача без описания нарушает NOT NULL: проверка схемы обойдена
+    invalid = TaskCreate.model_construct(title="Invalid", description=None, status="created")
+
+    async def create_all():
+        results = await asyncio.gather(
+            writer.submit(TaskCreate(title="First", description="D")),
+            writer.submit(invalid),
+            writer.submit(TaskCreate(title="Last", description="D")),
+            return_exceptions=True,
+        )
+        await writer.stop()
+        return results
+
+    first, error, last = asyncio.run(create_all())
+
+    assert isinstance(error, IntegrityError)
+    assert (first.title, last.title) == ("First", "Last")
+    assert set(db_session.scalars(select(Task.title))) == {"First", "Last"}
+    assert writer.stats()["fallbacks"] == 1
+
+
+def test_group_commit_api(db_session, writer, sample_task_data):
+    """Тест POST /tasks/ через групповую фиксацию; запрос с Idempotency-Key идет мимо нее"""
+    app = FastAPI()
+    app.include_router(TaskAPIRouter(writer=writer).router, prefix='/tasks')
+    app.dependency_overrides[get_db] = lambda: db_session
+
+    with TestClient(app) as client:
+        response = client.post("/tasks/", json=sample_task_data)
+        assert response.status_code == 201
+        assert response.json()["title"] == sample_task_data["title"]
+        assert response.json()["version"] == 1
+
+        response = client.post("/tasks/", json=sample_task_data, headers={"Idempotency-Key": "key"})
+        assert response.status_code == 201
+
+    assert writer.stats()["tasks"] == 1
+    assert db_session.scalar(select(func.count()).select_from(Task)) == 2
@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from sqlalchemy import func, select
+from app.crud.idempotency import (
+    DuplicateRequestError, IdempotencyKeyReusedError, IdempotencyStore, IdempotentRequest, request_fingerprint,
+)
+from app.models.idempotency import IdempotencyKey
+from app.models.task import Task
+from app.schemas.task import TaskCreate
+
+
+NOW = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def make_request(key="key", *parts):
+    return IdempotentRequest(scope="POST /tasks/", key=key, fingerprint=request_fingerprint(*parts))
+
+
+def test_request_fingerprint():
+    """Тест отпечатка запроса: не зависит от порядка ключей, зависит от значений"""
+    assert request_fingerprint({"a": 1, "b": 2}, True) == request_fingerprint({"b": 2, "a": 1}, True)
+    assert request_fingerprint({"a": 1}, True) != request_fingerprint({"a": 1}, False)
+
+
+def test_concurrent_duplicate_rolls_back(db_session, task_service):
+    """Тест: второй запрос с зафиксированным ключом откатывается без создания задачи"""
+    request = make_request()
+    task = task_service.create_task(TaskCreate(title="Task", description="D"), request)
+    assert task_service.get_stored_response(request) is not None
+    
+    # Повтор, не увидевший сохраненный ответ, упирается в первичный ключ
+    with pytest.raises(DuplicateRequestError):
+        task_service.create_task(TaskCreate(title="Task", description="D"), request)
+    assert db_session.scalar(select(func.count()).select_from(Task)) == 1
+    assert str(task.id) in task_service.get_stored_response(request)
+    
+    with pytest.raises(IdempotencyKeyReusedError):
+        task_service.get_stored_response(make_request("key", "other body"))
+
+
+def test_expired_key_can_be_reused(db_session):
+    """Тест: истекший ключ не возвращает ответ и удаляется"""
+    request = make_request()
+    store = IdempotencyStore(db_session, ttl=60, clock=lambda: NOW)
+    store.save(request, '{"id": 1}')
+    db_session.commit()
+    assert store.get(request) == '{"id": 1}'
+    
+    later = IdempotencyStore(db_session, ttl=60, clock=lambda: NOW + timedelta(minutes=2))
+    assert later.get(request) is None
+    assert db_session.scalar(select(func.count()).select_from(IdempotencyKey)) == 0
+    later.save(request, '{"id": 2}')
+    db_session.commit()
+    assert later.get(request) == '{"id": 2}'
+
+
+def test_purge_expired_keys(db_session):
+    """Тест удаления истекших ключей порциями"""
+    for i in range(3):
+        IdempotencyStore(db_session, ttl=i * 60, clock=lambda: NOW).save(make_request(f"key-{i}"), "{}")
+    db_session.commit()
+    
+    store = IdempotencyStore(db_session, clock=lambda: NOW + timedelta(seconds=90))
+    assert store.purge_expired(limit=10) == 2
+    assert db_session.scalars(select(IdempotencyKey.key)).all() == ["key-2"]
@@ -0,0 +1,102 @@
+import asyncio
+
+from sqlalchemy import create_engine, text
+
+from app.metrics import (
+    Counter, Histogram, MetricsMiddleware, MetricsRegistry, current_request_db, instrument_sqlalchemy,
+    RequestDBStats, gauge_lines, pool_collector,
+)
+
+
+def test_counter_render():
+    """Тест текстового формата счетчика с метками"""
+    counter = Counter("requests_total", "Requests", ("route",))
+    counter.inc("/a")
+    counter.inc("/a")
+    counter.inc('/b"x')
+    
+    lines = list(counter.render())
+    assert lines[0] == "# HELP requests_total Requests"
+    assert lines[1] == "# TYPE requests_total counter"
+    assert 'requests_total{route="/a"} 2' in lines
+    assert 'requests_total{route="/b\\"x"} 1' in lines
+
+
+def test_histogram_buckets_are_cumulative():
+    """Тест накопительных корзин, суммы и количества гистограммы"""
+    histogram = Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.5, "/a")
+    histogram.observe(5, "/a")
+    
+    lines = list(histogram.render())
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/a",le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{route="/a"} 3' in lines
+    assert 'latency_seconds_sum{route="/a"} 5.55' in lines
+
+
+def test_registry_collectors():
+    """Тест сборщиков, вычисляющих значения при выгрузке"""
+    registry = MetricsRegistry()
+    registry.register_collector(lambda: gauge_lines("queue_depth", "Depth", [({"queue": "q"}, 3), ({}, None)]))
+    
+    body = registry.render()
+    assert '# TYPE queue_depth gauge' in body
+    assert 'queue_depth{queue="q"} 3' in body
+    assert body.endswith("\n")
+
+
+def test_db_queries_counted_per_request():
+    """Тест подсчета запросов к БД в контексте текущего HTTP-запроса"""
+    instrument_sqlalchemy()
+    instrument_sqlalchemy()
+    engine = create_engine("sqlite:///:memory:")
+    stats = RequestDBStats()
+    token = current_request_db.set(stats)
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+    finally:
+        current_request_db.reset(token)
+    
+    # Повторная регистрация обработчиков не удваивает счет
+    assert stats.queries == 2
+    assert stats.seconds > 0
+    assert stats.engines["sqlite"][0] == 2
+
+
+def test_middleware_labels_unmatched_routes():
+    """Тест метки маршрута для запросов без найденного маршрута"""
+    from app.metrics import http_requests
+    
+    async def not_found(scope, receive, send):
+        await send({"type": "http.response.start", "status": 404, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+    
+    async def send(message):
+        pass
+    
+    middleware = MetricsMiddleware(not_found)
+    asyncio.run(middleware({"type": "http", "method": "GET", "path": "/nope"}, None, send))
+    assert http_requests._values[("GET", "<unmatched>", 404)] >= 1
+
+
+def test_pool_collector(tmp_path):
+    """Тест метрик пула соединений"""
+    from app.config import DatabaseSettings
+    from app.pool import engine_options
+    from sqlalchemy.engine import make_url
+    
+    dsn = f"sqlite:///{tmp_path / 'pool.db'}"
+    engine = create_engine(dsn, **engine_options(make_url(dsn), DatabaseSettings(pool_size=2)))
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        body = "\n".join(pool_collector({"sync": engine, "async": None})())
+    
+    assert 'db_pool_size{engine="sync"} 2' in body
+    assert 'db_pool_checked_out{engine="sync"} 1' in body
+    assert 'db_pool_checkouts_total{engine="sync"} 1' in body
+    assert "async" not in body
@@ -0,0 +1,95 @@
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+from app.crud.task import TaskService
+from app.migrate import migrate
+from app.schemas.task import TaskCreate
+
+
+OLD_SCHEMA = (
+    "CREATE TABLE tasks (id CHAR(32) PRIMARY KEY, title VARCHAR(100) NOT NULL, "
+    "description TEXT NOT NULL, status VARCHAR(20) NOT NULL, created_at DATETIME NOT NULL)"
+)
+
+
+def test_migrate_creates_schema(tmp_path):
+    """Тест: на пустой БД миграция создает таблицу с индексами и поиск, повторный запуск ничего не меняет"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'new.db'}")
+    
+    assert migrate(engine) == ["create table idempotency_keys", "create table tasks"]
+    inspector = inspect(engine)
+    assert inspector.has_table("tasks_fts")
+    assert "ix_tasks_created_at_id" in {index["name"] for index in inspector.get_indexes("tasks")}
+    assert migrate(engine) == []
+    engine.dispose()
+
+
+def test_migrate_upgrades_old_schema(tmp_path):
+    """Тест: к старой таблице добавляются недостающие колонки, индексы и поисковый индекс"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        connection.exec_driver_sql(OLD_SCHEMA)
+        connection.exec_driver_sql(
+            "INSERT INTO tasks VALUES ('0123456789abcdef0123456789abcdef', 'Купить хлеб', 'в магазине', "
+            "'created', '2024-01-01 00:00:00')"
+        )
+    
+    applied = migrate(engine)
+    assert applied == [
+        "create table idempotency_keys",
+        "add column tasks.version",
+        "add column tasks.deleted_at",
+        "create index ix_tasks_created_at_id",
+        "create index ix_tasks_deleted_at",
+        "create index ix_tasks_status_created_at_id",
+        "create index ix_tasks_title",
+        "create search index tasks_fts",
+    ]
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT version, deleted_at FROM tasks")).one() == (1, None)
+        matches = connection.execute(text("SELECT count(*) FROM tasks_fts WHERE tasks_fts MATCH 'магазине'"))
+        assert matches.scalar_one() == 1
+    assert migrate(engine) == []
+    engine.dispose()
+
+
+BASELINE_SCHEMA = (
+    "CREATE TABLE tasks (id CHAR(32) PRIMARY KEY, title VARCHAR(100) NOT NULL, "
+    "description TEXT NOT NULL, status VARCHAR(20) NOT NULL)"
+)
+
+
+def test_migrate_upgrades_baseline_schema_with_rows(tmp_path):
+    """Тест: таблица исходной схемы (без created_at, version, deleted_at) с задачами обновляется и читается"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    with engine.begin() as connection:
+        connection.exec_driver_sql(BASELINE_SCHEMA)
+        for i in range(3):
+            connection.exec_driver_sql(
+                f"INSERT INTO tasks VALUES ('{i:032x}', 'Задача {i}', 'описание', 'created')"
+            )
+    
+    applied = migrate(engine)
+    assert applied[:4] == [
+        "create table idempotency_keys",
+        "add column tasks.created_at",
+        "add column tasks.version",
+        "add column tasks.deleted_at",
+    ]
+    with engine.connect() as connection:
+        rows = connection.execute(text("SELECT created_at, version, deleted_at FROM tasks")).all()
+        assert len(rows) == 3
+        assert all(created_at is not None and version == 1 and deleted_at is None
+                   for created_at, version, deleted_at in rows)
+        columns = {column["name"]: column for column in inspect(connection).get_columns("tasks")}
+        assert columns["created_at"]["nullable"] is False
+        assert columns["version"]["nullable"] is False
+    assert migrate(engine) == []
+    
+    # Обновленная таблица читается и пополняется приложением
+    with Session(engine) as db:
+        service = TaskService(db)
+        assert len(service.get_tasks()) == 3
+        task = service.create_task(TaskCreate(title="Новая", description="D"))
+        assert task.version == 1
+        assert [task.title for task in service.get_tasks()][-1] == "Новая"
+    engine.dispose()
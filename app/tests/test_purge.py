@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, select
+from sqlalchemy.orm import sessionmaker
+from app import purge
+from app.models.task import Task
+from app.purge import PurgeWorker
+from app.schemas.task import TaskCreate
+
+
+NOW = datetime(2024, 1, 1, 3, 0, tzinfo=timezone.utc)
+
+
+def make_worker(db_session, **kwargs):
+    options = dict(batch_size=2, interval=0, retention=3600, window=(1, 5), clock=lambda: NOW, sleep=lambda s: None)
+    options.update(kwargs)
+    return PurgeWorker(sessionmaker(bind=db_session.get_bind()), **options)
+
+
+def mark_deleted(db_session, tasks, deleted_at):
+    for task in tasks:
+        db_session.get(Task, task.id).deleted_at = deleted_at
+    db_session.commit()
+
+
+def count_tasks(db_session):
+    return db_session.scalar(select(func.count()).select_from(Task))
+
+
+def test_purge_batches_respect_retention(db_session, task_service):
+    """Тест: удаляются порциями только задачи старше срока хранения"""
+    tasks = task_service.create_tasks([TaskCreate(title=f"Task {i}", description="D") for i in range(6)]).created
+    mark_deleted(db_session, tasks[:5], NOW - timedelta(hours=2))
+    mark_deleted(db_session, tasks[5:], NOW - timedelta(minutes=5))
+    
+    worker = make_worker(db_session)
+    assert worker.purge_batch() == 2
+    assert worker.run_once() == 3
+    assert worker.run_once() == 0
+    # Недавно удаленная задача ждет срока хранения
+    assert count_tasks(db_session) == 1
+
+
+def test_purge_window():
+    """Тест окна удаления, в том числе через полночь"""
+    def at(hour, window):
+        return PurgeWorker(window=window, clock=lambda: NOW.replace(hour=hour)).in_window()
+    
+    assert at(3, (1, 5))
+    assert not at(5, (1, 5))
+    assert at(23, (22, 2)) and at(1, (22, 2))
+    assert not at(12, (22, 2))
+    assert at(12, (0, 0))
+
+
+def test_purge_run_once_stops_outside_window(db_session, task_service):
+    """Тест: при выходе из окна удаление останавливается после текущей порции"""
+    tasks = task_service.create_tasks([TaskCreate(title=f"Task {i}", description="D") for i in range(6)]).created
+    mark_deleted(db_session, tasks, NOW - timedelta(hours=2))
+    
+    worker = make_worker(db_session, window=(4, 5))
+    assert worker.run_once() == 2
+    assert count_tasks(db_session) == 4
+
+
+
+def test_purge_once_ignores_window(db_session, task_service, monkeypatch):
+    """Тест: python -m app.purge --once вне окна удаляет все порции, а не только первую"""
+    tasks = task_service.create_tasks([TaskCreate(title=f"Task {i}", description="D") for i in range(25)]).created
+    mark_deleted(db_session, tasks, NOW - timedelta(hours=2))
+    worker = make_worker(db_session, batch_size=10, window=(4, 5))
+    monkeypatch.setattr(purge, "PurgeWorker", lambda: worker)
+    monkeypatch.setattr(purge, "init_engines", lambda: None)
+    monkeypatch.setattr("sys.argv", ["app.purge", "--once"])
+
+    purge.main()
+    assert count_tasks(db_session) == 0
@@ -0,0 +1,65 @@
+import pytest
+from sqlalchemy import text
+from app.schemas.task import TaskCreate, TaskFilter
+
+
+def query_plan(db_session, query) -> str:
+    """План выполнения запроса SQLite (EXPLAIN QUERY PLAN) одной строкой"""
+    sql = str(query.statement.compile(db_session.get_bind(), compile_kwargs={"literal_binds": True}))
+    rows = db_session.execute(text("EXPLAIN QUERY PLAN " + sql)).all()
+    return "\n".join(row[-1] for row in rows)
+
+
+@pytest.fixture
+def seeded_service(task_service):
+    """Сервис с несколькими задачами во всех статусах"""
+    statuses = ["created", "in_progress", "completed"]
+    task_service.create_tasks([
+        TaskCreate(title=f"Task {i}", description="D", status=statuses[i % 3])
+        for i in range(30)
+    ])
+    return task_service
+
+
+def test_list_uses_sort_index(db_session, seeded_service):
+    """Тест: список без фильтров читается по индексу сортировки без сортировки в памяти"""
+    for order in ("asc", "desc"):
+        plan = query_plan(db_session, seeded_service._tasks_query(order=order))
+        assert "USING INDEX ix_tasks_created_at_id" in plan
+        assert "TEMP B-TREE" not in plan
+
+
+def test_status_filter_uses_composite_index(db_session, seeded_service):
+    """Тест: фильтр по статусу использует индекс (status, created_at, id)"""
+    query = seeded_service._tasks_query(filters=TaskFilter(status=["created"]))
+    plan = query_plan(db_session, query)
+    
+    assert "SEARCH tasks USING INDEX ix_tasks_status_created_at_id (status=?)" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_multi_status_filter_uses_index(db_session, seeded_service):
+    """Тест: фильтр по нескольким статусам не сканирует таблицу"""
+    query = seeded_service._tasks_query(filters=TaskFilter(status=["created", "completed"]))
+    plan = query_plan(db_session, query)
+    
+    assert "SEARCH tasks USING INDEX ix_tasks_status_created_at_id" in plan
+    assert "SCAN tasks" not in plan
+
+
+def test_status_filter_with_cursor_seeks_index(db_session, seeded_service):
+    """Тест: курсор с фильтром по статусу - поиск по индексу, а не пропуск строк"""
+    filters = TaskFilter(status=["created"])
+    first_page = seeded_service.get_tasks(limit=2, filters=filters)
+    cursor = seeded_service.next_cursor(first_page, limit=2)
+    
+    plan = query_plan(db_session, seeded_service._tasks_query(limit=2, cursor=cursor, filters=filters))
+    assert "ix_tasks_status_created_at_id (status=? AND (created_at,id)>(?,?))" in plan
+
+
+def test_title_prefix_uses_index(db_session, seeded_service):
+    """Тест: фильтр по префиксу названия - диапазонный поиск по индексу title"""
+    query = seeded_service._tasks_query(filters=TaskFilter(title_prefix="Task 1"))
+    plan = query_plan(db_session, query)
+    
+    assert "SEARCH tasks USING INDEX ix_tasks_title (title>? AND title<?)" in plan
@@ -0,0 +1,250 @@
+import uuid
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from starlette.requests import Request
+from app import replicas as replicas_module
+from app.api import dependencies
+from app.api.api import TaskAPIRouter
+from app.api.dependencies import get_async_read_task_service, get_async_task_service
+from app.crud.cache import task_cache
+from app.database import Base, get_async_db, get_db
+from app.models.task import Task
+from app.replicas import (
+    READ_PRIMARY_COOKIE, READ_PRIMARY_HEADER, ReadYourWritesMiddleware, RecentWriters, Replica, ReplicaSet,
+    reads_primary,
+)
+
+
+def make_engine(path):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def test_replica_selection(tmp_path):
+    """Тест выбора реплики: по очереди, по занятым соединениям, без недоступных"""
+    first = Replica("replica0", make_engine(tmp_path / "first.db"))
+    second = Replica("replica1", make_engine(tmp_path / "second.db"))
+    replicas = ReplicaSet([first, second])
+    assert [replicas.choose().name for _ in range(4)] == ["replica0", "replica1", "replica0", "replica1"]
+
+    least_busy = ReplicaSet([first, second], selection="least_busy")
+    with first.engine.connect():
+        assert least_busy.choose() is second
+
+    replicas.mark_failed(first, Exception("connection refused"))
+    assert {replicas.choose().name for _ in range(3)} == {"replica1"}
+    replicas.mark_failed(second, Exception("connection refused"))
+    assert replicas.choose() is None
+
+    stats = replicas.stats()
+    assert stats["primary_reads"] == 1
+    assert stats["replicas"]["replica0"]["healthy"] is False
+    assert stats["replicas"]["replica0"]["last_error"] == "connection refused"
+    assert ReplicaSet([]).choose() is None
+
+
+def test_replica_health_check(tmp_path):
+    """Тест проверки доступности: недоступная реплика исключается и возвращается после восстановления"""
+    missing = tmp_path / "missing"
+    replica = Replica("replica0", create_engine(f"sqlite:///{missing / 'replica.db'}"))
+    replicas = ReplicaSet([replica])
+
+    replicas.check()
+    assert replica.healthy is False
+    assert replica.failures == 1
+
+    missing.mkdir()
+    replicas.check()
+    assert replica.healthy is True
+    assert replicas.choose() is replica
+
+
+def test_reads_primary_cookie_header_and_client_id():
+    """Тест: чтения идут на основную БД, пока не истек момент из cookie, заголовка или изменений клиента с X-Client-Id"""
+    writers = RecentWriters(max_clients=1)
+
+    def reads(headers=(), client=("10.0.0.1", 1234)):
+        scope = {
+            "type": "http", "client": client,
+            "headers": [(name.lower().encode(), value.encode()) for name, value in headers],
+        }
+        return reads_primary(Request(scope), clock=lambda: 100, writers=writers)
+
+    assert reads([("Cookie", f"{READ_PRIMARY_COOKIE}=110")]) is True
+    assert reads([("Cookie", f"{READ_PRIMARY_COOKIE}=90")]) is False
+    assert reads([("Cookie", f"{READ_PRIMARY_COOKIE}=bad")]) is False
+    assert reads([(READ_PRIMARY_HEADER, "110")]) is True
+    assert reads([(READ_PRIMARY_HEADER, "bad")]) is False
+    assert reads() is False
+
+    writers.add("web", 110)
+    assert reads([("X-Client-Id", "web")]) is True
+    assert reads([("X-Client-Id", "mobile")]) is False
+    # Без X-Client-Id изменения клиентов не различаются и не учитываются
+    assert reads() is False
+    writers.add("mobile", 90)
+    assert reads([("X-Client-Id", "mobile")]) is False
+    # Клиент вытеснен более поздним изменением другого клиента
+    assert reads([("X-Client-Id", "web")]) is False
+
+
+@pytest.fixture
+def writers(monkeypatch):
+    """Свои клиенты, изменявшие задачи, для каждого теста"""
+    writers = RecentWriters()
+    monkeypatch.setattr(replicas_module, "recent_writers", writers)
+    return writers
+
+
+@pytest.fixture
+def replica_app(tmp_path, monkeypatch, writers):
+    """Приложение с основной БД и одной репликой - двумя отдельными файлами SQLite"""
+    primary = make_engine(tmp_path / "primary.db")
+    replica = Replica("replica0", make_engine(tmp_path / "replica.db"))
+    replicas = ReplicaSet([replica])
+    monkeypatch.setattr(dependencies, "get_replicas", lambda: replicas)
+    PrimarySession = sessionmaker(bind=primary, autoflush=False)
+
+    def override_get_db():
+        db = PrimarySession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(TaskAPIRouter().router, prefix="/tasks")
+    app.add_middleware(ReadYourWritesMiddleware, sticky=60)
+    app.dependency_overrides[get_db] = override_get_db
+    task_cache.clear()
+    yield app, replicas, replica
+    task_cache.clear()
+    primary.dispose()
+    replica.engine.dispose()
+
+
+def test_reads_go_to_replica_and_writes_to_primary(replica_app, sample_task_data):
+    """Тест маршрутизации: чтения с реплики, изменения на основную БД, затем чтения клиента с основной"""
+    app, replicas, replica = replica_app
+    replica_task_id = uuid.uuid4()
+    with replica.engine.begin() as connection:
+        connection.execute(insert(Task), {"id": replica_task_id, "title": "Replica task", "description": "D"})
+
+    with TestClient(app) as writer, TestClient(app) as reader:
+        assert [task["title"] for task in reader.get("/tasks/").json()] == ["Replica task"]
+        assert reader.get(f"/tasks/{replica_task_id}").status_code == 200
+        assert reader.get("/tasks/count").json()["total"] == 1
+        # Задача, прочитанная с реплики, не попадает в общий кэш
+        assert task_cache.get(replica_task_id) is None
+
+        response = writer.post("/tasks/", json=sample_task_data)
+        assert response.status_code == 201
+        assert READ_PRIMARY_COOKIE in response.cookies
+        assert response.headers[READ_PRIMARY_HEADER] == response.cookies[READ_PRIMARY_COOKIE]
+        # Изменивший клиент читает свою запись с основной БД, остальные - с реплики
+        assert [task["title"] for task in writer.get("/tasks/").json()] == [sample_task_data["title"]]
+        assert [task["title"] for task in reader.get("/tasks/").json()] == ["Replica task"]
+
+        # Ошибка изменения не закрепляет клиента за основной БД
+        response = reader.patch(f"/tasks/{uuid.uuid4()}", json={"title": "Missing"})
+        assert response.status_code == 404
+        assert READ_PRIMARY_COOKIE not in reader.cookies
+        assert READ_PRIMARY_HEADER not in response.headers
+
+    assert replicas.stats()["replicas"]["replica0"]["reads"] == 4
+
+
+def test_replica_fallback_to_primary(replica_app, sample_task_data):
+    """Тест: при недоступной реплике чтения идут на основную БД"""
+    app, replicas, replica = replica_app
+    with TestClient(app) as client:
+        client.post("/tasks/", json=sample_task_data)
+        client.cookies.clear()
+
+        replicas.mark_failed(replica, Exception("connection refused"))
+        assert len(client.get("/tasks/").json()) == 1
+        assert replicas.stats()["primary_reads"] == 1
+
+        # Реплика, к которой не удалось подключиться при чтении, исключается из выбора
+        replica.healthy = True
+        replica.engine = create_engine("sqlite:////nonexistent/dir/replica.db")
+        assert len(client.get("/tasks/").json()) == 1
+        assert replica.healthy is False
+
+
+def test_read_your_writes_without_cookies(replica_app, sample_task_data):
+    """Тест: клиент без cookie читает свою запись с основной БД по заголовку или X-Client-Id"""
+    app, replicas, replica = replica_app
+    with TestClient(app) as client:
+        response = client.post("/tasks/", json=sample_task_data)
+        client.cookies.clear()
+        until = response.headers[READ_PRIMARY_HEADER]
+        titles = [task["title"] for task in client.get("/tasks/", headers={READ_PRIMARY_HEADER: until}).json()]
+        assert titles == [sample_task_data["title"]]
+
+    with TestClient(app, headers={"X-Client-Id": "api"}) as client:
+        client.post("/tasks/", json=sample_task_data)
+        client.cookies.clear()
+        # Процесс помнит изменение клиента с X-Client-Id
+        assert len(client.get("/tasks/").json()) == 2
+
+    assert replicas.stats()["replicas"]["replica0"]["reads"] == 0
+
+
+def test_write_does_not_pin_other_clients_with_same_ip(replica_app, sample_task_data):
+    """Тест: изменение одного клиента без cookie не отправляет на основную БД чтения других клиентов с тем же IP"""
+    app, replicas, replica = replica_app
+    # Оба клиента TestClient приходят с одного адреса, как из-за прокси или NAT
+    with TestClient(app) as writer, TestClient(app) as reader, \
+            TestClient(app, headers={"X-Client-Id": "other"}) as other:
+        assert writer.post("/tasks/", json=sample_task_data).status_code == 201
+        writer.cookies.clear()
+        assert writer.post("/tasks/", json=sample_task_data, headers={"X-Client-Id": "api"}).status_code == 201
+        writer.cookies.clear()
+
+        assert reader.get("/tasks/").json() == []
+        assert other.get("/tasks/").json() == []
+        assert writer.get("/tasks/").json() == []
+
+    assert replicas.stats()["replicas"]["replica0"]["reads"] == 3
+
+
+def test_async_reads_go_to_replica(tmp_path, monkeypatch, writers):
+    """Тест маршрутизации чтений на реплику в режиме асинхронного драйвера"""
+    primary = make_engine(tmp_path / "primary.db")
+    replica_engine = make_engine(tmp_path / "replica.db")
+    with replica_engine.begin() as connection:
+        connection.execute(insert(Task), {"id": uuid.uuid4(), "title": "Replica task", "description": "D"})
+    replica = Replica(
+        "replica0", replica_engine,
+        create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}", poolclass=NullPool),
+    )
+    monkeypatch.setattr(dependencies, "get_replicas", lambda: ReplicaSet([replica]))
+    PrimarySession = async_sessionmaker(
+        bind=create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}", poolclass=NullPool),
+        expire_on_commit=False,
+    )
+
+    async def override_get_async_db():
+        async with PrimarySession() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(
+        TaskAPIRouter(get_async_task_service, get_read_service=get_async_read_task_service).router, prefix="/tasks"
+    )
+    app.add_middleware(ReadYourWritesMiddleware, sticky=60)
+    app.dependency_overrides[get_async_db] = override_get_async_db
+
+    with TestClient(app) as client:
+        assert [task["title"] for task in client.get("/tasks/").json()] == ["Replica task"]
+        client.post("/tasks/", json={"title": "Primary task", "description": "D"})
+        assert [task["title"] for task in client.get("/tasks/").json()] == ["Primary task"]
+    primary.dispose()
+    replica_engine.dispose()
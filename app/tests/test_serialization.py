@@ -0,0 +1,32 @@
+import json
+from uuid import uuid4
+
+from app.api import serialization
+from app.api.serialization import TASK_FIELDS, json_dumps, task_rows_content
+from app.schemas.task import Task
+
+
+class FakeRow:
+    """Строка запроса с атрибутами колонок"""
+    def __init__(self, **values):
+        self.__dict__.update(values)
+
+
+def test_task_rows_match_schema_output():
+    """Тест совпадения ответа из строк с сериализацией схемы Task"""
+    row = FakeRow(id=uuid4(), title="Задача", description="Описание", status="created", version=2, created_at=None)
+    
+    fast = json.loads(json_dumps(task_rows_content([row])))
+    expected = [Task.model_validate(row, from_attributes=True).model_dump(mode="json")]
+    
+    assert fast == expected
+    assert set(TASK_FIELDS) == set(Task.model_fields)
+
+
+def test_json_dumps_without_orjson(monkeypatch):
+    """Тест запасного кодирования стандартным json"""
+    monkeypatch.setattr(serialization, "orjson", None)
+    task_id = uuid4()
+    
+    body = json_dumps({"id": task_id, "title": "Задача"})
+    assert json.loads(body) == {"id": str(task_id), "title": "Задача"}
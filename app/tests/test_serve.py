@@ -0,0 +1,41 @@
+import pytest
+from app.serve import default_workers, worker_environment
+
+
+def test_worker_environment_splits_connection_budget():
+    """Тест: бюджет соединений делится между процессами без превышения пула"""
+    environment = worker_environment(4, 42, environ={"EVENTS_BACKEND": "postgres"})
+    assert environment == {
+        "DB_POOL_SIZE": "10",
+        "DB_MAX_OVERFLOW": "0",
+        "DB_POOL_WARMUP": "10",
+        "ADMISSION_READ_CONCURRENCY": "7",
+        "ADMISSION_WRITE_CONCURRENCY": "3",
+    }
+
+
+def test_worker_environment_keeps_explicit_settings():
+    """Тест: явно заданные лимиты допуска не меняются, прогрев не превышает пул"""
+    environ = {"DB_POOL_WARMUP": "50", "ADMISSION_WRITE_CONCURRENCY": "8"}
+    environment = worker_environment(2, 20, environ=environ)
+    assert environment["DB_POOL_WARMUP"] == "10"
+    assert environment["ADMISSION_READ_CONCURRENCY"] == "7"
+    assert "ADMISSION_WRITE_CONCURRENCY" not in environment
+
+
+def test_worker_environment_without_budget():
+    """Тест: без бюджета настройки процессов не меняются; бюджет меньше числа процессов - ошибка"""
+    assert worker_environment(1, 0, environ={}) == {}
+    assert worker_environment(default_workers(), 0, environ={"EVENTS_BACKEND": "postgres"}) == {}
+    with pytest.raises(ValueError):
+        worker_environment(8, 4)
+
+
+def test_worker_environment_disables_cache_without_shared_events():
+    """Тест: при нескольких процессах без событий между ними кэш задач выключается"""
+    assert worker_environment(4, 0, environ={}) == {"TASK_CACHE_ENABLED": "0"}
+    assert worker_environment(2, 20, environ={"EVENTS_BACKEND": "local"})["TASK_CACHE_ENABLED"] == "0"
+    assert worker_environment(4, 0, environ={"TASK_CACHE_ENABLED": "true"}) == {"TASK_CACHE_ENABLED": "0"}
+    # Один процесс или события через PostgreSQL - кэш остается как задан
+    assert "TASK_CACHE_ENABLED" not in worker_environment(1, 10, environ={})
+    assert "TASK_CACHE_ENABLED" not in worker_environment(4, 40, environ={"EVENTS_BACKEND": "postgres"})
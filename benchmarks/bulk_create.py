@@ -0,0 +1,49 @@
+"""Сравнение поштучного и пакетного создания задач.
+
+    python -m benchmarks.bulk_create --rows 10000 --chunk-size 500
+
+Замеряется создание rows задач через TaskService.create_task (транзакция на
+каждую задачу) и через TaskService.create_tasks (многострочные INSERT в одной
+транзакции).
+"""
+import argparse
+import time
+
+from benchmarks.common import default_dsn, make_session_factory, report
+from app.crud.task import TaskService
+from app.schemas.task import TaskCreate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--dsn', default=default_dsn())
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--chunk-size', type=int, default=500)
+    args = parser.parse_args()
+
+    tasks = [TaskCreate(title=f'Task {i}', description='Description') for i in range(args.rows)]
+    results = {}
+
+    session_factory = make_session_factory(args.dsn)
+    with session_factory() as db:
+        service = TaskService(db)
+        started = time.perf_counter()
+        for task in tasks:
+            service.create_task(task)
+        results['per_request'] = round(time.perf_counter() - started, 3)
+
+    session_factory = make_session_factory(args.dsn)
+    with session_factory() as db:
+        service = TaskService(db)
+        started = time.perf_counter()
+        service.create_tasks(tasks, chunk_size=args.chunk_size)
+        results['bulk'] = round(time.perf_counter() - started, 3)
+
+    report('bulk_create', vars(args), {
+        'seconds': results,
+        'rows_per_second': {name: round(args.rows / seconds) for name, seconds in results.items()},
+    })
+
+
+if __name__ == '__main__':
+    main()
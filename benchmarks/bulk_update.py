@@ -0,0 +1,63 @@
+"""Сравнение поштучного и пакетного обновления задач.
+
+    python -m benchmarks.bulk_update --rows 10000
+
+Замеряется перевод rows задач в статус completed через TaskService.update_task
+(транзакция на каждую задачу), через TaskService.update_tasks по списку ID и
+через TaskService.update_tasks по фильтру status=in_progress (один UPDATE).
+"""
+import argparse
+import time
+
+from sqlalchemy import update
+
+from benchmarks.common import default_dsn, make_session_factory, report, seed_tasks
+from app.crud.task import TaskService
+from app.models.task import Task
+from app.schemas.task import TaskBulkUpdate, TaskUpdate
+
+
+def reset_status(db) -> list:
+    db.execute(update(Task).values(status='in_progress'))
+    db.commit()
+    return [task_id for (task_id,) in db.query(Task.id)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--dsn', default=default_dsn())
+    parser.add_argument('--rows', type=int, default=10_000)
+    args = parser.parse_args()
+
+    session_factory = make_session_factory(args.dsn)
+    seed_tasks(session_factory, args.rows)
+    completed = TaskUpdate(status='completed')
+    results = {}
+
+    with session_factory() as db:
+        service = TaskService(db)
+
+        task_ids = reset_status(db)
+        started = time.perf_counter()
+        for task_id in task_ids:
+            service.update_task(task_id, completed)
+        results['per_request'] = round(time.perf_counter() - started, 3)
+
+        task_ids = reset_status(db)
+        started = time.perf_counter()
+        service.update_tasks(TaskBulkUpdate(ids=task_ids, update=completed))
+        results['bulk_ids'] = round(time.perf_counter() - started, 3)
+
+        reset_status(db)
+        started = time.perf_counter()
+        service.update_tasks(TaskBulkUpdate(filter={'status': ['in_progress']}, update=completed))
+        results['bulk_filter'] = round(time.perf_counter() - started, 3)
+
+    report('bulk_update', vars(args), {
+        'seconds': results,
+        'rows_per_second': {name: round(args.rows / seconds) for name, seconds in results.items()},
+    })
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""Общие утилиты для бенчмарков.
+
+Бенчмарки запускаются как модули из корня репозитория, например:
+    python -m benchmarks.pagination --rows 200000
+
+По умолчанию используется файловая SQLite во временном каталоге; чтобы
+замерить PostgreSQL, передайте --dsn.
+"""
+import asyncio
+import contextlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+# DSN по умолчанию для бенчмарков и запускаемых ими процессов приложения
+os.environ.setdefault('DSN', 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'task_manager_bench.db'))
+
+import httpx  # noqa: E402
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.database import Base  # noqa: E402
+from app.models.task import Task  # noqa: E402
+
+STATUSES = ('created', 'in_progress', 'completed')
+
+
+def default_dsn() -> str:
+    return os.environ['DSN']
+
+
+def make_session_factory(dsn: str, reset: bool = True) -> sessionmaker:
+    """Создать движок и фабрику сессий, при необходимости пересоздав схему"""
+    engine = create_engine(dsn)
+    if reset:
+        Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def seed_tasks(session_factory: sessionmaker, rows: int, batch: int = 10_000, description_size: int = 64) -> None:
+    """Заполнить таблицу задач rows строками пачками по batch"""
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    description = 'x' * description_size
+    with session_factory() as db:
+        for offset in range(0, rows, batch):
+            db.execute(insert(Task), [
+                {
+                    'id': uuid.uuid4(),
+                    'title': f'Task {i}',
+                    'description': description,
+                    'status': STATUSES[i % len(STATUSES)],
+                    'created_at': start + timedelta(milliseconds=i),
+                }
+                for i in range(offset, min(offset + batch, rows))
+            ])
+            db.commit()
+
+
+def measure(fn, repeat: int) -> list[float]:
+    """Выполнить fn repeat раз и вернуть длительности в миллисекундах"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def summarize(timings: list[float]) -> dict:
+    """Сводка по длительностям: среднее и перцентили в миллисекундах"""
+    ordered = sorted(timings)
+
+    def percentile(p: float) -> float:
+        index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+        return round(ordered[index], 3)
+
+    return {
+        'count': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered), 3),
+        'p50_ms': percentile(50),
+        'p95_ms': percentile(95),
+        'p99_ms': percentile(99),
+    }
+
+
+def report(name: str, params: dict, results) -> None:
+    """Напечатать результат бенчмарка одной строкой JSON"""
+    print(json.dumps({'benchmark': name, 'params': params, 'results': results}, ensure_ascii=False))
+
+
+@contextlib.contextmanager
+def serve(
+    dsn: str,
+    port: int = 8765,
+    env: dict | None = None,
+    workers_args: list[str] | None = None,
+    command: list[str] | None = None,
+):
+    """Запустить main:app в uvicorn отдельным процессом и дождаться готовности
+
+    command заменяет запуск uvicorn (например python -m app.serve); порт
+    передается ему аргументом --port.
+    """
+    process_env = os.environ | {'DSN': dsn} | (env or {})
+    if command is None:
+        command = [sys.executable, '-m', 'uvicorn', 'main:app', '--log-level', 'warning']
+    process = subprocess.Popen(command + ['--port', str(port)] + (workers_args or []), env=process_env)
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                if httpx.get(f'{base_url}/health').status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            if process.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError('Server failed to start')
+            time.sleep(0.1)
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+async def drive(base_url: str, make_request, total: int, concurrency: int) -> dict:
+    """Выполнить total запросов с заданной конкурентностью
+
+    make_request(client, i) - корутина, выполняющая i-й запрос и возвращающая
+    httpx.Response. Возвращает пропускную способность и перцентили задержки.
+    """
+    timings = []
+    errors = 0
+    counter = iter(range(total))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def worker():
+            nonlocal errors
+            for i in counter:
+                started = time.perf_counter()
+                response = await make_request(client, i)
+                timings.append((time.perf_counter() - started) * 1000)
+                if response.status_code >= 400:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return summarize(timings) | {
+        'errors': errors,
+        'requests_per_second': round(total / elapsed, 1),
+    }
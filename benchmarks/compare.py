@@ -0,0 +1,46 @@
+"""Сравнение двух результатов бенчмарка в JSON.
+
+    python -m benchmarks.compare before.json after.json
+
+Для каждого маршрута/операции печатается изменение пропускной способности
+и перцентилей задержки в процентах.
+"""
+import argparse
+import json
+
+METRICS = ('requests_per_second', 'ops_per_second', 'p50_ms', 'p95_ms', 'p99_ms')
+
+
+def change(before: float, after: float) -> str:
+    if not before:
+        return 'n/a'
+    return f'{(after - before) / before * 100:+.1f}%'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('before')
+    parser.add_argument('after')
+    args = parser.parse_args()
+
+    with open(args.before) as file:
+        before = json.load(file)
+    with open(args.after) as file:
+        after = json.load(file)
+
+    print(f"{before.get('revision')} -> {after.get('revision')}")
+    for name, after_stats in after['results'].items():
+        before_stats = before['results'].get(name)
+        if before_stats is None:
+            print(f'{name}: new')
+            continue
+        changes = ', '.join(
+            f'{metric} {before_stats[metric]} -> {after_stats[metric]} ({change(before_stats[metric], after_stats[metric])})'
+            for metric in METRICS
+            if metric in before_stats and metric in after_stats
+        )
+        print(f'{name}: {changes}')
+
+
+if __name__ == '__main__':
+    main()
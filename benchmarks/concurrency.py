@@ -0,0 +1,48 @@
+"""Сравнение синхронного и асинхронного режимов БД при высокой конкурентности.
+
+    python -m benchmarks.concurrency --concurrency 50 200 --requests 5000
+
+Для каждого режима (DB_MODE=sync и DB_MODE=async) запускается uvicorn с
+main:app, после чего выполняются запросы GET /tasks/{task_id} и
+GET /tasks/?limit=20 с заданным числом одновременных клиентов.
+"""
+import argparse
+import asyncio
+
+from benchmarks.common import default_dsn, drive, make_session_factory, report, seed_tasks, serve
+from app.models.task import Task
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--dsn', default=default_dsn())
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--requests', type=int, default=5_000)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[50, 200])
+    parser.add_argument('--modes', nargs='+', default=['sync', 'async'])
+    args = parser.parse_args()
+
+    session_factory = make_session_factory(args.dsn)
+    seed_tasks(session_factory, args.rows)
+    with session_factory() as db:
+        task_ids = [str(task_id) for (task_id,) in db.query(Task.id).limit(1000)]
+
+    async def get_one(client, i):
+        return await client.get(f'/tasks/{task_ids[i % len(task_ids)]}')
+
+    async def get_page(client, i):
+        return await client.get('/tasks/', params={'limit': 20})
+
+    results = []
+    for mode in args.modes:
+        with serve(args.dsn, env={'DB_MODE': mode}) as base_url:
+            for concurrency in args.concurrency:
+                for name, make_request in (('get_task', get_one), ('list_tasks', get_page)):
+                    stats = asyncio.run(drive(base_url, make_request, args.requests, concurrency))
+                    results.append({'mode': mode, 'concurrency': concurrency, 'endpoint': name} | stats)
+
+    report('concurrency', vars(args), results)
+
+
+if __name__ == '__main__':
+    main()
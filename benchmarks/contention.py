@@ -0,0 +1,76 @@
+"""Конкурентные изменения одних и тех же задач: If-Match против последней записи.
+
+    python -m benchmarks.contention --hot-tasks 1 10 100 --requests 2000 --concurrency 32
+
+Каждый клиент выполняет цикл чтение-изменение-запись: читает задачу, увеличивает
+счетчик в ее названии и отправляет PATCH. В режиме blind PATCH отправляется без
+условия, и конкурентные изменения теряются; в режиме if_match PATCH передает
+ETag в If-Match и при 412 повторяет цикл. Для каждого режима и размера горячего
+множества задач печатаются пропускная способность успешных изменений,
+перцентили длительности цикла, доля ответов 412 и число потерянных изменений.
+"""
+import argparse
+import asyncio
+
+import httpx
+
+from benchmarks.common import default_dsn, drive, make_session_factory, report, serve
+from app.models.task import Task
+
+
+async def run_mode(base_url: str, task_ids: list[str], mode: str, total: int, concurrency: int) -> dict:
+    conflicts = 0
+
+    async def increment(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        nonlocal conflicts
+        url = f'/tasks/{task_ids[i % len(task_ids)]}'
+        while True:
+            current = await client.get(url)
+            value = int(current.json()['title'].removeprefix('Counter '))
+            headers = {'If-Match': current.headers['ETag']} if mode == 'if_match' else {}
+            response = await client.patch(url, json={'title': f'Counter {value + 1}'}, headers=headers)
+            if response.status_code != 412:
+                return response
+            conflicts += 1
+
+    result = await drive(base_url, increment, total, concurrency)
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        final = sum([
+            int((await client.get(f'/tasks/{task_id}')).json()['title'].removeprefix('Counter '))
+            for task_id in task_ids
+        ])
+    return result | {
+        'conflicts': conflicts,
+        'conflict_rate': round(conflicts / (total + conflicts), 3),
+        'lost_updates': total - final,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dsn', default=default_dsn())
+    parser.add_argument('--hot-tasks', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--requests', type=int, default=2_000, help='успешных изменений на замер')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--modes', nargs='+', default=['blind', 'if_match'])
+    args = parser.parse_args()
+
+    session_factory = make_session_factory(args.dsn)
+    results = []
+    with serve(args.dsn) as base_url:
+        for hot_tasks in args.hot_tasks:
+            for mode in args.modes:
+                with session_factory() as db:
+                    db.query(Task).delete()
+                    tasks = [Task(title='Counter 0', description='Contention') for _ in range(hot_tasks)]
+                    db.add_all(tasks)
+                    db.commit()
+                    task_ids = [str(task.id) for task in tasks]
+                result = asyncio.run(run_mode(base_url, task_ids, mode, args.requests, args.concurrency))
+                results.append({'hot_tasks': hot_tasks, 'mode': mode} | result)
+
+    report('contention', vars(args), results)
+
+
+if __name__ == '__main__':
+    main()
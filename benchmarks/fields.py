@@ -0,0 +1,48 @@
+"""Страница списка задач со всеми полями и только с выбранными (fields=).
+
+    python -m benchmarks.fields --rows 10000 --description-size 4096
+
+Замеряется путь от запроса к БД до байтов ответа, как в GET /tasks/:
+- full: все поля задачи, включая описание
+- sparse: только поля из --fields (по умолчанию id,title,status)
+Для каждого варианта выводится и размер ответа в байтах.
+"""
+import argparse
+
+from benchmarks.common import default_dsn, make_session_factory, report, seed_tasks
+from benchmarks.micro import measure_ops
+from app.api.dependencies import get_task_fields
+from app.api.serialization import json_dumps, task_rows_content
+from app.crud.task import TaskService
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dsn', default=default_dsn())
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--description-size', type=int, default=4096)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--fields', default='id,title,status')
+    parser.add_argument('--repeat', type=int, default=500)
+    args = parser.parse_args()
+
+    session_factory = make_session_factory(args.dsn)
+    seed_tasks(session_factory, args.rows, description_size=args.description_size)
+    fields = get_task_fields(args.fields)
+
+    results = {}
+    with session_factory() as db:
+        service = TaskService(db)
+        variants = {'full': None, 'sparse': fields}
+        for name, selected in variants.items():
+            def page(i, selected=selected):
+                rows = service.get_task_rows(limit=args.page_size, skip=i % max(1, args.rows - args.page_size), fields=selected)
+                return json_dumps(task_rows_content(rows, selected))
+
+            results[name] = measure_ops(page, args.repeat) | {'response_bytes': len(page(0))}
+
+    report('fields', vars(args), results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""Сравнение фиксации каждой задачи и групповой фиксации создания задач.
+
+    python -m benchmarks.group_commit --requests 5000 --concurrency 50 200 --delays 1 2 5
+    python -m benchmarks.group_commit --http
+
+По умолчанию замер идет в процессе: concurrency одновременных производителей
+создают задачи через ThreadedTaskService.create_task (транзакция на задачу) и
+через GroupCommitWriter для каждого окна пакета из --delays (в миллисекундах).
+С --http то же сравнение выполняется через POST /tasks/ к uvicorn с main:app;
+лимит одновременных изменений контроля допуска поднимается до числа клиентов,
+чтобы запросы не отклонялись и собирались в пакеты.
+"""
+import argparse
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+
+from benchmarks.common import default_dsn, drive, make_session_factory, report, serve, summarize
+from app.crud.group_commit import GroupCommitWriter
+from app.crud.task_async import ThreadedTaskService
+from app.schemas.task import TaskCreate
+
+
+async def produce(create, total: int, concurrency: int) -> dict:
+    """Создать total задач concurrency одновременными производителями"""
+    timings = []
+    counter = iter(range(total))
+
+    async def worker():
+        for i in counter:
+            started = time.perf_counter()
+            await create(TaskCreate(title=f'Task {i}', description='Description'))
+            timings.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return summarize(timings) | {'tasks_per_second': round(total / elapsed, 1)}
+
+
+def run_in_process(args) -> list[dict]:
+    results = []
+    for concurrency in args.concurrency:
+        session_factory = make_session_factory(args.dsn)
+
+        async def create_per_request(task):
+            db = session_factory()
+            try:
+                return await ThreadedTaskService(db).create_task(task)
+            finally:
+                db.close()
+
+        stats = asyncio.run(produce(create_per_request, args.requests, concurrency))
+        results.append({'mode': 'per_request', 'concurrency': concurrency} | stats)
+
+        for delay in args.delays:
+            session_factory = make_session_factory(args.dsn)
+
+            @asynccontextmanager
+            async def service_scope():
+                db = session_factory()
+                try:
+                    yield ThreadedTaskService(db)
+                finally:
+                    db.close()
+
+            writer = GroupCommitWriter(service_scope, max_batch=args.max_batch, max_delay=delay / 1000)
+
+            async def run():
+                stats = await produce(writer.submit, args.requests, concurrency)
+                await writer.stop()
+                return stats
+
+            stats = asyncio.run(run())
+            results.append({'mode': f'group_commit_{delay:g}ms', 'concurrency': concurrency} | stats | {
+                'batches': writer.batches, 'largest_batch': writer.largest_batch,
+            })
+    return results
+
+
+def run_http(args) -> list[dict]:
+    async def create(client, i):
+        return await client.post('/tasks/', json={'title': f'Task {i}', 'description': 'Description'})
+
+    admission = {
+        'ADMISSION_WRITE_CONCURRENCY': str(max(args.concurrency)),
+        'ADMISSION_WRITE_QUEUE': str(max(args.concurrency)),
+    }
+    modes = [('per_request', {'GROUP_COMMIT_ENABLED': 'false'})] + [
+        (f'group_commit_{delay:g}ms', {
+            'GROUP_COMMIT_ENABLED': 'true',
+            'GROUP_COMMIT_MAX_DELAY_MS': str(delay),
+            'GROUP_COMMIT_MAX_BATCH': str(args.max_batch),
+        })
+        for delay in args.delays
+    ]
+
+    results = []
+    for mode, env in modes:
+        make_session_factory(args.dsn)
+        with serve(args.dsn, env=admission | env) as base_url:
+            for concurrency in args.concurrency:
+                stats = asyncio.run(drive(base_url, create, args.requests, concurrency))
+                results.append({'mode': mode, 'concurrency': concurrency} | stats)
+            results[-1]['group_commit'] = httpx.get(f'{base_url}/stats/group-commit').json()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--dsn', default=default_dsn())
+    parser.add_argument('--requests', type=int, default=5_000)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[50, 200])
+    parser.add_argument('--delays', type=float, nargs='+', default=[1, 2, 5])
+    parser.add_argument('--max-batch', type=int, default=500)
+    parser.add_argument('--http', action='store_true', help='замерять через HTTP к uvicorn')
+    args = parser.parse_args()
+
+    results = run_http(args) if args.http else run_in_process(args)
+    report('group_commit', vars(args), results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Накладные расходы метрик: сервер с METRICS_ENABLED=true и false.
+
+    python -m benchmarks.metrics_overhead --requests 5000 --concurrency 32
+
+Сначала в одном процессе измеряется стоимость MetricsMiddleware и
+обработчиков событий SQLAlchemy на один вызов, затем uvicorn запускается
+с включенными и отключенными метриками и сравниваются задержки
+GET /tasks/{task_id} и GET /tasks/?limit=20.
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
+
+from benchmarks.common import default_dsn, drive, make_session_factory, report, seed_tasks, serve
+from app.metrics import (
+    MetricsMiddleware, RequestDBStats, _after_cursor_execute, _before_cursor_execute, current_request_db,
+    instrument_sqlalchemy,
+)
+from app.models.task import Task
+
+
+async def _app(scope, receive, send):
+    await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def _send(message):
+    pass
+
+
+def middleware_overhead(iterations: int) -> dict:
+    """Стоимость middleware на запрос в микросекундах относительно голого ASGI-приложения"""
+    scope = {'type': 'http', 'method': 'GET', 'path': '/bench'}
+    wrapped = MetricsMiddleware(_app)
+
+    async def run(app):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            await app(scope, None, _send)
+        return (time.perf_counter() - started) / iterations * 1e6
+
+    bare, instrumented = asyncio.run(run(_app)), asyncio.run(run(wrapped))
+    return {'case': 'middleware', 'bare_us': round(bare, 3), 'instrumented_us': round(instrumented, 3),
+            'overhead_us': round(instrumented - bare, 3)}
+
+
+def query_hook_overhead(iterations: int) -> dict:
+    """Стоимость обработчиков событий SQLAlchemy на запрос к SQLite в памяти внутри HTTP-запроса"""
+    engine = create_engine('sqlite:///:memory:')
+
+    def run():
+        token = current_request_db.set(RequestDBStats())
+        with engine.connect() as conn:
+            started = time.perf_counter()
+            for _ in range(iterations):
+                conn.execute(text('SELECT 1'))
+            elapsed = time.perf_counter() - started
+        current_request_db.reset(token)
+        return elapsed / iterations * 1e6
+
+    if event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.remove(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.remove(Engine, 'after_cursor_execute', _after_cursor_execute)
+    bare = run()
+    instrument_sqlalchemy()
+    instrumented = run()
+    return {'case': 'query_hooks', 'bare_us': round(bare, 3), 'instrumented_us': round(instrumented, 3),
+            'overhead_us': round(instrumented - bare, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--dsn', default=default_dsn())
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--requests', type=int, default=5_000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--iterations', type=int, default=50_000)
+    args = parser.parse_args()
+
+    results = [middleware_overhead(args.iterations), query_hook_overhead(args.iterations)]
+
+    session_factory = make_session_factory(args.dsn)
+    seed_tasks(session_factory, args.rows)
+    with session_factory() as db:
+        task_ids = [str(task_id) for (task_id,) in db.query(Task.id).limit(1000)]
+
+    async def get_one(client, i):
+        return await client.get(f'/tasks/{task_ids[i % len(task_ids)]}')
+
+    async def get_page(client, i):
+        return await client.get('/tasks/', params={'limit': 20})
+
+    for enabled in ('false', 'true'):
+        with serve(args.dsn, env={'METRICS_ENABLED': enabled}) as base_url:
+            for name, make_request in (('get_task', get_one), ('list_tasks', get_page)):
+                stats = asyncio.run(drive(base_url, make_request, args.requests, args.concurrency))
+                results.append({'case': 'server', 'metrics': enabled, 'endpoint': name} | stats)
+
+    report('metrics_overhead', vars(args), results)
+
+
+if __name__ == '__main__':
+    main()
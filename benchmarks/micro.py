@@ -0,0 +1,119 @@
+"""Микробенчмарки методов TaskService и сериализации схем.
+
+    python -m benchmarks.micro --rows 10000 --repeat 500 --output micro.json
+
+Каждая операция выполняется repeat раз на заполненной БД без HTTP-слоя;
+печатается число операций в секунду и перцентили длительности в JSON.
+"""
+import argparse
+import json
+import time
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from benchmarks.common import default_dsn, make_session_factory, seed_tasks, summarize, STATUSES
+from benchmarks.load import git_revision
+from app.crud.cache import LRUTTLCache
+from app.crud.task import TaskService
+from app.models.task import Task
+from app.schemas.task import Task as TaskSchema, TaskCreate, TaskFilter, TaskUpdate
+
+
+def measure_ops(fn, repeat: int) -> dict:
+    """Выполнить fn(i) repeat раз и вернуть сводку с числом операций в секунду"""
+    timings = []
+    started = time.perf_counter()
+    for i in range(repeat):
+        call_started = time.perf_counter()
+        fn(i)
+        timings.append((time.perf_counter() - call_started) * 1000)
+    elapsed = time.perf_counter() - started
+    return summarize(timings) | {'ops_per_second': round(repeat / elapsed, 1)}
+
+
+def service_benchmarks(session_factory, task_ids, repeat: int, page_size: int) -> dict:
+    results = {}
+    with session_factory() as db:
+        service = TaskService(db, cache=LRUTTLCache(maxsize=len(task_ids), ttl=3600))
+
+        def task_id(i):
+            return task_ids[i % len(task_ids)]
+
+        def fresh(fn):
+            # Очищаю identity map, чтобы каждая операция читала из БД
+            def call(i):
+                db.expunge_all()
+                return fn(i)
+            return call
+
+        results['get_task'] = measure_ops(fresh(lambda i: service.get_task(task_id(i))), repeat)
+        results['get_task_cached (hit)'] = measure_ops(lambda i: service.get_task_cached(task_ids[0]), repeat)
+        results['get_tasks'] = measure_ops(fresh(lambda i: service.get_tasks(limit=page_size)), repeat)
+        results['get_tasks (status filter)'] = measure_ops(
+            fresh(lambda i: service.get_tasks(limit=page_size, filters=TaskFilter(status=['completed']))), repeat
+        )
+        results['update_task'] = measure_ops(
+            lambda i: service.update_task(task_id(i), TaskUpdate(status=STATUSES[i % len(STATUSES)])), repeat
+        )
+        results['create_task'] = measure_ops(
+            lambda i: service.create_task(TaskCreate(title=f'Micro {i}', description='Micro')), repeat
+        )
+        batch = [TaskCreate(title=f'Micro bulk {i}', description='Micro') for i in range(page_size)]
+        results[f'create_tasks ({page_size})'] = measure_ops(lambda i: service.create_tasks(batch), max(1, repeat // 10))
+        results['delete_task'] = measure_ops(lambda i: service.delete_task(task_ids[-1 - i]), min(repeat, len(task_ids) // 2))
+    return results
+
+
+def serialization_benchmarks(session_factory, repeat: int, page_size: int) -> dict:
+    with session_factory() as db:
+        tasks = TaskService(db).get_tasks(limit=page_size)
+        # Загружаю атрибуты заранее, чтобы замерять только сериализацию
+        for task in tasks:
+            db.refresh(task)
+        db.expunge_all()
+
+    page_adapter = TypeAdapter(List[TaskSchema])
+    schemas = [TaskSchema.model_validate(task) for task in tasks]
+    return {
+        'Task.model_validate (ORM)': measure_ops(lambda i: TaskSchema.model_validate(tasks[i % len(tasks)]), repeat),
+        'Task.model_dump_json': measure_ops(lambda i: schemas[i % len(schemas)].model_dump_json(), repeat),
+        f'List[Task] validate+dump_json ({page_size})': measure_ops(
+            lambda i: page_adapter.dump_json(page_adapter.validate_python(tasks, from_attributes=True)), repeat
+        ),
+        f'List[Task] jsonable_encoder+json.dumps ({page_size})': measure_ops(
+            lambda i: json.dumps(jsonable_encoder(page_adapter.validate_python(tasks, from_attributes=True))), repeat
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dsn', default=default_dsn())
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=500)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--output', help='файл для сохранения результата в JSON')
+    args = parser.parse_args()
+
+    session_factory = make_session_factory(args.dsn)
+    seed_tasks(session_factory, args.rows)
+    with session_factory() as db:
+        task_ids = [task_id for (task_id,) in db.query(Task.id)]
+
+    results = {'service.' + name: stats for name, stats in
+               service_benchmarks(session_factory, task_ids, args.repeat, args.page_size).items()}
+    results.update({'schema.' + name: stats for name, stats in
+                    serialization_benchmarks(session_factory, args.repeat, args.page_size).items()})
+
+    output = {'benchmark': 'micro', 'revision': git_revision(), 'params': vars(args), 'results': results}
+    text = json.dumps(output, ensure_ascii=False, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Сравнение OFFSET- и keyset-пагинации списка задач на разной глубине.
+
+    python -m benchmarks.pagination --rows 200000 --limit 100
+
+Для каждой глубины замеряется получение страницы через skip и через курсор,
+указывающий на ту же позицию. Время keyset-страницы не должно зависеть от
+глубины, время OFFSET-страницы растет линейно.
+"""
+import argparse
+
+from benchmarks.common import default_dsn, make_session_factory, measure, report, seed_tasks, summarize
+from app.crud.task import TaskService
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--dsn', default=default_dsn())
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--limit', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--depths', type=int, nargs='+', default=None)
+    args = parser.parse_args()
+
+    depths = args.depths or [0, args.rows // 10, args.rows // 2, args.rows - args.limit]
+    session_factory = make_session_factory(args.dsn)
+    seed_tasks(session_factory, args.rows)
+
+    results = []
+    with session_factory() as db:
+        service = TaskService(db)
+        for depth in depths:
+            # Курсор, указывающий на ту же позицию, что и skip=depth
+            cursor = None
+            if depth:
+                previous = service.get_tasks(skip=depth - 1, limit=1)
+                cursor = service.next_cursor(previous, limit=1)
+
+            offset_timings = measure(lambda: service.get_tasks(skip=depth, limit=args.limit), args.repeat)
+            keyset_timings = measure(lambda: service.get_tasks(limit=args.limit, cursor=cursor), args.repeat)
+            db.expunge_all()
+            results.append({
+                'depth': depth,
+                'offset': summarize(offset_timings),
+                'keyset': summarize(keyset_timings),
+            })
+
+    report('pagination', vars(args) | {'depths': depths}, results)
+
+
+if __name__ == '__main__':
+    main()
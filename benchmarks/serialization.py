@@ -0,0 +1,66 @@
+"""Сравнение путей формирования ответа со страницей задач.
+
+    python -m benchmarks.serialization --rows 10000 --page-size 100
+
+Замеряется полный путь от запроса к БД до байтов ответа:
+- orm_pydantic: ORM-объекты, проверка List[Task] через from_attributes,
+  jsonable_encoder и json.dumps - как при возврате ORM-объектов с response_model
+- rows_fast: запрос только колонок ответа и кодирование строк json_dumps (orjson)
+"""
+import argparse
+import json
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from benchmarks.common import default_dsn, make_session_factory, report, seed_tasks
+from benchmarks.micro import measure_ops
+from app.api.serialization import json_dumps, orjson, task_rows_content
+from app.crud.task import TaskService
+from app.schemas.task import Task as TaskSchema
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dsn', default=default_dsn())
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=500)
+    args = parser.parse_args()
+
+    session_factory = make_session_factory(args.dsn)
+    seed_tasks(session_factory, args.rows)
+    page_adapter = TypeAdapter(List[TaskSchema])
+
+    results = {}
+    with session_factory() as db:
+        service = TaskService(db)
+
+        def orm_pydantic(i):
+            db.expunge_all()
+            tasks = service.get_tasks(limit=args.page_size)
+            content = jsonable_encoder(page_adapter.validate_python(tasks, from_attributes=True))
+            return json.dumps(content, ensure_ascii=False, separators=(',', ':')).encode()
+
+        def rows_fast(i):
+            return json_dumps(task_rows_content(service.get_task_rows(limit=args.page_size)))
+
+        assert json.loads(orm_pydantic(0)) == json.loads(rows_fast(0))
+        results['orm_pydantic'] = measure_ops(orm_pydantic, args.repeat)
+        results['rows_fast'] = measure_ops(rows_fast, args.repeat)
+
+        # Только сериализация, без запроса к БД
+        tasks = service.get_tasks(limit=args.page_size)
+        rows = service.get_task_rows(limit=args.page_size)
+        results['encode_only.orm_pydantic'] = measure_ops(
+            lambda i: json.dumps(jsonable_encoder(page_adapter.validate_python(tasks, from_attributes=True))),
+            args.repeat,
+        )
+        results['encode_only.rows_fast'] = measure_ops(lambda i: json_dumps(task_rows_content(rows)), args.repeat)
+
+    report('serialization', vars(args) | {'orjson': orjson is not None}, results)
+
+
+if __name__ == '__main__':
+    main()
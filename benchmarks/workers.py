@@ -0,0 +1,55 @@
+"""Масштабирование пропускной способности по числу процессов python -m app.serve.
+
+    python -m benchmarks.workers --workers 1 2 4 --requests 5000 --concurrency 100
+
+Для каждого числа процессов запускается python -m app.serve с общим бюджетом
+соединений --db-connections, после чего выполняются запросы GET /tasks/{task_id}
+и GET /tasks/?limit=20. Рост ограничен числом CPU машины: клиент нагрузки
+работает на той же машине.
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+from benchmarks.common import default_dsn, drive, make_session_factory, report, seed_tasks, serve
+from app.models.task import Task
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--dsn', default=default_dsn())
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--requests', type=int, default=5_000)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--db-connections', type=int, default=40)
+    args = parser.parse_args()
+
+    session_factory = make_session_factory(args.dsn)
+    seed_tasks(session_factory, args.rows)
+    with session_factory() as db:
+        task_ids = [str(task_id) for (task_id,) in db.query(Task.id).limit(1000)]
+
+    async def get_one(client, i):
+        return await client.get(f'/tasks/{task_ids[i % len(task_ids)]}')
+
+    async def get_page(client, i):
+        return await client.get('/tasks/', params={'limit': 20})
+
+    results = []
+    for workers in args.workers:
+        command = [
+            sys.executable, '-m', 'app.serve', '--host', '127.0.0.1',
+            '--workers', str(workers), '--db-connections', str(args.db_connections),
+        ]
+        with serve(args.dsn, command=command, env={'METRICS_ENABLED': 'false'}) as base_url:
+            for name, make_request in (('get_task', get_one), ('list_tasks', get_page)):
+                stats = asyncio.run(drive(base_url, make_request, args.requests, args.concurrency))
+                results.append({'workers': workers, 'endpoint': name} | stats)
+
+    report('workers', vars(args) | {'cpus': os.cpu_count()}, results)
+
+
+if __name__ == '__main__':
+    main()
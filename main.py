@@ -1,6 +1,44 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from app.api.api import router
-from app.database import engine, Base
+from app.admission import AdmissionMiddleware, admission
+from app.config import ADMISSION_ENABLED, DB_AUTO_MIGRATE, DB_SETTINGS, METRICS_ENABLED, REPLICA_DSNS
+from app.crud.cache import task_cache
+from app.crud.group_commit import task_writer
+from app.database import (
+    current_engines, dispose_engines, get_async_engine, get_engine, get_replicas, init_engines, warm_up, warm_up_async,
+)
+from app.events import task_events
+from app.metrics import (
+    MetricsMiddleware, admission_collector, cache_collector, instrument_sqlalchemy, pool_collector, registry,
+)
+from app.pool import pool_status
+from app.replicas import ReadYourWritesMiddleware
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    #Движки создаю при запуске, а не при импорте: импорт main не обращается к БД
+    init_engines()
+    if DB_AUTO_MIGRATE:
+        from app.migrate import migrate
+        migrate(get_engine())
+    #Открываю соединения заранее, чтобы первые запросы не ждали подключения к БД
+    if DB_SETTINGS.pool_warmup > 0:
+        warm_up(get_engine(), DB_SETTINGS.pool_warmup)
+        if get_async_engine() is not None:
+            await warm_up_async(get_async_engine(), DB_SETTINGS.pool_warmup)
+    #Прием событий других процессов для ленты изменений и инвалидации кэша
+    task_events.start()
+    #Проверка доступности реплик для чтения
+    get_replicas().start()
+    yield
+    get_replicas().stop()
+    task_events.stop()
+    #Дописываю задачи, ожидающие групповой фиксации, до закрытия соединений
+    await task_writer.stop()
+    await dispose_engines()
 
 
 app = FastAPI(
@@ -27,12 +65,27 @@ app = FastAPI(
     },
     docs_url="/docs",
     redoc_url="/redoc",
-    openapi_url="/openapi.json"
+    openapi_url="/openapi.json",
+    lifespan=lifespan,
 )
 
 app.include_router(router, prefix='/tasks')
 
-Base.metadata.create_all(bind=engine)
+#Чтения клиента сразу после его изменений идут на основную БД, а не на реплики
+if REPLICA_DSNS:
+    app.add_middleware(ReadYourWritesMiddleware)
+
+#Контроль допуска подключаю до метрик: отклоненные запросы тоже попадают в метрики
+if ADMISSION_ENABLED:
+    app.add_middleware(AdmissionMiddleware, controller=admission)
+
+if METRICS_ENABLED:
+    instrument_sqlalchemy()
+    app.add_middleware(MetricsMiddleware)
+    registry.register_collector(pool_collector(current_engines))
+    registry.register_collector(cache_collector(task_cache))
+    if ADMISSION_ENABLED:
+        registry.register_collector(admission_collector(admission))
 
 @app.get('/')
 def read_root():
@@ -40,4 +93,39 @@ def read_root():
 
 @app.get('/health')
 def health_check():
-    return {'status': 'OK'}
\ No newline at end of file
+    return {'status': 'OK'}
+
+@app.get('/stats/cache')
+def cache_stats():
+    """Счетчики кэша чтения задач"""
+    return task_cache.stats()
+
+@app.get('/stats/events')
+def events_stats():
+    """Состояние ленты изменений: подписчики, номер последнего события, отключенные подписчики"""
+    return task_events.stats()
+
+@app.get('/stats/admission')
+def admission_stats():
+    """Контроль допуска: занятые места и очереди лимитов, отклоненные запросы"""
+    return admission.stats()
+
+@app.get('/stats/group-commit')
+def group_commit_stats():
+    """Групповая фиксация создаваемых задач: пакеты, их размер, задачи в очереди"""
+    return task_writer.stats()
+
+@app.get('/stats/replicas')
+def replicas_stats():
+    """Реплики для чтения: доступность, занятые соединения, число чтений"""
+    return get_replicas().stats()
+
+@app.get('/stats/pool')
+def pool_stats():
+    """Состояние пулов соединений с БД"""
+    return {name: pool_status(engine) for name, engine in current_engines().items()}
+
+@app.get('/metrics', response_class=PlainTextResponse, include_in_schema=False)
+def metrics():
+    """Метрики в текстовом формате Prometheus"""
+    return PlainTextResponse(registry.render(), media_type='text/plain; version=0.0.4; charset=utf-8')